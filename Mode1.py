@@ -1,18 +1,32 @@
+import os
 import sys
+import time
+from functools import partial
 import numpy as np  # 用于数值计算
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,  # Qt界面组件
                              QHBoxLayout, QLabel, QComboBox, QLineEdit, 
                              QPushButton, QGridLayout, QGroupBox, QDoubleSpinBox, 
-                             QSpinBox, QSplitter)
+                             QSpinBox, QSplitter, QSlider, QFileDialog)
 from PyQt5.QtCore import Qt, QTimer  # Qt核心功能
 import matplotlib.pyplot as plt  # 绘图库
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas  # Matplotlib的Qt后端
+from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar  # 缩放/平移工具栏
 from matplotlib.figure import Figure
-from scipy import signal as sg  # 信号处理库
+from pwm_engine import pwm_modulate  # 向量化PWM调制引擎
+from plot_decimation import minmax_decimate, visible_slice  # 按像素宽度降采样
+from dac_filters import FILTER_CACHE, FILTER_FAMILIES  # 带缓存的SOS滤波器
+from signal_chain import (analog_to_digital_values, pwm_to_analog,  # 与界面无关的信号链
+                          quality_metrics, compute_chain)
+from signal_stream import StreamingChain  # 实时模式的流式信号链
+from recompute_scheduler import RecomputeScheduler  # 后台重算调度器
+from capture_recorder import CaptureWriter, CaptureReader  # 长时间记录与回放
+from spectrum import BackgroundSpectrum  # 后台 Welch 频谱分析
 
 class SignalCanvas(FigureCanvas):
     """信号显示画布类，用于显示波形
-    继承自FigureCanvas，提供了波形绘制功能"""
+    继承自FigureCanvas，提供了波形绘制功能
+    曲线对象只创建一次，之后用 set_data 更新；坐标轴不变时只重绘数据层（blit），
+    送进 matplotlib 的数据按像素宽度做最小/最大值降采样，缩放/平移时重新降采样"""
     
     def __init__(self, parent=None, width=5, height=4, dpi=100):
         """初始化画布
@@ -26,45 +40,216 @@ class SignalCanvas(FigureCanvas):
         self.axes = self.fig.add_subplot(111)  # 添加子图
         super(SignalCanvas, self).__init__(self.fig)
         self.setParent(parent)
+        self.axes.grid(True)
+        self.axes.set_xlabel('Time (s)')
         self.fig.tight_layout()  # 自动调整布局
+        
+        self._lines = []            # 持久的曲线对象
+        self._line_styles = None    # 当前曲线样式，样式变化时才重建曲线
+        self._data = []             # 每条曲线的全分辨率数据 (t, y)
+        self._legend_labels = None
+        self._background = None     # blit用的背景（坐标轴、网格、标题）
+        self._needs_full_draw = True
+        self._needs_layout = True
+        self._setting_limits = False
+        self._user_view = False     # 用户用工具栏缩放/平移过，坐标范围由用户决定
+        self._span = None           # 上次数据的时间跨度，跨度变了才重新自动缩放
+        self.mpl_connect('draw_event', self._on_draw)
+        self.mpl_connect('resize_event', self._on_resize)
+        self.axes.callbacks.connect('xlim_changed', self._on_xlim_changed)
 
     def plot_analog_signal(self, t, signal, title):
-        self.axes.clear()
-        self.axes.plot(t, signal, 'b-')
-        self.axes.set_title(title)
-        self.axes.set_xlabel('Time (s)')
-        self.axes.set_ylabel('Amplitude (V)')
-        self.axes.grid(True)
-        self.fig.tight_layout()
-        self.draw()
+        self._render(t, [signal], [('b-', {})], title, 'Amplitude (V)')
 
     def plot_digital_signal(self, t, signal, title, bits):
-        self.axes.clear()
-        self.axes.step(t, signal, 'r-', where='post')
-        self.axes.set_title(title)
-        self.axes.set_xlabel('Time (s)')
-        self.axes.set_ylabel('Digital Value (0/1)')
-        self.axes.grid(True)
-        
         # 设置固定的y轴范围，只显示0和1两个值，因为PWM是二值信号
-        self.axes.set_ylim([-0.1, 1.1])
-        
-        self.fig.tight_layout()
-        self.draw()
+        self._render(t, [signal], [('r-', {'drawstyle': 'steps-post'})], title,
+                     'Digital Value (0/1)', ylim=(-0.1, 1.1))
         
     def plot_reconstructed_signal(self, t, signal, title, original_signal=None):
-        self.axes.clear()
-        self.axes.plot(t, signal, 'g-')
         if original_signal is not None:
-            self.axes.plot(t, original_signal, 'b--', alpha=0.5)
-            self.axes.legend(['Reconstructed', 'Original'])
-            
-        self.axes.set_title(title)
-        self.axes.set_xlabel('Time (s)')
-        self.axes.set_ylabel('Amplitude (V)')
-        self.axes.grid(True)
+            self._render(t, [signal, original_signal], [('g-', {}), ('b--', {'alpha': 0.5})], title,
+                         'Amplitude (V)', legend=['Reconstructed', 'Original'])
+        else:
+            self._render(t, [signal], [('g-', {})], title, 'Amplitude (V)')
+
+    def _render(self, t, signals, styles, title, ylabel, ylim=None, legend=None):
+        """更新曲线数据；只有标题、坐标范围或曲线组成变化时才整体重绘"""
+        t = np.asarray(t)
+        self._ensure_lines(styles, legend)
+        self._data = [(t, np.asarray(y)) for y in signals]
+        
+        if self.axes.get_title() != title:
+            self.axes.set_title(title)
+            self._needs_full_draw = True
+        if self.axes.get_ylabel() != ylabel:
+            self.axes.set_ylabel(ylabel)
+            self._needs_full_draw = True
+        
+        # 坐标范围：x 为整个时间轴，y 为数据范围外扩5%（与自动缩放一致）
+        if len(t) > 1:
+            xlim = (t[0], t[-1])
+        else:
+            xlim = (0.0, 1.0)
+        # 实时模式下时间窗口每次都在平移，只有窗口长度变了才算数据跨度变化
+        span = xlim[1] - xlim[0]
+        if self._span is None or not np.isclose(span, self._span, rtol=1e-3):
+            self._span = span
+            self._user_view = False
+        if self._user_view and self._toolbar_at_home():
+            self._user_view = False
+        if self._user_view:
+            # 保持用户缩放/平移后的范围，只在这个范围内按全分辨率重新降采样
+            self._decimate_to_view()
+            self._refresh()
+            return
+        if ylim is None:
+            lows = [np.min(y) for _, y in self._data if len(y)]
+            highs = [np.max(y) for _, y in self._data if len(y)]
+            low, high = (min(lows), max(highs)) if lows else (-1.0, 1.0)
+            margin = (high - low) * 0.05 if high > low else 1.0
+            ylim = (low - margin, high + margin)
+        self._set_limits(xlim, ylim)
+        
+        self._decimate_to_view()
+        self._refresh()
+
+    def _ensure_lines(self, styles, legend):
+        key = tuple((fmt, tuple(sorted(kwargs.items()))) for fmt, kwargs in styles)
+        if key != self._line_styles:
+            for line in self._lines:
+                line.remove()
+            # animated=True 的曲线不参与整体重绘，由 blit 单独绘制
+            self._lines = [self.axes.plot([], [], fmt, animated=True, **kwargs)[0] for fmt, kwargs in styles]
+            self._line_styles = key
+            self._legend_labels = None
+            if self.axes.get_legend() is not None:
+                self.axes.get_legend().remove()
+            self._needs_full_draw = True
+            self._user_view = False  # 曲线组成变了，回到自动范围
+        if legend != self._legend_labels:
+            if self.axes.get_legend() is not None:
+                self.axes.get_legend().remove()
+            if legend:
+                self.axes.legend(self._lines, legend)
+            self._legend_labels = legend
+            self._needs_full_draw = True
+
+    def _set_limits(self, xlim, ylim):
+        if tuple(self.axes.get_xlim()) != tuple(xlim) or tuple(self.axes.get_ylim()) != tuple(ylim):
+            self._setting_limits = True
+            try:
+                self.axes.set_xlim(xlim)
+                self.axes.set_ylim(ylim)
+            finally:
+                self._setting_limits = False
+            self._needs_full_draw = True
+
+    def _decimate_to_view(self):
+        """按当前可见范围和像素宽度降采样"""
+        x_min, x_max = sorted(self.axes.get_xlim())
+        n_bins = max(100, int(self.axes.bbox.width))
+        for line, (t, y) in zip(self._lines, self._data):
+            if len(t) == 0:
+                line.set_data([], [])
+                continue
+            view = visible_slice(t, x_min, x_max)
+            line.set_data(*minmax_decimate(t[view], y[view], n_bins))
+
+    def _refresh(self):
+        if self._needs_full_draw or self._background is None:
+            if self._needs_layout:
+                self.fig.tight_layout()
+                self._needs_layout = False
+            self._needs_full_draw = False
+            self.draw()  # draw_event 中会保存背景并画出曲线
+            return
+        # 坐标轴没有变化：恢复背景后只重画曲线
+        self.restore_region(self._background)
+        for line in self._lines:
+            self.axes.draw_artist(line)
+        self.blit(self.axes.bbox)
+
+    def _on_draw(self, event):
+        self._background = self.copy_from_bbox(self.axes.bbox)
+        for line in self._lines:
+            self.axes.draw_artist(line)
+
+    def _on_resize(self, event):
+        self._needs_layout = True
+        self._needs_full_draw = True
+
+    def _toolbar_at_home(self):
+        """工具栏按过 Home（当前视图就是第一个视图）且没有正在进行的拖动"""
+        toolbar = getattr(self, 'toolbar', None)  # NavigationToolbar 创建时会设置 canvas.toolbar
+        if toolbar is None:
+            return False
+        stack = toolbar._nav_stack
+        dragging = getattr(toolbar, '_pan_info', None) is not None or getattr(toolbar, '_zoom_info', None) is not None
+        return len(stack) > 1 and stack() is stack[0] and not dragging
+
+    def _on_xlim_changed(self, axes):
+        # 用户缩放/平移时，按新的可见范围从全分辨率数据重新降采样，之后不再自动重设范围
+        if not self._setting_limits:
+            self._user_view = True
+            self._decimate_to_view()
+            self._needs_full_draw = True
+
+class SpectrumCanvas(FigureCanvas):
+    """频谱画布：analog / PWM / reconstructed 三路功率谱（对数频率轴），
+    并标出低通截止频率和PWM载波的前几次谐波，便于选择 pwm_frequency 和 cutoff_freq"""
+    
+    STYLES = (('analog', 'b-', 'Analog'), ('pwm', 'r-', 'PWM'), ('reconstructed', 'g-', 'Reconstructed'))
+    HARMONICS = 5
+    
+    def __init__(self, parent=None, width=15, height=3, dpi=100):
+        self.fig = Figure(figsize=(width, height), dpi=dpi)
+        self.axes = self.fig.add_subplot(111)
+        super().__init__(self.fig)
+        self.setParent(parent)
+        self.axes.set_xscale('log')
+        self.axes.grid(True, which='both', alpha=0.3)
+        self.axes.set_xlabel('Frequency (kHz)')
+        self.axes.set_ylabel('PSD (dB/Hz)')
+        self.axes.set_title('Spectrum (Welch)')
+        self._lines = {stage: self.axes.plot([], [], fmt, lw=0.8, label=label)[0]
+                       for stage, fmt, label in self.STYLES}
+        self._cutoff_line = self.axes.axvline(1.0, color='k', linestyle='--', lw=1, label='LPF Cutoff')
+        self._harmonic_lines = [self.axes.axvline(1.0, color='gray', linestyle=':', lw=1,
+                                                  label='PWM Harmonics' if k == 0 else None)
+                                for k in range(self.HARMONICS)]
+        self.axes.legend(loc='upper right', fontsize='small')
+        self._ylim = None
         self.fig.tight_layout()
-        self.draw()
+    
+    def plot_spectra(self, spectra, cutoff_freq, pwm_frequency, title):
+        """spectra: {信号名: (频率 Hz, 功率谱密度)}；cutoff_freq、pwm_frequency 单位为kHz"""
+        f_max = None
+        peak = None
+        for stage, line in self._lines.items():
+            if stage not in spectra:
+                line.set_data([], [])
+                continue
+            freqs, psd = spectra[stage]
+            # 对数频率轴上去掉直流分量
+            db = 10 * np.log10(np.maximum(psd[1:], 1e-20))
+            line.set_data(freqs[1:] / 1000, db)
+            f_max = freqs[-1] / 1000
+            f_min = freqs[1] / 1000
+            peak = db.max() if peak is None else max(peak, db.max())
+        if f_max is None:
+            return
+        self._cutoff_line.set_xdata([cutoff_freq, cutoff_freq])
+        for k, line in enumerate(self._harmonic_lines, 1):
+            line.set_xdata([k * pwm_frequency, k * pwm_frequency])
+        self.axes.set_xlim(f_min, f_max)
+        # y 轴按10 dB取整，峰值小幅波动时坐标轴不跳动
+        top = 10 * np.ceil(peak / 10) + 10
+        if self._ylim is None or self._ylim[1] != top:
+            self._ylim = (top - 120, top)
+            self.axes.set_ylim(*self._ylim)
+        self.axes.set_title(title)
+        self.draw_idle()
 
 class ADConverterApp(QMainWindow):
     def __init__(self):
@@ -72,9 +257,29 @@ class ADConverterApp(QMainWindow):
         
         # Initialize signal generation and timing variables first
         self.duration = 0.1  # 100ms of signal
+        self.tick_interval = 50  # 实时模式刷新间隔（ms）
         self.timer = QTimer()
-        self.timer.timeout.connect(self.update_signal)
+        self.timer.timeout.connect(self.stream_tick)
         self.is_running = False
+        self.stream = None  # 实时模式的流式信号链，按下Start时创建
+        self.capture_dir = "captures"  # 记录文件保存目录
+        self.recorder = None  # 正在写入的记录
+        self.reader = None    # 正在回放的记录
+        
+        # 频谱在后台线程中计算，界面定时取最新结果，不会被FFT阻塞
+        self.spectrum = BackgroundSpectrum()
+        self.spectrum_version = 0
+        self.spectrum_params = None  # 与最近一次提交的频谱数据对应的参数
+        self.spectrum_timer = QTimer()
+        self.spectrum_timer.timeout.connect(self.refresh_spectrum)
+        self.spectrum_timer.start(100)
+        
+        # 参数变化先去抖合并，再在工作线程里重算，界面线程只负责绘图
+        self.scheduler = RecomputeScheduler(partial(compute_chain, duration=self.duration))
+        self.last_params = None  # 最近一次计算结果，切换显示通道时不必重算
+        self.last_result = None
+        self.scheduler.result_ready.connect(self.on_chain_result)
+        self.scheduler.stats_changed.connect(self.on_scheduler_stats)
         
         # Now initialize the UI
         self.initUI()
@@ -88,7 +293,7 @@ class ADConverterApp(QMainWindow):
     def initUI(self):
         # Window title
         self.setWindowTitle('Satellite Communication Simulation - ADC Module')
-        self.setGeometry(100, 100, 1600, 700)  # 扩大窗口宽度以容纳三个图表
+        self.setGeometry(100, 100, 1600, 950)  # 扩大窗口以容纳三个波形图和下方的频谱图
         
         # Main layout with splitter
         central_widget = QWidget()
@@ -97,7 +302,18 @@ class ADConverterApp(QMainWindow):
         
         # Create a horizontal splitter
         splitter = QSplitter(Qt.Horizontal)
-        main_layout.addWidget(splitter)
+        
+        # 波形区在上，频谱图在下，中间可以拖动
+        vertical_splitter = QSplitter(Qt.Vertical)
+        main_layout.addWidget(vertical_splitter)
+        vertical_splitter.addWidget(splitter)
+        spectrum_widget = QWidget()
+        spectrum_layout = QVBoxLayout(spectrum_widget)
+        self.spectrum_canvas = SpectrumCanvas(self)
+        spectrum_layout.addWidget(NavigationToolbar(self.spectrum_canvas, self))
+        spectrum_layout.addWidget(self.spectrum_canvas)
+        vertical_splitter.addWidget(spectrum_widget)
+        vertical_splitter.setSizes([650, 300])
         
         # Left, middle, and right widgets
         left_widget = QWidget()
@@ -114,14 +330,17 @@ class ADConverterApp(QMainWindow):
         
         # Input signal canvas
         self.input_canvas = SignalCanvas(self, width=5, height=4)
+        left_layout.addWidget(NavigationToolbar(self.input_canvas, self))
         left_layout.addWidget(self.input_canvas)
         
         # Output signal canvas (PWM)
         self.output_canvas = SignalCanvas(self, width=5, height=4)
+        middle_layout.addWidget(NavigationToolbar(self.output_canvas, self))
         middle_layout.addWidget(self.output_canvas)
         
         # Reconstructed signal canvas
         self.reconstructed_canvas = SignalCanvas(self, width=5, height=4)
+        right_layout.addWidget(NavigationToolbar(self.reconstructed_canvas, self))
         right_layout.addWidget(self.reconstructed_canvas)
         
         # Input parameters group
@@ -158,6 +377,26 @@ class ADConverterApp(QMainWindow):
         self.duty_cycle.valueChanged.connect(self.update_signal)
         input_params_layout.addWidget(self.duty_cycle, 3, 1)
         
+        # Multi-channel batch simulation
+        input_params_layout.addWidget(QLabel("Channels:"), 4, 0)
+        self.channels = QSpinBox()
+        self.channels.setRange(1, 64)
+        self.channels.setValue(1)
+        self.channels.valueChanged.connect(self.on_channels_changed)
+        input_params_layout.addWidget(self.channels, 4, 1)
+        
+        # Which channel the canvases show
+        input_params_layout.addWidget(QLabel("Show Channel:"), 5, 0)
+        self.display_channel = QSpinBox()
+        self.display_channel.setRange(0, 0)
+        self.display_channel.valueChanged.connect(self.show_channel)
+        input_params_layout.addWidget(self.display_channel, 5, 1)
+        
+        # Batch throughput
+        input_params_layout.addWidget(QLabel("Throughput:"), 6, 0)
+        self.batch_monitor = QLabel("1 ch")
+        input_params_layout.addWidget(self.batch_monitor, 6, 1)
+        
         # AD conversion parameters group
         output_group = QGroupBox("ADC Parameters")
         output_params_layout = QGridLayout()
@@ -195,10 +434,18 @@ class ADConverterApp(QMainWindow):
         self.pwm_frequency.valueChanged.connect(self.update_signal)
         output_params_layout.addWidget(self.pwm_frequency, 3, 1)
         
+        # PWM carrier shape
+        output_params_layout.addWidget(QLabel("PWM Carrier:"), 4, 0)
+        self.pwm_carrier = QComboBox()
+        self.pwm_carrier.addItems(["Edge-aligned", "Center-aligned"])
+        self.pwm_carrier.setCurrentIndex(0)
+        self.pwm_carrier.currentIndexChanged.connect(self.update_signal)
+        output_params_layout.addWidget(self.pwm_carrier, 4, 1)
+        
         # Monitoring display
-        output_params_layout.addWidget(QLabel("Monitor:"), 4, 0)
+        output_params_layout.addWidget(QLabel("Monitor:"), 5, 0)
         self.monitor = QLabel("采样点: 0, 数字值: 0")
-        output_params_layout.addWidget(self.monitor, 4, 1)
+        output_params_layout.addWidget(self.monitor, 5, 1)
         
         # DA conversion parameters group
         reconst_group = QGroupBox("DAC Parameters")
@@ -226,23 +473,36 @@ class ADConverterApp(QMainWindow):
         # Filter type
         reconst_params_layout.addWidget(QLabel("Filter Type:"), 2, 0)
         self.filter_type = QComboBox()
-        self.filter_type.addItems(["Moving Avg", "Butterworth"])
+        self.filter_type.addItems(["Moving Avg"] + list(FILTER_FAMILIES))
         self.filter_type.setCurrentIndex(0)
         self.filter_type.currentIndexChanged.connect(self.update_signal)
         reconst_params_layout.addWidget(self.filter_type, 2, 1)
         
+        # Moving average stages (cascaded boxcar)
+        reconst_params_layout.addWidget(QLabel("MA Stages:"), 3, 0)
+        self.ma_stages = QSpinBox()
+        self.ma_stages.setRange(1, 4)
+        self.ma_stages.setValue(1)
+        self.ma_stages.valueChanged.connect(self.update_signal)
+        reconst_params_layout.addWidget(self.ma_stages, 3, 1)
+        
         # Show original signal option
-        reconst_params_layout.addWidget(QLabel("Show Original:"), 3, 0)
+        reconst_params_layout.addWidget(QLabel("Show Original:"), 4, 0)
         self.show_original = QComboBox()
         self.show_original.addItems(["Yes", "No"])
         self.show_original.setCurrentIndex(0)
         self.show_original.currentIndexChanged.connect(self.update_signal)
-        reconst_params_layout.addWidget(self.show_original, 3, 1)
+        reconst_params_layout.addWidget(self.show_original, 4, 1)
         
         # Reconstructed signal monitoring
-        reconst_params_layout.addWidget(QLabel("Quality:"), 4, 0)
+        reconst_params_layout.addWidget(QLabel("Quality:"), 5, 0)
         self.recon_monitor = QLabel("Error: 0V, SNR: 0dB")
-        reconst_params_layout.addWidget(self.recon_monitor, 4, 1)
+        reconst_params_layout.addWidget(self.recon_monitor, 5, 1)
+        
+        # Filter design cache statistics
+        reconst_params_layout.addWidget(QLabel("Filter Cache:"), 6, 0)
+        self.cache_monitor = QLabel("Hits: 0, Misses: 0")
+        reconst_params_layout.addWidget(self.cache_monitor, 6, 1)
         
         # Control buttons
         control_layout = QHBoxLayout()
@@ -256,153 +516,216 @@ class ADConverterApp(QMainWindow):
         self.reset_button.clicked.connect(self.reset_simulation)
         control_layout.addWidget(self.reset_button)
         
+        # 长时间记录：实时模式的每一块都写入磁盘
+        self.record_button = QPushButton("Record")
+        self.record_button.setCheckable(True)
+        self.record_button.toggled.connect(self.toggle_recording)
+        control_layout.addWidget(self.record_button)
+        
+        # 打开记录后 Start 按钮用于回放，滑块选择显示窗口的位置
+        self.open_capture_button = QPushButton("Open Capture")
+        self.open_capture_button.clicked.connect(self.toggle_capture)
+        control_layout.addWidget(self.open_capture_button)
+        
+        self.playback_slider = QSlider(Qt.Horizontal)
+        self.playback_slider.setEnabled(False)
+        self.playback_slider.valueChanged.connect(self.show_capture_window)
+        control_layout.addWidget(self.playback_slider, 1)
+        
+        self.capture_monitor = QLabel("No capture")
+        control_layout.addWidget(self.capture_monitor)
+        
+        # 状态栏显示后台重算的队列深度和耗时
+        self.statusBar().showMessage("Queue: 0, Latency: 0.0 ms")
+        
     def on_wave_type_changed(self):
         # Enable/disable duty cycle based on wave type
         wave_type = self.wave_type.currentText()
         self.duty_cycle.setEnabled(wave_type == "Square")
         self.update_signal()
         
+    def collect_params(self):
+        """从界面控件读取当前参数"""
+        return {
+            'wave_type': self.wave_type.currentText(),
+            'frequency': 10.0,  # 固定10kHz
+            'amplitude': self.amplitude.value(),
+            'duty_cycle': self.duty_cycle.value() / 100,  # Convert to fraction
+            'sample_rate': self.sample_rate.value(),  # kHz
+            'bits': 8,  # 固定8位
+            'ref_voltage': self.ref_voltage.value(),
+            'pwm_frequency': self.pwm_frequency.value(),  # kHz
+            'pwm_carrier': "center" if self.pwm_carrier.currentIndex() == 1 else "edge",
+            'cutoff_freq': self.cutoff_freq.value(),  # kHz
+            'filter_order': self.filter_order.value(),
+            'filter_type': self.filter_type.currentText(),
+            'ma_stages': self.ma_stages.value(),
+            'show_original': self.show_original.currentText() == "Yes",
+            'channels': self.channels.value(),
+        }
+        
     def update_signal(self):
         try:
             # Get parameters
-            wave_type = self.wave_type.currentText()
-            frequency = 10.0  # 固定10kHz
-            amplitude = self.amplitude.value()
-            duty_cycle = self.duty_cycle.value() / 100  # Convert to fraction
-            sample_rate = self.sample_rate.value()  # kHz
-            bits = 8  # 固定8位
-            ref_voltage = self.ref_voltage.value()
-            pwm_frequency = self.pwm_frequency.value()  # kHz
-            cutoff_freq = self.cutoff_freq.value()  # kHz
-            filter_order = self.filter_order.value()
-            filter_type = self.filter_type.currentText()
-            show_original = self.show_original.currentText() == "Yes"
-            
-            # 生成时间轴，采样率为kHz，需乘1000
-            t = np.linspace(0, self.duration, int(self.duration * sample_rate * 1000), endpoint=False)
-
-            # 波形生成公式 frequency 直接用kHz
-            if wave_type == "Sine":
-                analog_signal = amplitude * np.sin(2 * np.pi * frequency * t)
-                signal_title = f"Sine Wave (Fixed 10kHz, Amplitude: {amplitude}V)"
-                
-            elif wave_type == "Square":
-                analog_signal = amplitude * (((t * frequency) % 1) < duty_cycle).astype(float)
-                analog_signal = analog_signal * 2 - amplitude  # Center around 0
-                signal_title = f"Square Wave (Fixed 10kHz, Amplitude: {amplitude}V, Duty: {duty_cycle*100}%)"
-                
-            elif wave_type == "Triangle":
-                analog_signal = amplitude * 2 * np.abs(2 * ((t * frequency) % 1) - 1) - amplitude
-                signal_title = f"Triangle Wave (Fixed 10kHz, Amplitude: {amplitude}V)"
-            
-            # Plot analog signal
-            self.input_canvas.plot_analog_signal(t, analog_signal, signal_title)
-            
-            # Perform AD conversion to get digital values (quantized levels)
-            digital_values = self.analog_to_digital_values(analog_signal, bits, ref_voltage)
-            
-            # Convert digital values to PWM signal
-            pwm_signal = self.digital_to_pwm(t, digital_values, bits, pwm_frequency)
-            
-            # Plot PWM signal
-            output_title = f"Converted Wave (8-bit ADC, PWM Freq: {pwm_frequency}kHz)"
-            self.output_canvas.plot_digital_signal(t, pwm_signal, output_title, bits)
+            params = self.collect_params()
             
-            # Convert PWM signal back to analog
-            reconstructed_signal = self.pwm_to_analog(t, pwm_signal, cutoff_freq, filter_order, ref_voltage, filter_type)
+            # 回放时显示的是记录下来的数据，参数变化不影响画面
+            if self.reader is not None:
+                return
             
-            # Calculate error metrics
-            if len(analog_signal) > 0:
-                rmse = np.sqrt(np.mean((analog_signal - reconstructed_signal) ** 2))
-                if np.sum(analog_signal ** 2) > 0:
-                    snr = 10 * np.log10(np.sum(analog_signal ** 2) / np.sum((analog_signal - reconstructed_signal) ** 2))
-                else:
-                    snr = 0
-                self.recon_monitor.setText(f"Error: {rmse:.3f} V, SNR: {snr:.2f} dB")
+            # 实时模式下参数变化只更新流式信号链，下一次定时器触发时生效
+            if self.is_running and self.stream is not None:
+                self.stream.configure(params)
+                if self.recorder is not None:
+                    self.recorder.mark(params)
+                return
             
-            # Plot reconstructed signal
-            recon_title = f"Reconstructed Wave (滤波器截止: {cutoff_freq}kHz, 类型: {filter_type})"
-            original_signal = analog_signal if show_original else None
-            self.reconstructed_canvas.plot_reconstructed_signal(t, reconstructed_signal, recon_title, original_signal)
-            
-            # Update monitoring display
-            if len(t) > 0:
-                midpoint_idx = len(t) // 2
-                digital_value = digital_values[midpoint_idx]
-                max_val = 2**bits - 1
-                duty_cycle_percentage = (digital_value / max_val) * 100
-                self.monitor.setText(f"T: {t[midpoint_idx]:.4f}s, V: {analog_signal[midpoint_idx]:.2f}V, "
-                                   f"D: {int(digital_value)}, PWM: {duty_cycle_percentage:.1f}%")
+            # 交给后台线程计算，结果通过 on_chain_result 回到界面线程
+            self.scheduler.request(params)
         except Exception as e:
             print(f"错误: {e}")
             # 在遇到错误时仍然保持基本UI功能
     
+    def on_chain_result(self, params, result):
+        """后台计算完成（且参数没有再变化）时绘图"""
+        self.last_params = params
+        self.last_result = result
+        self.show_channel()
+        self.update_cache_monitor()
+    
+    def on_channels_changed(self):
+        self.display_channel.setRange(0, self.channels.value() - 1)
+        self.update_signal()
+    
+    def show_channel(self):
+        """显示最近一次结果中选中的通道（多通道时只取一行，不重算）"""
+        params, result = self.last_params, self.last_result
+        if result is None:
+            return
+        try:
+            if result['analog'].ndim == 1:
+                self.show_results(params, result['t'], result['analog'], result['digital'],
+                                  result['pwm'], result['reconstructed'], result['rmse'], result['snr'])
+                self.submit_spectrum(params, result, reset=True)
+                self.batch_monitor.setText("1 ch")
+                return
+            ch = min(self.display_channel.value(), len(result['analog']) - 1)
+            # 标题和量化参数按该通道自己的配置显示
+            channel_params = dict(params)
+            channel_params.update(result['channels'][ch])
+            self.show_results(channel_params, result['t'], result['analog'][ch], result['digital'][ch],
+                              result['pwm'][ch], result['reconstructed'][ch], result['rmse'][ch], result['snr'][ch])
+            self.submit_spectrum(channel_params, {stage: result[stage][ch]
+                                                  for stage in ('analog', 'pwm', 'reconstructed')}, reset=True)
+            self.batch_monitor.setText(f"{len(result['analog'])} ch, {result['throughput'] / 1e6:.1f} MS/s, "
+                                       f"avg SNR: {np.mean(result['snr']):.2f} dB")
+        except Exception as e:
+            print(f"错误: {e}")
+    
+    def submit_spectrum(self, params, chunk, reset=False):
+        """把一块数据交给后台频谱线程；reset=True 表示整段重新计算（与之前的数据无关）"""
+        self.spectrum_params = params
+        self.spectrum.submit(chunk, params['sample_rate'] * 1000, reset)
+    
+    def refresh_spectrum(self):
+        """频谱定时器回调：后台有新结果时才重绘"""
+        version, spectra = self.spectrum.latest()
+        if version == self.spectrum_version or not spectra or self.spectrum_params is None:
+            return
+        self.spectrum_version = version
+        params = self.spectrum_params
+        self.spectrum_canvas.plot_spectra(
+            spectra, params['cutoff_freq'], params['pwm_frequency'],
+            f"Spectrum (Welch, {self.spectrum.last_latency * 1000:.1f} ms/chunk, "
+            f"dropped: {self.spectrum.dropped}"
+            + (f", errors: {self.spectrum.errors}" if self.spectrum.errors else "") + ")")
+    
+    def on_scheduler_stats(self, stats):
+        self.statusBar().showMessage(
+            f"Queue: {stats['queue_depth']}, Latency: {stats['latency_ms']:.1f} ms, "
+            f"Coalesced: {stats['coalesced']}, Dropped: {stats['dropped']}")
+    
+    def update_cache_monitor(self):
+        stats = FILTER_CACHE.stats()
+        self.cache_monitor.setText(f"Hits: {stats['hits']}, Misses: {stats['misses']}")
+    
+    def stream_tick(self):
+        """实时模式的定时器回调：只计算新到的一块样本，再显示最近一个窗口"""
+        if self.reader is not None:
+            self.playback_tick()
+            return
+        try:
+            chunk = self.stream.advance(self.tick_interval / 1000)
+            if self.recorder is not None:
+                if self.recorder.fs != self.stream.fs:
+                    # 一个记录只能有一个采样率，采样率变化后另起一个记录
+                    self.stop_recording()
+                    self.start_recording()
+                self.recorder.append(chunk)
+                self.capture_monitor.setText(f"REC {self.recorder.duration:.2f} s, "
+                                             f"{self.recorder.bytes_written / 1e6:.1f} MB")
+            self.submit_spectrum(self.stream.params, chunk)
+            window = self.stream.window()
+            self.show_results(self.stream.params, window['t'], window['analog'], window['digital'],
+                              window['pwm'], window['reconstructed'])
+        except Exception as e:
+            print(f"错误: {e}")
+    
+    def show_results(self, params, t, analog_signal, digital_values, pwm_signal, reconstructed_signal,
+                     rmse=None, snr=None):
+        """绘制三个画布并刷新监控信息"""
+        amplitude = params['amplitude']
+        duty_cycle = params['duty_cycle']
+        bits = params['bits']
+        wave_type = params['wave_type']
+        if wave_type == "Sine":
+            signal_title = f"Sine Wave (Fixed 10kHz, Amplitude: {amplitude}V)"
+        elif wave_type == "Square":
+            signal_title = f"Square Wave (Fixed 10kHz, Amplitude: {amplitude}V, Duty: {duty_cycle*100}%)"
+        else:
+            signal_title = f"Triangle Wave (Fixed 10kHz, Amplitude: {amplitude}V)"
+        
+        # Plot analog signal
+        self.input_canvas.plot_analog_signal(t, analog_signal, signal_title)
+        
+        # Plot PWM signal
+        output_title = f"Converted Wave (8-bit ADC, PWM Freq: {params['pwm_frequency']}kHz)"
+        self.output_canvas.plot_digital_signal(t, pwm_signal, output_title, bits)
+        
+        # Calculate error metrics
+        if len(analog_signal) > 0:
+            if rmse is None:
+                rmse, snr = quality_metrics(analog_signal, reconstructed_signal)
+            self.recon_monitor.setText(f"Error: {rmse:.3f} V, SNR: {snr:.2f} dB")
+        
+        # Plot reconstructed signal
+        recon_title = f"Reconstructed Wave (滤波器截止: {params['cutoff_freq']}kHz, 类型: {params['filter_type']})"
+        original_signal = analog_signal if params['show_original'] else None
+        self.reconstructed_canvas.plot_reconstructed_signal(t, reconstructed_signal, recon_title, original_signal)
+        
+        # Update monitoring display
+        if len(t) > 0:
+            midpoint_idx = len(t) // 2
+            digital_value = digital_values[midpoint_idx]
+            max_val = 2**bits - 1
+            duty_cycle_percentage = (digital_value / max_val) * 100
+            self.monitor.setText(f"T: {t[midpoint_idx]:.4f}s, V: {analog_signal[midpoint_idx]:.2f}V, "
+                               f"D: {int(digital_value)}, PWM: {duty_cycle_percentage:.1f}%")
+    
     def analog_to_digital_values(self, analog_signal, bits, reference_voltage):
         """将模拟信号转换为数字值（量化级别）"""
-        # Clip signal to reference voltage range
-        clipped_signal = np.clip(analog_signal, -reference_voltage, reference_voltage)
-        
-        # Calculate max digital value
-        max_val = 2**bits - 1
-        
-        # Normalize to 0 - max_val range1111
-        normalized = ((clipped_signal + reference_voltage) / (2 * reference_voltage)) * max_val
-        
-        # Round to nearest integer and clip to valid range
-        digital_values = np.round(normalized).clip(0, max_val)
-        
-        return digital_values
+        return analog_to_digital_values(analog_signal, bits, reference_voltage)
     
-    def digital_to_pwm(self, t, digital_values, bits, pwm_frequency):
+    def digital_to_pwm(self, t, digital_values, bits, pwm_frequency, carrier="edge"):
         """将数字值转换为PWM信号"""
-        # pwm_frequency 单位为kHz
-        max_val = 2**bits - 1
-        pwm_period = 1.0 / (pwm_frequency * 1000)  # kHz转Hz
-        pwm_signal = np.zeros_like(t)
-        for i, time in enumerate(t):
-            position_in_period = (time % pwm_period) / pwm_period
-            duty_cycle = digital_values[i] / max_val
-            if position_in_period < duty_cycle:
-                pwm_signal[i] = 1.0
-            else:
-                pwm_signal[i] = 0.0
-        return pwm_signal
+        # pwm_frequency 单位为kHz，整块数组一次完成比较，不再逐点循环
+        return pwm_modulate(t, digital_values, bits, pwm_frequency, carrier)
     
-    def pwm_to_analog(self, t, pwm_signal, cutoff_freq, filter_order, reference_voltage, filter_type):
+    def pwm_to_analog(self, t, pwm_signal, cutoff_freq, filter_order, reference_voltage, filter_type, ma_stages=1):
         """将PWM信号转换回模拟信号，使用低通滤波器模拟DA转换过程"""
-        # 计算采样频率
-        if len(t) < 2:
-            return np.zeros_like(pwm_signal)
-            
-        fs = 1.0 / (t[1] - t[0])  # 采样频率
-
-        if filter_type == "Moving Avg":
-            # 使用移动平均滤波
-            window_size = max(1, int((1.0 / (cutoff_freq * 1000)) * fs))
-            kernel = np.ones(window_size) / window_size
-            filtered = np.convolve(pwm_signal, kernel, mode='same')
-        else:
-            # 使用巴特沃斯滤波器
-            try:
-                # 确保归一化截止频率在有效范围内
-                nyq = 0.5 * fs  # 奈奎斯特频率
-                normal_cutoff = min(0.99, cutoff_freq * 1000 / nyq)  # 归一化截止频率限制在0.99以下
-                
-                # 设计滤波器
-                b, a = sg.butter(filter_order, normal_cutoff, btype='low', analog=False)
-                
-                # 应用滤波器
-                filtered = sg.filtfilt(b, a, pwm_signal)
-            except Exception as e:
-                print(f"滤波器错误: {e}")
-                # 如果巴特沃斯滤波器出错，回退到移动平均
-                window_size = max(1, int((1.0 / (cutoff_freq * 1000)) * fs))
-                kernel = np.ones(window_size) / window_size
-                filtered = np.convolve(pwm_signal, kernel, mode='same')
-        
-        # 将滤波后的PWM信号映射回模拟电压范围
-        reconstructed_signal = (filtered * 2 - 1) * reference_voltage
-        
+        reconstructed_signal = pwm_to_analog(t, pwm_signal, cutoff_freq, filter_order, reference_voltage,
+                                             filter_type, ma_stages)
+        self.update_cache_monitor()
         return reconstructed_signal
     
     def toggle_simulation(self):
@@ -411,10 +734,117 @@ class ADConverterApp(QMainWindow):
             self.start_button.setText("Start")
             self.is_running = False
         else:
-            self.timer.start(50)  # Update every 50ms
+            # 暂停后继续时沿用原来的信号链，时间轴和滤波器状态保持连续
+            if self.stream is None:
+                self.stream = StreamingChain(self.collect_params(), self.duration)
+            else:
+                self.stream.configure(self.collect_params())
+            self.timer.start(self.tick_interval)  # Update every 50ms
             self.start_button.setText("Pause")
             self.is_running = True
     
+    def toggle_recording(self, checked):
+        if checked:
+            if self.reader is not None:
+                self.close_capture()
+            self.start_recording()
+            if not self.is_running:
+                self.toggle_simulation()
+        else:
+            self.stop_recording()
+    
+    def start_recording(self):
+        """从流式信号链的当前时间开始一个新记录"""
+        if self.stream is None:
+            self.stream = StreamingChain(self.collect_params(), self.duration)
+        else:
+            self.stream.configure(self.collect_params())
+        # 采样率变化时会在同一秒内结束并重新开始记录，目录名带毫秒，重名时再加序号
+        now = time.time()
+        base = os.path.join(self.capture_dir, time.strftime("mode1_%Y%m%d_%H%M%S", time.localtime(now))
+                            + f"_{int(now * 1000) % 1000:03d}")
+        path, count = base, 1
+        while os.path.exists(path):
+            path = f"{base}_{count}"
+            count += 1
+        self.recorder = CaptureWriter(path, self.stream.fs, self.stream.params, start_time=self.stream.time)
+        self.capture_monitor.setText(f"REC {path}")
+    
+    def stop_recording(self):
+        if self.recorder is None:
+            return
+        self.recorder.close()
+        self.capture_monitor.setText(f"Saved {self.recorder.path} ({self.recorder.duration:.2f} s)")
+        self.recorder = None
+    
+    def toggle_capture(self):
+        if self.reader is not None:
+            self.close_capture()
+            return
+        path = QFileDialog.getExistingDirectory(self, "Open Capture", self.capture_dir)
+        if path:
+            self.open_capture(path)
+    
+    def open_capture(self, path):
+        """打开记录目录进入回放：画布显示记录中 duration 长的窗口，滑块单位为毫秒"""
+        if self.record_button.isChecked():
+            self.record_button.setChecked(False)
+        if self.is_running:
+            self.toggle_simulation()
+        try:
+            reader = CaptureReader(path)
+        except Exception as e:
+            print(f"错误: {e}")
+            return
+        if self.reader is not None:
+            self.reader.close()
+        self.reader = reader
+        self.open_capture_button.setText("Close Capture")
+        self.playback_slider.blockSignals(True)
+        self.playback_slider.setRange(0, max(0, int((reader.duration - self.duration) * 1000)))
+        self.playback_slider.setValue(0)
+        self.playback_slider.blockSignals(False)
+        self.playback_slider.setEnabled(True)
+        self.show_capture_window()
+    
+    def close_capture(self):
+        if self.reader is None:
+            return
+        if self.is_running:
+            self.toggle_simulation()
+        self.reader.close()
+        self.reader = None
+        self.open_capture_button.setText("Open Capture")
+        self.playback_slider.setEnabled(False)
+        self.capture_monitor.setText("No capture")
+        self.update_signal()
+    
+    def show_capture_window(self):
+        """从记录中只读出滑块位置开始的一个窗口并显示"""
+        if self.reader is None:
+            return
+        try:
+            offset = self.playback_slider.value() / 1000
+            start_time = self.reader.start_time + offset
+            window = self.reader.window(start_time, self.duration)
+            params = self.reader.params_at(start_time)
+            self.show_results(params, window['t'], window['analog'],
+                              window['digital'], window['pwm'], window['reconstructed'])
+            self.submit_spectrum(params, window, reset=True)
+            self.capture_monitor.setText(f"{offset:.2f} / {self.reader.duration:.2f} s "
+                                         f"({len(self.reader)} samples)")
+        except Exception as e:
+            print(f"错误: {e}")
+    
+    def playback_tick(self):
+        """回放模式的定时器回调：窗口按实时速度向前移动，到结尾后停止"""
+        position = self.playback_slider.value() + self.tick_interval
+        if position > self.playback_slider.maximum():
+            self.playback_slider.setValue(self.playback_slider.maximum())
+            self.toggle_simulation()
+            return
+        self.playback_slider.setValue(position)
+    
     def reset_simulation(self):
         # Reset parameters to default
         self.wave_type.setCurrentIndex(0)
@@ -425,17 +855,33 @@ class ADConverterApp(QMainWindow):
         # 移除位数重置
         self.ref_voltage.setValue(5.0)
         self.pwm_frequency.setValue(0.5)
+        self.pwm_carrier.setCurrentIndex(0)
         self.cutoff_freq.setValue(20.0)
         self.filter_order.setValue(4)
         self.filter_type.setCurrentIndex(0)
+        self.ma_stages.setValue(1)
+        self.channels.setValue(1)
         
         # Stop simulation if running
+        self.record_button.setChecked(False)
+        self.close_capture()
         if self.is_running:
             self.toggle_simulation()
+        self.stream = None  # 重新开始时时间轴从0开始
         
         # Update signal
         self.update_signal()
 
+    def closeEvent(self, event):
+        self.timer.stop()
+        self.spectrum_timer.stop()
+        self.spectrum.stop()
+        self.stop_recording()
+        if self.reader is not None:
+            self.reader.close()
+        self.scheduler.shutdown()
+        super().closeEvent(event)
+
 def main():
     app = QApplication(sys.argv)
     window = ADConverterApp()
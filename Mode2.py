@@ -1,28 +1,38 @@
 import tkinter as tk
-from tkinter import ttk
 import random
-import datetime
 import time
 import threading
 import sys  # 添加这行导入语句
+from interleavers import get_interleaver
+from rate_matching import puncture_indices, rate_match_indices
+from codebook import CodebookEncoder
+from codeword import Codeword
+from monitor_log import MonitorLog, VirtualLogView
+from encode_producer import POLICIES, EncodeProducer
 
 class TurboEncoder:
     """Implementation of a simplified Turbo encoder for satellite communications"""
     
-    def __init__(self):
-        pass
+    def __init__(self, interleaver="auto", puncture=None, target_length=None, rv=0):
+        # Interleaver family (see interleavers.py); "auto" keeps the original
+        # (3*i + 7) % L pattern whenever it is a valid permutation
+        self.interleaver = interleaver
+        # Optional puncturing pattern ("1/2", "2/3", "3/4" or a 3-row matrix) or
+        # circular-buffer rate matching to target_length bits (see rate_matching.py)
+        self.puncture = puncture
+        self.target_length = target_length
+        self.rv = rv
         
     def interleave(self, bits):
         """Interleave the input bits according to a predefined pattern"""
-        length = len(bits)
-        result = [0] * length
-        
-        # Simple interleaving pattern (more complex in real systems)
-        for i in range(length):
-            new_pos = (3 * i + 7) % length
-            result[new_pos] = bits[i]
-            
-        return result
+        # Permutation is built once per (family, length) and cached
+        permutation = get_interleaver(self.interleaver, len(bits)).permutation
+        return [bits[j] for j in permutation]
+    
+    def deinterleave(self, bits):
+        """Undo interleave() using the cached inverse permutation"""
+        inverse = get_interleaver(self.interleaver, len(bits)).inverse
+        return [bits[j] for j in inverse]
     
     def rsc_encode(self, bits, initial_state=0):
         """Recursive Systematic Convolutional (RSC) encoder"""
@@ -58,9 +68,14 @@ class TurboEncoder:
         parity2 = self.rsc_encode(interleaved_bits)
         
         # Combine all bits to form the complete Turbo code
-        # In a real system, puncturing might be applied here to reduce redundancy
         encoded = systematic_bits + parity1 + parity2
         
+        # Puncturing / rate matching: keep the precomputed positions only
+        if self.target_length is not None:
+            encoded = [encoded[i] for i in rate_match_indices(len(input_bits), self.target_length, self.rv)]
+        elif self.puncture is not None:
+            encoded = [encoded[i] for i in puncture_indices(self.puncture, len(input_bits))]
+        
         return {
             'encoded': encoded,
             'components': {
@@ -69,15 +84,10 @@ class TurboEncoder:
                 'parity2': parity2
             }
         }
-
-def monitor(tag, data):
-    """Monitoring function to log system activity"""
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-    return {
-        'tag': tag,
-        'data': data,
-        'timestamp': timestamp
-    }
+    
+    def encode_codeword(self, input_bits):
+        """Encode into a packed Codeword (components only; puncturing is not applied)"""
+        return Codeword.from_result(self.encode(input_bits))
 
 class SatelliteEncodingApp:
     def __init__(self, root):
@@ -86,7 +96,8 @@ class SatelliteEncodingApp:
         self.root.geometry("800x700")
         self.root.configure(bg="#f0f0f0")
         
-        self.encoder = TurboEncoder()
+        # 16-bit blocks are looked up in a precomputed codebook (same output as TurboEncoder)
+        self.encoder = CodebookEncoder()
         self.input_data = []
         self.encoded_data = {
             'encoded': [],
@@ -97,7 +108,11 @@ class SatelliteEncodingApp:
             }
         }
         self.monitoring_enabled = False
-        self.monitoring_logs = []
+        # Ring buffer of compact records; strings are only built for the rows on screen
+        self.monitor_log = MonitorLog(capacity=100000, max_bits=16)
+        # High-rate mode: blocks are generated and encoded off the Tk thread
+        self.producer = None
+        self.display_ms = 200
         
         self.setup_ui()
         self.generate_and_process_data()
@@ -169,6 +184,38 @@ class SatelliteEncodingApp:
         )
         self.generate_button.pack(pady=(0, 5))
         
+        # High-rate producer controls
+        producer_frame = tk.LabelFrame(main_frame, text="High-Rate Producer", padx=10, pady=5, bg="white")
+        producer_frame.pack(fill="x", pady=(0, 10))
+        
+        tk.Label(producer_frame, text="Rate (blocks/s, 0 = max):", bg="white").pack(side="left")
+        self.rate_var = tk.StringVar(value="10000")
+        tk.Spinbox(
+            producer_frame,
+            from_=0,
+            to=10000000,
+            increment=1000,
+            textvariable=self.rate_var,
+            width=9
+        ).pack(side="left", padx=(5, 10))
+        
+        tk.Label(producer_frame, text="When full:", bg="white").pack(side="left")
+        self.policy_var = tk.StringVar(value=POLICIES[0])
+        tk.OptionMenu(producer_frame, self.policy_var, *POLICIES).pack(side="left", padx=(5, 10))
+        
+        self.producer_button = tk.Button(
+            producer_frame,
+            text="Start",
+            command=self.toggle_producer,
+            bg="#27ae60",
+            fg="white",
+            padx=10
+        )
+        self.producer_button.pack(side="left")
+        
+        self.producer_stats = tk.Label(producer_frame, text="Idle", font=("Courier", 10), bg="white", anchor="w")
+        self.producer_stats.pack(side="left", fill="x", expand=True, padx=(10, 0))
+        
         # Monitoring toggle
         monitor_frame = tk.Frame(main_frame, bg="#f0f0f0")
         monitor_frame.pack(fill="x", pady=5)
@@ -189,20 +236,9 @@ class SatelliteEncodingApp:
         self.monitoring_frame.pack(fill="both", expand=True, pady=5)
         self.monitoring_frame.pack_forget()  # Hidden initially
         
-        # Create a canvas with scrollbar for the monitoring logs
-        self.canvas = tk.Canvas(self.monitoring_frame, bg="white")
-        self.scrollbar = ttk.Scrollbar(self.monitoring_frame, orient="vertical", command=self.canvas.yview)
-        self.canvas.configure(yscrollcommand=self.scrollbar.set)
-        
-        self.scrollbar.pack(side="right", fill="y")
-        self.canvas.pack(side="left", fill="both", expand=True)
-        
-        # Frame inside canvas for logs
-        self.logs_frame = tk.Frame(self.canvas, bg="white")
-        self.canvas_window = self.canvas.create_window((0, 0), window=self.logs_frame, anchor="nw")
-        
-        self.logs_frame.bind("<Configure>", self.on_frame_configure)
-        self.canvas.bind("<Configure>", self.on_canvas_configure)
+        # Virtualized log view: a fixed pool of row widgets for the visible entries only
+        self.log_view = VirtualLogView(self.monitoring_frame, self.monitor_log)
+        self.log_view.pack(fill="both", expand=True)
         
         # Module information
         info_frame = tk.LabelFrame(main_frame, text="Module Information", padx=10, pady=10, bg="white")
@@ -225,14 +261,6 @@ wo kao zhege zhende you dian fan er qie haonan woqu xiang tui xue le wo qu
         )
         info_label.pack(fill="x")
     
-    def on_frame_configure(self, event):
-        """Reset the scroll region to encompass the inner frame"""
-        self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-    
-    def on_canvas_configure(self, event):
-        """When the canvas changes size, resize the inner frame"""
-        self.canvas.itemconfig(self.canvas_window, width=event.width)
-    
     def generate_random_data(self):
         """Generate random 16-bit data"""
         self.input_data = [random.randint(0, 1) for _ in range(16)]
@@ -247,21 +275,7 @@ wo kao zhege zhende you dian fan er qie haonan woqu xiang tui xue le wo qu
         
         # Add to monitoring logs if enabled
         if self.monitoring_enabled:
-            log_data = {
-                'input': ''.join(map(str, data)),
-                'output': ''.join(map(str, result['encoded'])),
-                'systematic': ''.join(map(str, result['components']['systematic'])),
-                'parity1': ''.join(map(str, result['components']['parity1'])),
-                'parity2': ''.join(map(str, result['components']['parity2']))
-            }
-            
-            new_log = monitor("Turbo Encoding", log_data)
-            self.monitoring_logs.insert(0, new_log)
-            
-            # Keep only last 10 logs
-            if len(self.monitoring_logs) > 10:
-                self.monitoring_logs = self.monitoring_logs[:10]
-            
+            self.monitor_log.append("Turbo Encoding", result['components'])
             self.update_monitoring_display()
         
         return result
@@ -274,66 +288,21 @@ wo kao zhege zhende you dian fan er qie haonan woqu xiang tui xue le wo qu
             self.monitor_checkbox.config(text="✅ Monitoring Enabled")
             self.monitoring_frame.pack(fill="both", expand=True, pady=5)
             # Add initial log if none exists
-            if not self.monitoring_logs and self.input_data:
+            if not len(self.monitor_log) and self.input_data:
                 self.process_data(self.input_data)
         else:
             self.monitor_checkbox.config(text="❌ Monitoring Disabled")
             self.monitoring_frame.pack_forget()
-            self.monitoring_logs = []  # Clear logs when disabling
+            self.monitor_log.clear()  # Clear logs when disabling
+            self.update_monitoring_display()
+        
+        if self.producer is not None:
+            self.producer.log = self.monitor_log if self.monitoring_enabled else None
     
     def update_monitoring_display(self):
         """Update the monitoring display area with current logs"""
-        # Clear existing logs display
-        for widget in self.logs_frame.winfo_children():
-            widget.destroy()
-        
-        # No logs message
-        if not self.monitoring_logs:
-            no_logs_label = tk.Label(
-                self.logs_frame,
-                text="No monitoring data available yet.",
-                font=("Arial", 10, "italic"),
-                fg="#666666",
-                bg="white"
-            )
-            no_logs_label.pack(anchor="w", pady=5)
-            return
-        
-        # Add each log entry
-        for log in self.monitoring_logs:
-            log_frame = tk.Frame(
-                self.logs_frame,
-                bg="#f8f9fa",
-                highlightbackground="#3498db",
-                highlightthickness=2,
-                padx=8,
-                pady=8
-            )
-            log_frame.pack(fill="x", pady=5, padx=5)
-            
-            # Log header
-            header = tk.Label(
-                log_frame,
-                text=f"{log['tag']} - {log['timestamp']}",
-                font=("Arial", 10, "bold"),
-                bg="#f8f9fa",
-                anchor="w"
-            )
-            header.pack(fill="x")
-            
-            # Log data
-            data_frame = tk.Frame(log_frame, bg="#f8f9fa")
-            data_frame.pack(fill="x", pady=(5, 0))
-            
-            for key, value in log['data'].items():
-                data_item = tk.Label(
-                    data_frame,
-                    text=f"{key}: {value}",
-                    font=("Courier", 9),
-                    bg="#f8f9fa",
-                    anchor="w"
-                )
-                data_item.pack(fill="x")
+        # Only the visible rows are redrawn, at most once per refresh interval
+        self.log_view.notify()
     
     def generate_and_process_data(self):
         """Generate and process new data"""
@@ -344,9 +313,67 @@ wo kao zhege zhende you dian fan er qie haonan woqu xiang tui xue le wo qu
         """Background thread for automatic data updates"""
         while self.auto_update:
             time.sleep(5)  # Update every 5 seconds
+            # The high-rate producer supplies the data while it runs
+            if self.producer is not None:
+                continue
             # Use after to update UI from the main thread
             self.root.after(0, self.generate_and_process_data)
     
+    def toggle_producer(self):
+        """Start or stop the high-rate producer"""
+        if self.producer is not None:
+            self.producer.stop()
+            self.producer = None
+            self.producer_button.config(text="Start", bg="#27ae60")
+            self.generate_button.config(state="normal")
+            self.producer_stats.config(text="Idle")
+            return
+        
+        try:
+            rate = float(self.rate_var.get())
+        except ValueError:
+            self.producer_stats.config(text="Invalid rate")
+            return
+        self.producer = EncodeProducer(
+            rate=max(0.0, rate),
+            policy=self.policy_var.get(),
+            log=self.monitor_log if self.monitoring_enabled else None,
+            encoder=self.encoder
+        )
+        self.producer.start()
+        self.producer_button.config(text="Stop", bg="#e74c3c")
+        self.generate_button.config(state="disabled")
+        self.root.after(self.display_ms, self.sample_producer)
+    
+    def sample_producer(self):
+        """Show the newest block and the producer counters, at a fixed display rate"""
+        if self.producer is None:
+            return
+        result = self.producer.latest()
+        if result is not None:
+            self.input_data = result['components']['systematic']
+            self.encoded_data = result
+            self.input_display.config(text=self.format_binary(self.input_data))
+            self.output_display.config(text=self.format_binary(result['encoded']))
+            if self.monitoring_enabled:
+                self.update_monitoring_display()
+        
+        stats = self.producer.stats()
+        self.producer_stats.config(
+            text=f"{stats['blocks_per_s']:,.0f} blocks/s | "
+                 f"queue {stats['queue_depth']}/{stats['queue_capacity']} | "
+                 f"dropped {stats['dropped']:,}"
+        )
+        self.root.after(self.display_ms, self.sample_producer)
+    
+    def close(self):
+        """Stop background work and close the window"""
+        self.auto_update = False
+        if self.producer is not None:
+            self.producer.stop()
+            self.producer = None
+        self.root.destroy()
+    
     def format_binary(self, arr):
         """Format binary array as string"""
         if not arr or len(arr) == 0:
@@ -357,7 +384,7 @@ def main():
     try:
         root = tk.Tk()
         app = SatelliteEncodingApp(root)
-        root.protocol("WM_DELETE_WINDOW", lambda: (setattr(app, 'auto_update', False), root.destroy()))
+        root.protocol("WM_DELETE_WINDOW", app.close)
         root.mainloop()
     except Exception as e:
         print(f"程序运行出错: {str(e)}")
@@ -1,10 +1,12 @@
 import tkinter as tk
-from tkinter import ttk, messagebox, scrolledtext
-import binascii
+from tkinter import ttk, messagebox, scrolledtext, filedialog
 import datetime
 import random
 import time
 import math
+import threading
+from frame_codec import ADDRESSES, FRAME_FOOTER, FRAME_HEADER, FRAME_TYPES, describe_frame, encode_frame, frame_hex
+from deframer import deframe_file
 
 class SatelliteCommSimulator:
     def __init__(self, root):
@@ -24,27 +26,18 @@ class SatelliteCommSimulator:
         # 传输历史
         self.routing_history = []
         
-        # 定义协议常量
-        self.FRAME_HEADER = "6d656f77"  # "meow" 的16进制
-        self.FRAME_FOOTER = "6d696b756d61"  # "mikuma" 的16进制
-        
-        # 定义帧类型
-        self.FRAME_TYPES = {
-            "实验帧": "01",
-            "数据帧": "02",
-            "控制帧": "03"
-        }
-        
-        # 定义地址 (两个字节)
-        self.ADDRESSES = {
-            "卫星控制中心": "A101",
-            "移动终端1": "B202",
-            "移动终端2": "C303",
-            "地面站": "D404"
-        }
+        # 定义协议常量（16进制，显示用）
+        self.FRAME_HEADER = FRAME_HEADER.hex()  # "meow"
+        self.FRAME_FOOTER = FRAME_FOOTER.hex()  # "mikuma"
+        
+        # 帧类型和地址 (两个字节)，和 frame_codec 共用一份
+        self.FRAME_TYPES = FRAME_TYPES
+        self.ADDRESSES = ADDRESSES
         
         # 传输历史记录
         self.transmission_history = []
+        # 最近生成的二进制帧 (bytearray)
+        self.last_frame = None
         
         # 设置样式
         self.style = ttk.Style()
@@ -262,6 +255,14 @@ class SatelliteCommSimulator:
         )
         analyze_button.pack(side=tk.LEFT, padx=5)
         
+        # 抓包文件按钮（连续字节流，多个帧）
+        capture_button = ttk.Button(
+            button_frame, 
+            text="解析抓包文件喵", 
+            command=self.analyze_capture
+        )
+        capture_button.pack(side=tk.LEFT, padx=5)
+        
         # 清除按钮
         clear_button = ttk.Button(
             button_frame, 
@@ -391,32 +392,6 @@ class SatelliteCommSimulator:
         self.wave_canvas = tk.Canvas(wave_frame, bg="white", height=200)
         self.wave_canvas.pack(fill=tk.BOTH, expand=True, pady=5)
 
-    def string_to_hex(self, text):
-        """将字符串转换为16进制表示"""
-        if not text:
-            return ""
-        hex_data = binascii.hexlify(text.encode()).decode()
-        return hex_data
-    
-    def hex_to_string(self, hex_text):
-        """将16进制转换回字符串"""
-        try:
-            bytes_data = binascii.unhexlify(hex_text)
-            return bytes_data.decode()
-        except:
-            return f"[无法解码的16进制: {hex_text}]"
-    
-    def calculate_checksum(self, data):
-        """计算简单的校验和"""
-        # 将16进制字符串转换为字节
-        try:
-            bytes_data = binascii.unhexlify(data)
-            # 计算简单的校验和 (所有字节的和模256)
-            checksum = sum(bytes_data) % 256
-            return f"{checksum:02x}"
-        except:
-            return "00"
-    
     def generate_frame(self):
         """生成完整的数据帧"""
         # 获取输入内容
@@ -434,19 +409,19 @@ class SatelliteCommSimulator:
         src_addr = self.ADDRESSES[src_addr_key]
         dest_addr = self.ADDRESSES[dest_addr_key]
         frame_type = self.FRAME_TYPES[frame_type_key]
-        payload_hex = self.string_to_hex(payload)
+        payload_bytes = payload.encode()
+        payload_hex = payload_bytes.hex()
         
-        # 构建帧内容
-        frame_content = f"{src_addr}{dest_addr}{frame_type}{payload_hex}"
+        # 直接编码成二进制帧（帧头、地址、类型、正文、校验和、帧尾）
+        frame = encode_frame(src_addr, dest_addr, frame_type, payload_bytes, self.checksum_var.get())
+        self.last_frame = frame
         
-        # 添加校验和
         checksum = ""
         if self.checksum_var.get():
-            checksum = self.calculate_checksum(frame_content)
-            frame_content = f"{frame_content}{checksum}"
+            checksum = f"{frame[-len(FRAME_FOOTER) - 1]:02x}"
         
-        # 构建完整帧
-        complete_frame = f"{self.FRAME_HEADER}{frame_content}{self.FRAME_FOOTER}"
+        # 16进制只用于显示
+        complete_frame = frame_hex(frame)
         
         # 显示完整帧
         self.frame_display.delete(1.0, tk.END)
@@ -456,9 +431,9 @@ class SatelliteCommSimulator:
         self.frame_analysis.delete(1.0, tk.END)
         frame_analysis_text = (
             f"帧头 (meow): {self.FRAME_HEADER}\n"
-            f"源地址 ({src_addr_key}): {src_addr}\n"
-            f"目标地址 ({dest_addr_key}): {dest_addr}\n"
-            f"类型 ({frame_type_key}): {frame_type}\n"
+            f"源地址 ({src_addr_key}): {src_addr:04X}\n"
+            f"目标地址 ({dest_addr_key}): {dest_addr:04X}\n"
+            f"类型 ({frame_type_key}): {frame_type:02x}\n"
             f"正文: {payload_hex} (原文: {payload})\n"
         )
         
@@ -467,7 +442,7 @@ class SatelliteCommSimulator:
             
         frame_analysis_text += (
             f"帧尾 (mikuma): {self.FRAME_FOOTER}\n\n"
-            f"总长度: {len(complete_frame)//2} 字节"
+            f"总长度: {len(frame)} 字节"
         )
         
         self.frame_analysis.insert(tk.END, frame_analysis_text)
@@ -513,3 +488,72 @@ class SatelliteCommSimulator:
         self.monitor_log.insert(tk.END, log_entry)
         self.monitor_log.see(tk.END)
         
+    
+    def analyze_frame(self):
+        """解析输入框里的一个16进制帧"""
+        text = self.frame_input.get(1.0, tk.END).strip()
+        if not text:
+            messagebox.showwarning("输入错误", "请输入16进制帧")
+            return
+        
+        self.analyzer_result.delete(1.0, tk.END)
+        try:
+            frame = bytes.fromhex(text)
+            result = describe_frame(frame, self.checksum_var.get())
+        except ValueError as e:  # 包括 FrameError
+            self.analyzer_result.insert(tk.END, f"解析失败: {e}")
+            self.status_label.config(text="帧解析失败")
+            return
+        
+        self.analyzer_result.insert(tk.END, f"{result}\n\n总长度: {len(frame)} 字节")
+        self.status_label.config(text="帧解析成功")
+    
+    def clear_analyzer(self):
+        """清除帧解析器的输入和结果"""
+        self.frame_input.delete(1.0, tk.END)
+        self.analyzer_result.delete(1.0, tk.END)
+    
+    def analyze_capture(self, preview=20):
+        """在后台线程里解析一个抓包文件，显示统计和前几个帧"""
+        path = filedialog.askopenfilename(title="选择抓包文件")
+        if not path:
+            return
+        
+        self.status_label.config(text=f"正在解析 {path} ...")
+        names = {value: name for name, value in self.ADDRESSES.items()}
+        types = {value: name for name, value in self.FRAME_TYPES.items()}
+        lines = []
+        
+        def on_frame(frame):
+            if len(lines) < preview:
+                lines.append(
+                    f"{names.get(frame.src, f'{frame.src:04X}')} -> {names.get(frame.dst, f'{frame.dst:04X}')} "
+                    f"[{types.get(frame.frame_type, f'{frame.frame_type:02x}')}] {frame.payload.hex()}"
+                )
+        
+        def worker():
+            try:
+                stats = deframe_file(path, self.checksum_var.get(), on_frame=on_frame)
+            except OSError as e:
+                message = str(e)
+                self.root.after(0, lambda: messagebox.showerror("读取失败", message))
+                return
+            self.root.after(0, lambda: self.show_capture_stats(path, stats, lines))
+        
+        threading.Thread(target=worker, daemon=True).start()
+    
+    def show_capture_stats(self, path, stats, lines):
+        """显示抓包解析结果"""
+        text = (
+            f"文件: {path}\n"
+            f"大小: {stats['bytes_in']} 字节\n"
+            f"好帧: {stats['good']}\n"
+            f"坏帧: {stats['bad']}\n"
+            f"重同步: {stats['resync']} 次\n"
+            f"噪声: {stats['skipped_bytes']} 字节\n"
+            f"速度: {stats['mb_per_s']:.1f} MB/s\n\n"
+            f"前 {len(lines)} 个帧:\n" + "\n".join(lines)
+        )
+        self.analyzer_result.delete(1.0, tk.END)
+        self.analyzer_result.insert(tk.END, text)
+        self.status_label.config(text=f"抓包解析完成: {stats['good']} 个好帧")
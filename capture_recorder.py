@@ -0,0 +1,301 @@
+"""Mode1 长时间采集记录
+实时模式每一块的 analog / digital / pwm / reconstructed 依次追加到各自的原始二进制文件，
+旁边的 capture.json 记录采样率、数据类型、样本数和参数。
+文件按段预分配并逐段内存映射写入，常驻内存只有当前一段，与记录时长无关；
+读取时用 np.memmap 按需映射，几GB的记录也可以只读出要显示的窗口
+
+命令行用法（写入吞吐量基准测试）:
+    python capture_recorder.py --sample-rate 5000 --seconds 10
+    python capture_recorder.py --sample-rate 5000 --seconds 10 --with-chain   # 连同流式信号链一起计时
+"""
+import json
+import os
+import time
+import numpy as np
+
+HEADER_NAME = "capture.json"
+STAGES = ("analog", "digital", "pwm", "reconstructed")
+FORMAT_VERSION = 1
+
+
+def _write_header(path, header):
+    """先写临时文件再替换，中途中断也不会留下半个 JSON"""
+    tmp = os.path.join(path, HEADER_NAME + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(header, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, os.path.join(path, HEADER_NAME))
+
+
+class _StageFile:
+    """一个信号的原始文件：按段扩展文件长度，只映射正在写的那一段"""
+
+    def __init__(self, path, dtype, segment_samples):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.segment_samples = segment_samples
+        self.samples = 0        # 已写入的样本数
+        self.capacity = 0       # 文件已分配的样本数
+        self._map = None
+        self._map_start = 0
+        open(path, "wb").close()
+
+    def _next_segment(self):
+        self._release()
+        self._map_start = self.capacity
+        self.capacity += self.segment_samples
+        with open(self.path, "r+b") as f:
+            size = self.capacity * self.dtype.itemsize
+            if hasattr(os, "posix_fallocate"):
+                os.posix_fallocate(f.fileno(), 0, size)  # 真正分配磁盘空间，避免写入时才发现磁盘已满
+            else:
+                f.truncate(size)
+        self._map = np.memmap(self.path, dtype=self.dtype, mode="r+",
+                              offset=self._map_start * self.dtype.itemsize, shape=(self.segment_samples,))
+
+    def write(self, data):
+        data = np.asarray(data, dtype=self.dtype)
+        pos = 0
+        while pos < len(data):
+            if self._map is None or self.samples == self.capacity:
+                self._next_segment()
+            offset = self.samples - self._map_start
+            n = min(len(data) - pos, self.segment_samples - offset)
+            self._map[offset:offset + n] = data[pos:pos + n]
+            self.samples += n
+            pos += n
+
+    def _release(self):
+        if self._map is not None:
+            self._map.flush()
+            self._map = None  # 解除映射，写完的段不再占用进程内存
+
+    def close(self):
+        self._release()
+        with open(self.path, "r+b") as f:
+            f.truncate(self.samples * self.dtype.itemsize)  # 去掉预分配但没有用到的部分
+
+
+class CaptureWriter:
+    """把流式信号链的输出逐块写入记录目录
+    args:
+        path: 记录目录（不存在时自动创建；已经有记录的目录会拒绝，不会覆盖）
+        fs: 采样频率（Hz），整个记录期间不能改变
+        params: 开始记录时的参数字典，写入 capture.json
+        start_time: 第一个样本的时间（秒）
+        segment_samples: 每次预分配并映射的样本数，决定常驻内存上限
+    """
+
+    def __init__(self, path, fs, params=None, start_time=0.0, segment_samples=2**20):
+        if os.path.exists(os.path.join(path, HEADER_NAME)):
+            raise FileExistsError(f"{path} 里已经有一个记录")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.fs = float(fs)
+        self.start_time = float(start_time)
+        self.segment_samples = int(segment_samples)
+        self.params = dict(params or {})
+        self.param_changes = []     # 记录过程中的参数变化 [{'sample': 样本序号, 'params': {...}}]
+        self.samples = 0
+        self.bytes_written = 0
+        self._files = {}
+        self._closed = False
+        self._save_header(complete=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def duration(self):
+        return self.samples / self.fs
+
+    def mark(self, params):
+        """记录一次参数变化，从下一个写入的样本开始生效"""
+        self.param_changes.append({'sample': self.samples, 'params': dict(params)})
+
+    def append(self, chunk):
+        """追加一块数据，chunk 为 StreamingChain.process 返回的字典（只用 STAGES 中的键）"""
+        n = len(chunk['analog'])
+        if n == 0:
+            return
+        grew = False
+        for stage in STAGES:
+            data = np.asarray(chunk[stage])
+            if stage not in self._files:
+                # 第一次写入时按数据本身的类型建文件：digital 为 uint8，pwm 为 bool
+                self._files[stage] = _StageFile(os.path.join(self.path, f"{stage}.bin"),
+                                                data.dtype, self.segment_samples)
+            stage_file = self._files[stage]
+            before = stage_file.capacity
+            stage_file.write(data)
+            self.bytes_written += n * stage_file.dtype.itemsize
+            grew = grew or stage_file.capacity != before
+        self.samples += n
+        if grew:
+            # 每扩展一段更新一次样本数（包括这一块），意外退出时之前的数据仍可读
+            self._save_header(complete=False)
+
+    def _save_header(self, complete):
+        _write_header(self.path, {
+            'version': FORMAT_VERSION,
+            'fs': self.fs,
+            'start_time': self.start_time,
+            'samples': self.samples,
+            'complete': complete,
+            'streams': {stage: {'file': os.path.basename(f.path), 'dtype': f.dtype.str}
+                        for stage, f in self._files.items()},
+            'params': self.params,
+            'param_changes': self.param_changes,
+        })
+
+    def close(self):
+        if self._closed:
+            return
+        for stage_file in self._files.values():
+            stage_file.close()
+        self._save_header(complete=True)
+        self._closed = True
+
+
+class CaptureReader:
+    """按需映射读取记录目录，只有访问到的窗口才会从磁盘读入"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, HEADER_NAME), encoding="utf-8") as f:
+            self.header = json.load(f)
+        self.fs = self.header['fs']
+        self.start_time = self.header['start_time']
+        self.params = self.header['params']
+        self.dtypes = {stage: np.dtype(info['dtype']) for stage, info in self.header['streams'].items()}
+        # 没有正常结束的记录（complete 为 False）文件里还有预分配的空白，样本数以最后一次更新的头为准
+        self.samples = self.header['samples']
+        self._maps = {}
+
+    def _file(self, stage):
+        return os.path.join(self.path, self.header['streams'][stage]['file'])
+
+    def __len__(self):
+        return self.samples
+
+    @property
+    def duration(self):
+        return self.samples / self.fs
+
+    def stage(self, name):
+        """整个信号的只读内存映射（不会把数据读入内存）"""
+        if name not in self._maps:
+            if self.samples == 0:
+                self._maps[name] = np.zeros(0, dtype=self.dtypes[name])
+            else:
+                self._maps[name] = np.memmap(self._file(name), dtype=self.dtypes[name], mode="r",
+                                             shape=(self.samples,))
+        return self._maps[name]
+
+    def index_at(self, time_s):
+        """时间（秒）对应的样本序号，限制在记录范围内"""
+        index = int(round((time_s - self.start_time) * self.fs))
+        return min(max(index, 0), self.samples)
+
+    def window(self, start_time, duration):
+        """返回 [start_time, start_time + duration) 的数据，键与 StreamingChain.window 相同"""
+        start = self.index_at(start_time)
+        stop = min(self.samples, start + max(0, int(round(duration * self.fs))))
+        result = {'t': self.start_time + np.arange(start, stop) / self.fs}
+        for stage in STAGES:
+            result[stage] = np.asarray(self.stage(stage)[start:stop])
+        return result
+
+    def params_at(self, time_s):
+        """time_s 时刻生效的参数（开始参数叠加之前的所有参数变化）"""
+        index = self.index_at(time_s)
+        params = dict(self.params)
+        for change in self.header['param_changes']:
+            if change['sample'] <= index:
+                params.update(change['params'])
+        return params
+
+    def close(self):
+        self._maps.clear()
+
+
+def benchmark_write(sample_rate=5000.0, seconds=10.0, chunk_duration=0.05, path=None, with_chain=False,
+                    segment_samples=2**20):
+    """测量持续写入吞吐量
+    args:
+        sample_rate: 采样率（kHz）
+        seconds: 记录的信号时长（秒）
+        chunk_duration: 每块时长（秒），与 Mode1 定时器间隔一致
+        with_chain: True 时每块都由 StreamingChain 实时计算，否则重复写入同一块预先算好的数据
+    返回字典：samples_per_s、mbytes_per_s、realtime（相对实时的倍数）、worst_chunk_ms 等
+    """
+    import shutil
+    import tempfile
+    from signal_chain import DEFAULT_PARAMS
+    from signal_stream import StreamingChain
+
+    params = dict(DEFAULT_PARAMS, sample_rate=sample_rate)
+    chain = StreamingChain(params)
+    chunk = chain.advance(chunk_duration)
+    chunks = int(round(seconds / chunk_duration))
+    own_dir = path is None
+    path = path or tempfile.mkdtemp(prefix="capture_bench_")
+    worst = 0.0
+    try:
+        start = time.perf_counter()
+        writer = CaptureWriter(path, chain.fs, params, segment_samples=segment_samples)
+        for _ in range(chunks):
+            chunk_start = time.perf_counter()
+            if with_chain:
+                chunk = chain.advance(chunk_duration)
+            writer.append(chunk)
+            worst = max(worst, time.perf_counter() - chunk_start)
+        writer.close()
+        elapsed = time.perf_counter() - start
+
+        reader = CaptureReader(path)
+        if len(reader) != writer.samples:
+            raise AssertionError("读回的样本数与写入的不一致")
+        last = reader.window(reader.start_time + (len(reader) - len(chunk['t'])) / reader.fs, chunk_duration)
+        for stage in STAGES:
+            if not np.array_equal(last[stage], chunk[stage]):
+                raise AssertionError(f"读回的 {stage} 与最后写入的一块不一致")
+        reader.close()
+    finally:
+        if own_dir:
+            shutil.rmtree(path, ignore_errors=True)
+    return {
+        'samples': writer.samples,
+        'bytes': writer.bytes_written,
+        'elapsed_s': elapsed,
+        'samples_per_s': writer.samples / elapsed,
+        'mbytes_per_s': writer.bytes_written / elapsed / 1e6,
+        'realtime': writer.duration / elapsed,
+        'worst_chunk_ms': worst * 1000,
+        'resident_segment_mb': segment_samples * writer.bytes_written / max(1, writer.samples) / 1e6,
+    }
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Mode1 采集记录写入吞吐量测试")
+    parser.add_argument("--sample-rate", type=float, default=5000.0, help="采样率（kHz）")
+    parser.add_argument("--seconds", type=float, default=10.0, help="记录的信号时长（秒）")
+    parser.add_argument("--chunk", type=float, default=0.05, help="每块时长（秒）")
+    parser.add_argument("--path", help="记录目录，不指定则写到临时目录并在结束后删除")
+    parser.add_argument("--with-chain", action="store_true", help="连同流式信号链的计算一起计时")
+    args = parser.parse_args(argv)
+
+    row = benchmark_write(args.sample_rate, args.seconds, args.chunk, args.path, args.with_chain)
+    print(f"samples: {row['samples']}, {row['bytes'] / 1e6:.0f} MB in {row['elapsed_s']:.2f} s")
+    print(f"throughput: {row['samples_per_s'] / 1e6:.2f} MS/s, {row['mbytes_per_s']:.0f} MB/s, "
+          f"{row['realtime']:.1f}x realtime, worst chunk {row['worst_chunk_ms']:.1f} ms "
+          f"(budget {args.chunk * 1000:.0f} ms)")
+    print(f"mapped per segment: {row['resident_segment_mb']:.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
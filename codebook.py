@@ -0,0 +1,268 @@
+"""Precomputed Turbo codebooks for short blocks
+
+A block of L bits has only 2**L possible inputs (65,536 for the 16-bit
+blocks SatelliteEncodingApp generates), so the whole code can be tabulated:
+row i of the codebook holds the packed systematic, parity1 and parity2 bytes
+for the input whose bits, most significant first, spell the integer i.
+
+The table is built once in a vectorized pass with BatchTurboEncoder, saved
+as .npy and memory-mapped on later runs, so encoding is one row lookup. The
+file name includes a fingerprint of the RSC tables and the interleaver, so a
+changed encoder never reads a stale table. Longer blocks fall back to the
+batch encoder behind an LRU cache of results.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from codeword import Codeword
+from interleavers import get_interleaver
+from turbo_batch import BatchTurboEncoder
+
+MAX_TABLE_BITS = 20         # 2**20 rows x 9 bytes = 9 MB; longer blocks use the LRU fallback
+BUILD_ROWS = 1 << 16        # rows encoded per batch while building
+CODEBOOK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "codebooks")
+
+# Bits of every byte value, most significant first, for turning table rows into lists
+BYTE_BITS = [[(byte >> k) & 1 for k in range(7, -1, -1)] for byte in range(256)]
+
+
+def bits_to_index(bits):
+    """Integer whose binary digits (most significant first) are bits"""
+    index = 0
+    for bit in bits:
+        index = (index << 1) | bit
+    return index
+
+
+def index_inputs(indices, length):
+    """Packed input bytes (rows x ceil(length/8)) for integer inputs, left-aligned like np.packbits"""
+    nbytes = (length + 7) // 8
+    values = np.asarray(indices, dtype=np.uint64) << np.uint64(nbytes * 8 - length)
+    shifts = np.arange(nbytes - 1, -1, -1, dtype=np.uint64) * np.uint64(8)
+    return ((values[:, np.newaxis] >> shifts) & np.uint64(0xFF)).astype(np.uint8)
+
+
+def codebook_fingerprint(length, interleaver="auto", encoder=None):
+    """Short hash of everything the table depends on"""
+    encoder = encoder or BatchTurboEncoder()
+    h = hashlib.sha1()
+    h.update(np.ascontiguousarray(encoder.parity_table).tobytes())
+    h.update(np.ascontiguousarray(encoder.next_state_table).tobytes())
+    h.update(get_interleaver(interleaver, length).permutation.astype(np.int64).tobytes())
+    return h.hexdigest()[:12]
+
+
+def build_codebook(length, interleaver="auto", encoder=None):
+    """(2**length x 3*bytes) uint8 table: packed systematic | parity1 | parity2 per input"""
+    if not 0 < length <= MAX_TABLE_BITS:
+        raise ValueError(f"codebook length must be 1..{MAX_TABLE_BITS} bits")
+    encoder = encoder or BatchTurboEncoder(interleaver=interleaver)
+    nbytes = (length + 7) // 8
+    rows = 1 << length
+    table = np.empty((rows, 3 * nbytes), dtype=np.uint8)
+    for start in range(0, rows, BUILD_ROWS):
+        stop = min(rows, start + BUILD_ROWS)
+        packed = encoder.encode_packed(index_inputs(np.arange(start, stop), length), length)
+        table[start:stop, :nbytes] = packed['systematic']
+        table[start:stop, nbytes:2 * nbytes] = packed['parity1']
+        table[start:stop, 2 * nbytes:] = packed['parity2']
+    return table
+
+
+def load_codebook(length, interleaver="auto", directory=CODEBOOK_DIR):
+    """Memory-mapped codebook, built and saved on first use"""
+    encoder = BatchTurboEncoder(interleaver=interleaver)
+    path = os.path.join(directory, f"turbo_L{length}_{codebook_fingerprint(length, interleaver, encoder)}.npy")
+    if not os.path.exists(path):
+        table = build_codebook(length, interleaver, encoder)
+        os.makedirs(directory, exist_ok=True)
+        # Write to a temporary name first so a crash never leaves a partial table
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, table)
+        os.replace(tmp, path)
+    return np.load(path, mmap_mode="r")
+
+
+class CodebookEncoder:
+    """Drop-in replacement for TurboEncoder.encode backed by codebooks
+
+    Blocks of up to max_table_bits bits are looked up in a memory-mapped
+    codebook (one per length, loaded on first use); longer blocks are encoded
+    with BatchTurboEncoder and the packed results kept in an LRU cache.
+
+    args:
+        interleaver: interleaver family (see interleavers.py)
+        max_table_bits: longest block length served from a full codebook
+        cache_size: LRU capacity (results) for longer blocks
+        directory: where codebook files are stored
+    """
+
+    def __init__(self, interleaver="auto", max_table_bits=16, cache_size=4096, directory=CODEBOOK_DIR):
+        self.interleaver = interleaver
+        self.max_table_bits = min(max_table_bits, MAX_TABLE_BITS)
+        self.cache_size = cache_size
+        self.directory = directory
+        self.batch = BatchTurboEncoder(interleaver=interleaver)
+        self.tables = {}
+        self._rows = {}     # length -> flat memoryview of the table, for per-call lookups
+        self.table_lookups = 0
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def table(self, length):
+        """Codebook for this block length (loaded or built on first use)"""
+        table = self.tables.get(length)
+        if table is None:
+            table = self.tables[length] = load_codebook(length, self.interleaver, self.directory)
+            # Indexing np.memmap per call is slow; a memoryview slice of the same mapping is not
+            self._rows[length] = memoryview(np.asarray(table).reshape(-1))
+        return table
+
+    def encode_packed_row(self, bits):
+        """Packed systematic | parity1 | parity2 bytes for one block"""
+        length = len(bits)
+        if 0 < length <= self.max_table_bits:
+            self.table_lookups += 1
+            return self.table(length)[bits_to_index(bits)]
+
+        key = (length, np.packbits(np.asarray(bits, dtype=np.uint8)).tobytes())
+        with self._lock:
+            row = self._cache.get(key)
+            if row is not None:
+                self.hits += 1
+                self._cache.move_to_end(key)
+                return row
+        self.misses += 1
+        packed = self.batch.encode_packed(np.frombuffer(key[1], dtype=np.uint8)[np.newaxis], length)
+        row = np.concatenate((packed['systematic'][0], packed['parity1'][0], packed['parity2'][0]))
+        row.setflags(write=False)     # shared by every caller that hits the cache
+        with self._lock:
+            self._cache[key] = row
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)  # evict the least recently used
+        return row
+
+    def encode(self, input_bits):
+        """Same result as TurboEncoder.encode (lists of 0/1)"""
+        length = len(input_bits)
+        nbytes = (length + 7) // 8
+        if 0 < length <= self.max_table_bits:
+            self.table(length)
+            self.table_lookups += 1
+            start = bits_to_index(input_bits) * 3 * nbytes
+            row = self._rows[length][start:start + 3 * nbytes]
+        else:
+            row = self.encode_packed_row(input_bits)
+        components = []
+        for k in range(3):
+            bits = []
+            for byte in row[k * nbytes:(k + 1) * nbytes]:
+                bits += BYTE_BITS[byte]
+            components.append(bits[:length])
+        systematic, parity1, parity2 = components
+        return {
+            'encoded': systematic + parity1 + parity2,
+            'components': {
+                'systematic': systematic,
+                'parity1': parity1,
+                'parity2': parity2
+            }
+        }
+
+    def encode_codeword(self, input_bits):
+        """Packed Codeword; for table lengths it views the codebook row (no copy)"""
+        length = len(input_bits)
+        if 0 < length <= self.max_table_bits:
+            self.table(length)
+            self.table_lookups += 1
+            size = 3 * ((length + 7) // 8)
+            start = bits_to_index(input_bits) * size
+            return Codeword(self._rows[length][start:start + size], length)
+        return Codeword(self.encode_packed_row(input_bits), length)
+
+    def encode_indices(self, indices, length):
+        """Packed rows for many integer inputs at once (one gather)"""
+        return np.take(self.table(length), np.asarray(indices, dtype=np.intp), axis=0)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'table_lookups': self.table_lookups,
+            'tables': sorted(self.tables),
+            'hits': self.hits,
+            'misses': self.misses,
+            'cached': len(self._cache),
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+
+def benchmark(length=16, calls=20000, fallback_length=1024, fallback_blocks=64, seed=0):
+    """encode() calls/s of TurboEncoder vs the codebook, first-build vs mmap load time,
+    and fallback hit rate for repeated longer blocks"""
+    import tempfile
+    from Mode2 import TurboEncoder
+    rng = np.random.default_rng(seed)
+    inputs = rng.integers(0, 2, size=(calls, length), dtype=np.uint8).tolist()
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        load_codebook(length, directory=directory)
+        build = time.perf_counter() - start
+        start = time.perf_counter()
+        load_codebook(length, directory=directory)
+        load = time.perf_counter() - start
+
+        reference = TurboEncoder()
+        start = time.perf_counter()
+        for bits in inputs:
+            reference.encode(bits)
+        ref_time = time.perf_counter() - start
+
+        encoder = CodebookEncoder(directory=directory)
+        encoder.table(length)
+        start = time.perf_counter()
+        for bits in inputs:
+            encoder.encode(bits)
+        book_time = time.perf_counter() - start
+        if any(encoder.encode(bits) != reference.encode(bits) for bits in inputs[:1000]):
+            raise AssertionError("codebook differs from TurboEncoder.encode")
+
+        start = time.perf_counter()
+        encoder.encode_indices(rng.integers(0, 1 << length, calls), length)
+        gather_time = time.perf_counter() - start
+
+        # Fallback: a small working set of long blocks seen repeatedly
+        blocks = rng.integers(0, 2, size=(fallback_blocks, fallback_length), dtype=np.uint8).tolist()
+        for i in rng.integers(0, fallback_blocks, 2000):
+            encoder.encode(blocks[i])
+
+    return {
+        'length': length,
+        'build_s': build,
+        'load_s': load,
+        'reference_calls_per_s': calls / ref_time,
+        'codebook_calls_per_s': calls / book_time,
+        'gather_rows_per_s': calls / gather_time,
+        'fallback': encoder.stats(),
+    }
+
+
+def main():
+    row = benchmark()
+    print(f"{row['length']}-bit codebook: build {row['build_s'] * 1e3:.1f} ms, mmap load {row['load_s'] * 1e3:.2f} ms")
+    print(f"TurboEncoder.encode: {row['reference_calls_per_s']:.0f} calls/s, "
+          f"codebook encode: {row['codebook_calls_per_s']:.0f} calls/s "
+          f"({row['codebook_calls_per_s'] / row['reference_calls_per_s']:.1f}x), "
+          f"batch lookup: {row['gather_rows_per_s'] / 1e6:.1f} M rows/s")
+    stats = row['fallback']
+    print(f"fallback LRU: {stats['hits']} hits, {stats['misses']} misses, hit rate {stats['hit_rate']:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""Packed Turbo codewords: one contiguous buffer, components as views
+
+TurboEncoder.encode returns four Python lists (the encoded stream plus its
+three components, so every bit is stored twice, as an 8-byte pointer each).
+A Codeword keeps the same result as ceil(L/8) bytes per component in one
+uint8 buffer, laid out like a codebook row:
+
+    systematic | parity1 | parity2      (each component padded to whole bytes)
+
+systematic, parity1 and parity2 are slices of that buffer, not copies, and
+bytes / memoryview / NumPy buffers wrap into a Codeword without copying, so
+a codeword read from a codebook, a batch array or a received frame payload
+is never duplicated. Bit lists are only built by to_result() for code that
+still wants the old dict.
+"""
+import sys
+import time
+import numpy as np
+
+
+class Codeword:
+    """Turbo encoder output for one block of `length` bits, packed
+
+    args:
+        buffer: anything exposing the buffer protocol, 3 * ceil(length/8) bytes
+            (wrapped, not copied; read-only sources stay read-only)
+        length: block length in bits
+    """
+
+    __slots__ = ("buffer", "length", "nbytes")
+
+    def __init__(self, buffer, length):
+        nbytes = (length + 7) // 8
+        buffer = np.frombuffer(buffer, dtype=np.uint8) if not isinstance(buffer, np.ndarray) else buffer
+        if buffer.shape != (3 * nbytes,):
+            raise ValueError(f"a {length}-bit codeword needs {3 * nbytes} bytes, got {buffer.size}")
+        self.buffer = buffer
+        self.length = length
+        self.nbytes = nbytes
+
+    @classmethod
+    def from_bits(cls, systematic, parity1, parity2):
+        """Pack three bit sequences (lists or arrays of 0/1)"""
+        packed = np.packbits(np.array([systematic, parity1, parity2], dtype=np.uint8), axis=1)
+        return cls(packed.reshape(-1), len(systematic))
+
+    @classmethod
+    def from_result(cls, result):
+        """Pack a TurboEncoder.encode-style dict"""
+        components = result['components']
+        return cls.from_bits(components['systematic'], components['parity1'], components['parity2'])
+
+    @classmethod
+    def from_rows(cls, rows, length):
+        """Codewords viewing each row of a (blocks x 3*bytes) array, e.g. CodebookEncoder.encode_indices"""
+        return [cls(row, length) for row in rows]
+
+    @property
+    def components(self):
+        """(3, bytes) view: one packed row per component"""
+        return self.buffer.reshape(3, self.nbytes)
+
+    @property
+    def systematic(self):
+        return self.buffer[:self.nbytes]
+
+    @property
+    def parity1(self):
+        return self.buffer[self.nbytes:2 * self.nbytes]
+
+    @property
+    def parity2(self):
+        return self.buffer[2 * self.nbytes:]
+
+    def bits(self):
+        """(3, length) uint8 array of unpacked bits"""
+        return np.unpackbits(self.components, axis=1, count=self.length)
+
+    def encoded_bits(self):
+        """Bits of the encoded stream (systematic + parity1 + parity2) as one array"""
+        return self.bits().reshape(-1)
+
+    def to_result(self):
+        """Same dict as TurboEncoder.encode (lists of 0/1)"""
+        systematic, parity1, parity2 = self.bits().tolist()
+        return {
+            'encoded': systematic + parity1 + parity2,
+            'components': {
+                'systematic': systematic,
+                'parity1': parity1,
+                'parity2': parity2
+            }
+        }
+
+    def payload(self):
+        """Read-only memoryview of the packed bytes, for frame payloads (no copy)"""
+        return memoryview(self.buffer).toreadonly()
+
+    def tobytes(self):
+        return self.buffer.tobytes()
+
+    def write_into(self, target, offset=0):
+        """Copy the packed bytes into a writable buffer at offset; returns the offset after them"""
+        end = offset + self.buffer.size
+        memoryview(target)[offset:end] = self.buffer
+        return end
+
+    def __len__(self):
+        return self.buffer.size
+
+    def __bytes__(self):
+        return self.buffer.tobytes()
+
+    def __buffer__(self, flags):
+        # Python 3.12+: memoryview(codeword) and writes into frames without payload()
+        return memoryview(self.buffer)
+
+    def __eq__(self, other):
+        if not isinstance(other, Codeword):
+            return NotImplemented
+        return self.length == other.length and np.array_equal(self.buffer, other.buffer)
+
+    def __repr__(self):
+        return f"Codeword(length={self.length}, bytes={self.buffer.tobytes().hex()})"
+
+
+def result_size(result):
+    """Bytes held by a TurboEncoder.encode dict: dicts, lists and their pointers
+
+    The 0/1 ints themselves are shared small-int singletons and are not counted.
+    """
+    components = result['components']
+    return (sys.getsizeof(result) + sys.getsizeof(components) + sys.getsizeof(result['encoded'])
+            + sum(sys.getsizeof(bits) for bits in components.values()))
+
+
+def codeword_size(codeword):
+    """Bytes held by a Codeword: the object, its array header and the packed bits"""
+    size = sys.getsizeof(codeword) + sys.getsizeof(codeword.buffer)
+    if codeword.buffer.base is not None:
+        # A view: getsizeof leaves out the bytes it shares with its base
+        size += codeword.buffer.nbytes
+    return size
+
+
+def benchmark(lengths=(16, 1024, 6144), count=2000, seed=0):
+    """Memory per codeword (dict of lists vs Codeword) and conversion costs in microseconds"""
+    from turbo_batch import BatchTurboEncoder
+    rng = np.random.default_rng(seed)
+    rows = []
+    for length in lengths:
+        nbytes = (length + 7) // 8
+        blocks = max(1, count * 16 // length)
+        packed = BatchTurboEncoder().encode_packed(
+            np.packbits(rng.integers(0, 2, size=(blocks, length), dtype=np.uint8), axis=1), length)
+        table = np.concatenate((packed['systematic'], packed['parity1'], packed['parity2']), axis=1)
+        codewords = Codeword.from_rows(table, length)
+        results = [c.to_result() for c in codewords]
+        frame = bytearray(len(table) * 3 * nbytes)
+
+        def per_call(fn):
+            start = time.perf_counter()
+            fn()
+            return (time.perf_counter() - start) / blocks * 1e6
+
+        blobs = [c.tobytes() for c in codewords]
+        rows.append({
+            'length': length,
+            'dict_bytes': result_size(results[0]),
+            'codeword_bytes': codeword_size(codewords[0]),
+            'packed_bytes': 3 * nbytes,
+            'to_result_us': per_call(lambda: [c.to_result() for c in codewords]),
+            'from_result_us': per_call(lambda: [Codeword.from_result(r) for r in results]),
+            'tobytes_us': per_call(lambda: [c.tobytes() for c in codewords]),
+            'from_bytes_us': per_call(lambda: [Codeword(b, length) for b in blobs]),
+            'payload_us': per_call(lambda: [c.payload() for c in codewords]),
+            'write_into_us': per_call(lambda: [c.write_into(frame, i * 3 * nbytes) for i, c in enumerate(codewords)]),
+        })
+        if Codeword(blobs[-1], length).to_result() != results[-1]:
+            raise AssertionError("round trip through bytes changed the codeword")
+    return rows
+
+
+if __name__ == "__main__":
+    print(f"{'bits':>5} {'dict B':>8} {'codeword B':>10} {'packed B':>8} {'ratio':>6} "
+          f"{'to_result':>10} {'from_result':>11} {'tobytes':>8} {'from_bytes':>10} {'payload':>8} {'write':>7}  (us)")
+    for row in benchmark():
+        print(f"{row['length']:>5} {row['dict_bytes']:>8} {row['codeword_bytes']:>10} {row['packed_bytes']:>8} "
+              f"{row['dict_bytes'] / row['codeword_bytes']:>5.0f}x {row['to_result_us']:>10.2f} "
+              f"{row['from_result_us']:>11.2f} {row['tobytes_us']:>8.2f} {row['from_bytes_us']:>10.2f} "
+              f"{row['payload_us']:>8.2f} {row['write_into_us']:>7.2f}")
@@ -0,0 +1,302 @@
+"""DA重建滤波器
+滑动平均用累加和（CIC积分-梳状结构）实现，运算量与窗口长度无关
+IIR低通滤波器以二阶节（SOS）形式设计并缓存，避免每次刷新都重新设计"""
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+# 支持的IIR滤波器类型（与界面下拉框中的名称一致）
+FILTER_FAMILIES = ("Butterworth", "Chebyshev I", "Chebyshev II", "Bessel")
+
+CHEBY_RIPPLE_DB = 1.0   # 切比雪夫I型通带纹波
+CHEBY_STOP_DB = 40.0    # 切比雪夫II型阻带衰减
+
+
+def _scipy_signal():
+    """延迟导入 scipy.signal：只用滑动平均的批处理任务不必付出 scipy 的导入开销"""
+    from scipy import signal
+    return signal
+
+
+def _running_sum_same(x, window_size):
+    """沿最后一维做长度为 window_size 的滑动求和，对齐方式与 np.convolve(mode='same') 相同
+    输出第 i 点覆盖输入 [i + lead - w + 1, i + lead]，lead = (w - 1) // 2，越界部分按0处理"""
+    n = x.shape[-1]
+    w = window_size
+    lead = (w - 1) // 2
+    acc_dtype = np.int64 if x.dtype.kind in "bui" else np.float64
+
+    # 扩展后的累加和：左侧补0，右侧补总和，这样首尾不足一个窗口时自动截断
+    c = np.empty(x.shape[:-1] + (n + w,), dtype=acc_dtype)
+    c[..., :w - lead] = 0
+    np.cumsum(x, axis=-1, dtype=acc_dtype, out=c[..., w - lead:w - lead + n])
+    c[..., w - lead + n:] = c[..., w - lead + n - 1:w - lead + n]
+    return c[..., w:] - c[..., :n]
+
+
+def moving_average(x, window_size, stages=1):
+    """O(n) 滑动平均滤波，结果与 np.convolve(x, np.ones(w)/w, mode='same') 对齐
+    args:
+        x: 输入信号，沿最后一维滤波
+        window_size: 窗口长度（采样点数）
+        stages: 级联的矩形窗个数，多级级联可以获得更好的阻带衰减（CIC结构）
+    """
+    x = np.asarray(x)
+    w = max(1, int(window_size))
+    if w == 1 or x.shape[-1] == 0:
+        return x.astype(np.float64)
+
+    # 整数输入（如0/1的PWM信号）在int64中累加是精确的，最后统一除以 w**stages
+    acc = x
+    exact = x.dtype.kind in "bui" and w**stages * max(1, int(np.abs(x).max())) < 2**62
+    if not exact:
+        acc = acc.astype(np.float64)
+    for _ in range(stages):
+        acc = _running_sum_same(acc, w)
+        if not exact:
+            acc /= w
+    if exact:
+        return acc / float(w)**stages
+    return acc
+
+
+def window_for_cutoff(cutoff_freq, fs):
+    """根据截止频率（kHz）和采样频率（Hz）计算滑动平均窗口长度"""
+    return max(1, int((1.0 / (cutoff_freq * 1000)) * fs))
+
+
+def design_lowpass_sos(family, order, normal_cutoff):
+    """设计数字低通滤波器，返回二阶节系数
+    高阶、低归一化截止频率时 SOS 形式比 (b, a) 多项式数值上稳定得多
+    args:
+        family: 滤波器类型，见 FILTER_FAMILIES
+        order: 阶数
+        normal_cutoff: 归一化截止频率（相对奈奎斯特频率，0~1）
+    """
+    sg = _scipy_signal()
+    if family == "Butterworth":
+        return sg.butter(order, normal_cutoff, btype='low', output='sos')
+    if family == "Chebyshev I":
+        return sg.cheby1(order, CHEBY_RIPPLE_DB, normal_cutoff, btype='low', output='sos')
+    if family == "Chebyshev II":
+        return sg.cheby2(order, CHEBY_STOP_DB, normal_cutoff, btype='low', output='sos')
+    if family == "Bessel":
+        return sg.bessel(order, normal_cutoff, btype='low', output='sos')
+    raise ValueError(f"未知的滤波器类型: {family}")
+
+
+class FilterPlanCache:
+    """滤波器设计缓存（LRU）
+    以 (阶数, 归一化截止频率, 采样频率, 滤波器类型) 为键保存二阶节系数，
+    只改幅值、占空比等参数时直接命中缓存；界面线程和后台计算线程共用，内部加锁"""
+
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._plans = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_sos(self, order, normal_cutoff, fs, family="Butterworth"):
+        """取出（或设计并缓存）一组二阶节系数"""
+        key = (int(order), float(normal_cutoff), float(fs), family)
+        with self._lock:
+            sos = self._plans.get(key)
+            if sos is not None:
+                self.hits += 1
+                self._plans.move_to_end(key)
+                return sos
+
+            self.misses += 1
+            sos = design_lowpass_sos(family, int(order), float(normal_cutoff))
+            self._plans[key] = sos
+            if len(self._plans) > self.maxsize:
+                self._plans.popitem(last=False)  # 淘汰最久未使用的设计
+            return sos
+
+    def stats(self):
+        """返回命中/未命中次数和当前缓存大小"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._plans),
+            'maxsize': self.maxsize,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# 模块级共享缓存，Mode1界面与其他调用方共用
+FILTER_CACHE = FilterPlanCache()
+
+
+def normalized_cutoff(cutoff_freq, fs):
+    """把截止频率（kHz）换算为归一化截止频率，并限制在0.99以下"""
+    nyq = 0.5 * fs  # 奈奎斯特频率
+    return min(0.99, cutoff_freq * 1000 / nyq)
+
+
+def lowpass_filter(x, cutoff_freq, fs, order, family="Butterworth", zero_phase=True, zi=None,
+                   cache=FILTER_CACHE):
+    """用缓存的SOS低通滤波器对信号滤波（沿最后一维）
+    args:
+        x: 输入信号
+        cutoff_freq: 截止频率（kHz）
+        fs: 采样频率（Hz）
+        order: 阶数
+        family: 滤波器类型
+        zero_phase: True 用 sosfiltfilt 做零相位滤波，False 用 sosfilt 做因果滤波
+        zi: 因果滤波的初始状态，传入时返回 (输出, 新状态)
+    """
+    sg = _scipy_signal()
+    sos = cache.get_sos(order, normalized_cutoff(cutoff_freq, fs), fs, family)
+    x = np.asarray(x, dtype=np.float64)  # bool/uint8 的PWM信号在这里才转为浮点
+    if zero_phase:
+        return sg.sosfiltfilt(sos, x, axis=-1)
+    if zi is None:
+        return sg.sosfilt(sos, x, axis=-1)
+    return sg.sosfilt(sos, x, axis=-1, zi=zi)
+
+
+class StreamingMovingAverage:
+    """分块输入的因果滑动平均，块与块之间保留每一级最近 w-1 个输入
+    因为不能预知未来的样本，输出比 mode='same' 的结果滞后 (w-1)//2 个点"""
+
+    def __init__(self, window_size, stages=1):
+        self.window_size = max(1, int(window_size))
+        self.stages = stages
+        self.reset()
+
+    def reset(self):
+        # 每一级的历史输入，初始为0（相当于滤波器从静止状态启动）
+        self._history = [np.zeros(self.window_size - 1) for _ in range(self.stages)]
+
+    def process(self, x):
+        """处理一块新样本，返回等长的输出"""
+        w = self.window_size
+        y = np.asarray(x, dtype=np.float64)
+        if w == 1 or len(y) == 0:
+            return y.copy()
+        for k in range(self.stages):
+            ext = np.concatenate((self._history[k], y))
+            c = np.empty(len(ext) + 1)
+            c[0] = 0.0
+            np.cumsum(ext, out=c[1:])
+            self._history[k] = ext[len(ext) - (w - 1):]
+            y = (c[w:] - c[:-w]) / w
+        return y
+
+
+class StreamingLowpass:
+    """分块输入的因果IIR低通滤波器，zi 状态在块之间保持"""
+
+    def __init__(self, cutoff_freq, fs, order, family="Butterworth", cache=FILTER_CACHE):
+        self.sos = cache.get_sos(order, normalized_cutoff(cutoff_freq, fs), fs, family)
+        self.zi = None
+
+    def reset(self):
+        self.zi = None
+
+    def process(self, x):
+        """处理一块新样本，返回等长的输出"""
+        x = np.asarray(x, dtype=np.float64)
+        if len(x) == 0:
+            return x
+        sg = _scipy_signal()
+        if self.zi is None:
+            # 以第一个样本作为稳态初值，避免启动时的阶跃瞬态
+            self.zi = sg.sosfilt_zi(self.sos) * x[0]
+        y, self.zi = sg.sosfilt(self.sos, x, zi=self.zi)
+        return y
+
+
+def benchmark(window_sizes=(1, 10, 100, 1000, 5000, 50000), n=500000, stages=(1, 3),
+              max_reference_window=5000, repeats=3):
+    """比较 np.convolve 与累加和实现在不同窗口长度下的耗时
+    args:
+        window_sizes: 窗口长度列表
+        n: 信号长度，默认对应 5 MHz 采样 100 ms
+        max_reference_window: 超过此窗口长度不再运行 np.convolve（太慢）
+    """
+    rng = np.random.default_rng(0)
+    pwm = (rng.random(n) < 0.5).astype(np.float64)
+    rows = []
+    for w in window_sizes:
+        row = {"window": w}
+        reference = None
+        if w <= max_reference_window:
+            kernel = np.ones(w) / w
+            start = time.perf_counter()
+            for _ in range(repeats):
+                reference = np.convolve(pwm, kernel, mode="same")
+            row["convolve_s"] = (time.perf_counter() - start) / repeats
+        for k in stages:
+            start = time.perf_counter()
+            for _ in range(repeats):
+                result = moving_average(pwm, w, stages=k)
+            row[f"running_sum_{k}_s"] = (time.perf_counter() - start) / repeats
+            if k == 1 and reference is not None and len(reference) == n:
+                row["max_error"] = float(np.max(np.abs(result - reference)))
+        rows.append(row)
+    return rows
+
+
+def benchmark_filter_cache(n=500000, fs=5e6, cutoff_freq=20.0, order=4, repeats=20):
+    """对比每次重新设计 (b, a) + filtfilt 与缓存SOS + sosfiltfilt 的耗时"""
+    sg = _scipy_signal()
+    rng = np.random.default_rng(0)
+    pwm = (rng.random(n) < 0.5).astype(np.float64)
+    wn = normalized_cutoff(cutoff_freq, fs)
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        sg.butter(order, wn, btype='low')
+    design_ba = (time.perf_counter() - start) / repeats
+
+    cache = FilterPlanCache()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        cache.get_sos(order, wn, fs)
+    design_cached = (time.perf_counter() - start) / repeats
+
+    b, a = sg.butter(order, wn, btype='low')
+    start = time.perf_counter()
+    sg.filtfilt(b, a, pwm)
+    filt_ba = time.perf_counter() - start
+
+    start = time.perf_counter()
+    lowpass_filter(pwm, cutoff_freq, fs, order, cache=cache)
+    filt_sos = time.perf_counter() - start
+    return {
+        'design_ba_s': design_ba,
+        'design_cached_s': design_cached,
+        'filtfilt_ba_s': filt_ba,
+        'sosfiltfilt_s': filt_sos,
+        'cache': cache.stats(),
+    }
+
+
+def main():
+    print(f"{'window':>8} {'convolve (ms)':>14} {'1-stage (ms)':>13} {'3-stage (ms)':>13} {'max err':>10}")
+    for row in benchmark():
+        conv = f"{row['convolve_s'] * 1e3:.2f}" if "convolve_s" in row else "-"
+        err = f"{row['max_error']:.1e}" if "max_error" in row else "-"
+        print(f"{row['window']:>8d} {conv:>14} {row['running_sum_1_s'] * 1e3:>13.2f} "
+              f"{row['running_sum_3_s'] * 1e3:>13.2f} {err:>10}")
+
+    result = benchmark_filter_cache()
+    print(f"\nbutter (b, a) design: {result['design_ba_s'] * 1e6:.1f} us, "
+          f"cached SOS lookup: {result['design_cached_s'] * 1e6:.2f} us")
+    print(f"filtfilt: {result['filtfilt_ba_s'] * 1e3:.2f} ms, "
+          f"sosfiltfilt: {result['sosfiltfilt_s'] * 1e3:.2f} ms, cache: {result['cache']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""原始字节流的增量解帧器（可重新同步）
+
+抓包文件是连续的字节流：很多帧首尾相接，中间夹着噪声，还有被截断的帧。
+StreamDeframer 每次接收任意长度的一块数据，用 bytes.find（C 实现的多字节
+搜索）找帧头 b"meow" 和帧尾 b"mikuma"，跨块的半帧留到下一块再拼，所以内存
+只和 一块数据 + 最长帧 有关，和文件多大无关。
+
+每个候选帧（帧头到其后第一个帧尾）按 frame_codec 的格式解析并核对校验和；
+校验和不对时正文里可能也有 b"mikuma"，就接着试后面的帧尾（最长 max_frame）。
+候选帧里夹着帧头时，只要从那个帧头到同一个帧尾能拼出好帧，它就是截断的帧后面
+接的下一帧（校验和只有1字节，外面那个碰巧也对得上的话会把它吞掉），不然它只是
+正文里的 b"meow":
+    好帧    产出 Frame，正文是这一块数据的 memoryview 切片（不复制）
+    坏帧    所有候选帧尾都对不上，计数，从这个帧头的下一个字节重新找帧头
+    噪声    两帧之间不属于任何帧的字节，计入 skipped_bytes
+resync 是失去同步的次数：上一个好帧之后第一次遇到坏帧或噪声算一次，
+直到下一个好帧为止（一段噪声被切在几块里也只算一次）。
+
+没有校验和的流是有歧义的：分不出哪个帧尾是真的，只能取第一个，所以正文里
+带 b"mikuma" 的帧会被截短（剩下的部分当噪声）。
+"""
+import time
+from frame_codec import FRAME_FOOTER, FRAME_HEADER, HEAD, OVERHEAD, PREFIX, Frame, byte_sum, encode_frame
+
+MAX_FRAME = 1 << 16     # 比这还长还没找到帧尾，就当这个帧头是噪声
+
+
+class StreamDeframer:
+    """增量解帧器
+
+    args:
+        with_checksum: 帧里有没有校验和字节
+        max_frame: 最长帧（字节），决定最多要留多少没解完的数据
+    """
+
+    def __init__(self, with_checksum=True, max_frame=MAX_FRAME):
+        self.with_checksum = with_checksum
+        self.max_frame = max_frame
+        self.min_frame = OVERHEAD + (1 if with_checksum else 0)
+        self.reset()
+
+    def reset(self):
+        self.tail = b""         # 上一块没解完的部分（从帧头开始，或者可能是半个帧头）
+        self.bytes_in = 0
+        self.good = 0
+        self.bad = 0
+        self.resync = 0
+        self.skipped_bytes = 0
+        self.synced = True      # 上一段是好帧（或者刚开始）
+
+    def feed(self, chunk):
+        """喂一块数据，逐个产出这块里能解出来的 Frame（生成器，要迭代完）"""
+        self.bytes_in += len(chunk)
+        # 不可变的 bytes：产出的正文切片一直有效，下一块来了也不会被改掉
+        data = self.tail + bytes(chunk) if self.tail else bytes(chunk)
+        self.tail = b""
+        view = memoryview(data)
+        size = len(data)
+        find = data.find
+        unpack = HEAD.unpack_from
+        footer = len(FRAME_FOOTER)
+        trailer = footer + (1 if self.with_checksum else 0)
+        pos = 0
+        ahead = None    # find(FRAME_HEADER, x) 的结果（x <= pos），找下一帧时不用把这段再扫一遍
+        while True:
+            if ahead is not None and (ahead < 0 or ahead >= pos):
+                start = ahead
+            else:
+                start = find(FRAME_HEADER, pos)
+            if start < 0:
+                # 末尾可能是半个帧头，留着；其余的都是噪声
+                keep = min(size - pos, len(FRAME_HEADER) - 1)
+                self._skip(size - keep - pos)
+                self.tail = data[size - keep:]
+                return
+            self._skip(start - pos)
+
+            end = find(FRAME_FOOTER, start + self.min_frame - footer)
+            if end < 0 or end + footer - start > self.max_frame:
+                if size - start <= self.max_frame and end < 0:
+                    # 帧尾可能在下一块里：从帧头开始都留着
+                    self.tail = data[start:]
+                    return
+                # 帧头后面 max_frame 字节内都没有帧尾：帧头是噪声或者帧被截断了
+                self.bad += 1
+                self._lost()
+                pos = start + 1
+                continue
+
+            # 帧头帧尾都是 find 找到的，只剩字段和校验和（和 decode_frame 一样，省掉重复检查）
+            end += footer
+            _, src, dst, frame_type = unpack(data, start)
+            payload_end = end - trailer
+            value = None
+            if self.with_checksum:
+                value = data[payload_end]
+                ok = byte_sum(view[start + len(FRAME_HEADER):payload_end]) & 0xFF == value
+                ahead = find(FRAME_HEADER, start + 1)
+                if not ok or 0 <= ahead < end - footer:
+                    end = self._later_footer(data, view, start, end - footer, ok)
+                    if end is None:
+                        # 后面的帧尾可能在下一块里：从帧头开始都留着
+                        self.tail = data[start:]
+                        return
+                    if end < 0:
+                        # 校验不对：可能是截断的帧后面接了下一帧，从下一个字节开始重新找帧头
+                        self.bad += 1
+                        self._lost()
+                        pos = start + 1
+                        continue
+                    end += footer
+                    payload_end = end - trailer
+                    value = data[payload_end]
+            self.good += 1
+            self.synced = True
+            pos = end
+            yield Frame(src, dst, frame_type, view[start + PREFIX:payload_end], value)
+
+    def _later_footer(self, data, view, start, end, first_ok=False):
+        """第一个帧尾 end 校验不对（first_ok 为假）或者中间夹着帧头时，找 start 的帧尾
+
+        正文里也可能有 mikuma、meow，所以校验不对就往后试。中间的帧头到某个帧尾
+        能拼出好帧的话，start 就是截断的帧，放弃，免得把后面的好帧吞掉。
+        返回帧尾的位置；-1 是没有（坏帧）；None 是还要等下一块数据
+        """
+        footer = len(FRAME_FOOTER)
+        shortest = self.min_frame - footer
+        skip = len(FRAME_HEADER)
+
+        def valid(head, tail):
+            return byte_sum(view[head + skip:tail - 1]) & 0xFF == data[tail - 1]
+
+        inner = []          # 中间的帧头，还没拼出过好帧
+        header = data.find(FRAME_HEADER, start + 1)
+        first = True
+        while True:
+            while 0 <= header < end:
+                inner.append(header)
+                header = data.find(FRAME_HEADER, header + 1)
+            for head in inner:
+                if end - head >= shortest and valid(head, end):
+                    return -1
+            if first_ok if first else valid(start, end):
+                return end
+            first = False
+            end = data.find(FRAME_FOOTER, end + 1)
+            if end < 0:
+                return None if len(data) - start <= self.max_frame else -1
+            if end + footer - start > self.max_frame:
+                return -1
+
+    def _lost(self):
+        if self.synced:
+            self.resync += 1
+            self.synced = False
+
+    def _skip(self, count):
+        if count > 0:
+            self.skipped_bytes += count
+            self._lost()
+
+    def flush(self):
+        """流结束：没解完的尾巴算截断的坏帧（或者噪声）"""
+        if self.tail.startswith(FRAME_HEADER):
+            self.bad += 1
+            self._lost()
+        else:
+            self._skip(len(self.tail))
+        self.tail = b""
+
+    def frames(self, chunks):
+        """所有块里的帧（生成器），最后自动 flush"""
+        for chunk in chunks:
+            yield from self.feed(chunk)
+        self.flush()
+
+    def stats(self):
+        return {
+            'bytes_in': self.bytes_in,
+            'good': self.good,
+            'bad': self.bad,
+            'resync': self.resync,
+            'skipped_bytes': self.skipped_bytes,
+        }
+
+
+def deframe_file(path, with_checksum=True, chunk_size=1 << 20, on_frame=None):
+    """解一个抓包文件（'-' 是标准输入），返回统计；on_frame(frame) 对每个好帧调用一次"""
+    from turbo_stream import iter_file_chunks
+    deframer = StreamDeframer(with_checksum)
+    start = time.perf_counter()
+    for frame in deframer.frames(iter_file_chunks(path, chunk_size)):
+        if on_frame is not None:
+            on_frame(frame)
+    elapsed = time.perf_counter() - start
+    stats = deframer.stats()
+    stats['seconds'] = elapsed
+    stats['mb_per_s'] = stats['bytes_in'] / elapsed / 1e6 if elapsed > 0 else float("inf")
+    return stats
+
+
+def synthetic_capture(frames=10000, payload_bytes=64, noise=0.05, corrupt=0.02, truncate=0.02, seed=0):
+    """造一段抓包数据：帧首尾相接，随机夹噪声、翻转一个字节、截断
+
+    返回 (数据, 完好的帧的正文列表)
+    """
+    import random
+    rng = random.Random(seed)
+    out = bytearray()
+    intact = []
+    for _ in range(frames):
+        if rng.random() < noise:
+            out += rng.randbytes(rng.randint(1, 32))
+        payload = rng.randbytes(payload_bytes)
+        frame = encode_frame(0xA101, 0xB202, 0x02, payload)
+        r = rng.random()
+        if r < corrupt:
+            frame[rng.randrange(len(FRAME_HEADER), len(frame) - len(FRAME_FOOTER))] ^= 0xFF
+        elif r < corrupt + truncate:
+            del frame[rng.randrange(len(FRAME_HEADER) + 1, len(frame) - 1):]
+        else:
+            intact.append(payload)
+        out += frame
+    return bytes(out), intact
+
+
+def benchmark(payload_sizes=(16, 256, 4096), total_mb=16, chunk_size=1 << 20, seed=0):
+    """每种正文长度下的解帧速度（MB/s、帧/s），并核对每个完好的帧都按顺序解出来了
+
+    坏帧的校验和只有1字节，偶尔会碰巧对上，这样多出来的好帧记在 false_good 里
+    """
+    import tracemalloc
+    rows = []
+    for size in payload_sizes:
+        frames = max(1000, total_mb * (1 << 20) // (size + OVERHEAD + 1))
+        data, intact = synthetic_capture(frames, size, seed=seed)
+
+        deframer = StreamDeframer()
+        start = time.perf_counter()
+        for _ in deframer.frames(data[i:i + chunk_size] for i in range(0, len(data), chunk_size)):
+            pass
+        elapsed = time.perf_counter() - start
+
+        # tracemalloc 会拖慢每次分配，所以内存另外跑一遍来量
+        tracemalloc.start()
+        for _ in StreamDeframer().frames(data[i:i + chunk_size] for i in range(0, len(data), chunk_size)):
+            pass
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        decoded = iter([bytes(frame.payload) for frame in StreamDeframer().frames(
+            data[i:i + chunk_size] for i in range(0, len(data), chunk_size))])
+        missing = sum(payload not in decoded for payload in intact)   # 按顺序找，decoded 只走一遍
+        if missing:
+            raise AssertionError(f"{len(intact)} 个完好的帧里有 {missing} 个没解出来")
+        rows.append(dict(deframer.stats(), payload_bytes=size, mb_per_s=len(data) / elapsed / 1e6,
+                         frames_per_s=deframer.good / elapsed, peak_mib=peak / 2**20,
+                         false_good=deframer.good - len(intact)))
+    return rows
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="抓包字节流解帧")
+    parser.add_argument("input", nargs="?", help="抓包文件（'-' 是标准输入）；不给就跑基准测试")
+    parser.add_argument("--no-checksum", action="store_true", help="帧里没有校验和")
+    parser.add_argument("--chunk-size", type=int, default=1 << 20, help="每次读多少字节")
+    args = parser.parse_args(argv)
+
+    if args.input is None:
+        print(f"{'正文B':>6} {'好帧':>8} {'误判':>4} {'坏帧':>6} {'重同步':>6} {'MB/s':>8} {'帧/s':>10} {'峰值MiB':>8}")
+        for row in benchmark(chunk_size=args.chunk_size):
+            print(f"{row['payload_bytes']:>6} {row['good']:>8} {row['false_good']:>4} {row['bad']:>6} {row['resync']:>6} "
+                  f"{row['mb_per_s']:>8.1f} {row['frames_per_s']:>10.0f} {row['peak_mib']:>8.2f}")
+        return 0
+
+    stats = deframe_file(args.input, not args.no_checksum, args.chunk_size)
+    print(f"{stats['bytes_in']} 字节: 好帧 {stats['good']}, 坏帧 {stats['bad']}, 重同步 {stats['resync']}, "
+          f"噪声 {stats['skipped_bytes']} 字节, {stats['mb_per_s']:.1f} MB/s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,186 @@
+"""High-rate block producer for SatelliteEncodingApp
+
+Turns the encoding subsystem into a load generator: a producer thread draws
+random 16-bit blocks in NumPy batches, encodes a whole batch with one
+codebook gather and puts it on a bounded queue; a consumer thread drains the
+queue, keeps the newest block for display and (optionally) appends the batch
+to the MonitorLog. Nothing here touches Tk, so the UI thread only samples
+latest() and stats() at its own display rate.
+
+When the queue is full the producer either waits (policy "block":
+backpressure slows it down to what the consumer handles) or discards the
+batch and counts the dropped blocks (policy "drop": it keeps its rate).
+"""
+import queue
+import threading
+import time
+from collections import deque
+import numpy as np
+from codebook import CodebookEncoder
+
+POLICIES = ("block", "drop")
+
+
+class EncodeProducer:
+    """Producer/consumer threads around a bounded queue of encoded batches
+
+    args:
+        rate: target blocks per second (0 = as fast as possible)
+        batch_blocks: blocks generated and encoded per batch
+        max_pending: queue capacity in batches
+        policy: "block" or "drop" when the queue is full
+        log: optional MonitorLog the consumer appends every batch to
+        bits: block length (a full codebook is used, so keep it small)
+    """
+
+    def __init__(self, rate=1000.0, batch_blocks=64, max_pending=16, policy="block", log=None, bits=16,
+                 encoder=None, seed=None):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown queue policy: {policy}")
+        self.rate = rate
+        self.batch_blocks = batch_blocks
+        self.policy = policy
+        self.log = log
+        self.bits = bits
+        self.nbytes = (bits + 7) // 8
+        self.encoder = encoder or CodebookEncoder(max_table_bits=bits)
+        self.encoder.table(bits)   # build / map the codebook before timing starts
+        self.rng = np.random.default_rng(seed)
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._latest = None
+        self._window = deque()      # (time, consumed) samples for the blocks/s estimate
+        self.produced = 0
+        self.consumed = 0
+        self.dropped = 0
+
+    @property
+    def running(self):
+        return any(t.is_alive() for t in self._threads)
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._threads = [threading.Thread(target=self._produce, daemon=True),
+                         threading.Thread(target=self._consume, daemon=True)]
+        for t in self._threads:
+            t.start()
+
+    def stop(self, timeout=1.0):
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+        # Discard whatever is left so a restart begins with an empty queue
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+
+    def _produce(self):
+        next_time = time.perf_counter()
+        while not self._stop.is_set():
+            indices = self.rng.integers(0, 1 << self.bits, self.batch_blocks)
+            rows = self.encoder.encode_indices(indices, self.bits)
+            item = (time.time(), rows)
+            if self.policy == "drop":
+                try:
+                    self._queue.put_nowait(item)
+                    self.produced += len(rows)
+                except queue.Full:
+                    self.dropped += len(rows)
+            else:
+                # Backpressure: wait for room, but keep checking for stop()
+                while not self._stop.is_set():
+                    try:
+                        self._queue.put(item, timeout=0.1)
+                        self.produced += len(rows)
+                        break
+                    except queue.Full:
+                        continue
+
+            if self.rate > 0:
+                # Pace by batch so the average rate is right even with coarse sleeps
+                next_time += self.batch_blocks / self.rate
+                delay = next_time - time.perf_counter()
+                if delay > 0:
+                    self._stop.wait(delay)
+                elif delay < -1.0:
+                    next_time = time.perf_counter()   # fell far behind: don't try to catch up in a burst
+
+    def _consume(self):
+        nbytes = self.nbytes
+        while not self._stop.is_set():
+            try:
+                timestamp, rows = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if self.log is not None:
+                self.log.append_packed("Turbo Encoding", rows[:, :nbytes], rows[:, nbytes:2 * nbytes],
+                                       rows[:, 2 * nbytes:], self.bits, np.full(len(rows), timestamp))
+            with self._lock:
+                self._latest = rows[-1].copy()
+                self.consumed += len(rows)
+
+    def latest(self):
+        """Newest consumed block as TurboEncoder.encode-style lists, or None"""
+        with self._lock:
+            row = self._latest
+        if row is None:
+            return None
+        nbytes = self.nbytes
+        systematic, parity1, parity2 = (np.unpackbits(row[k * nbytes:(k + 1) * nbytes], count=self.bits).tolist()
+                                        for k in range(3))
+        return {
+            'encoded': systematic + parity1 + parity2,
+            'components': {'systematic': systematic, 'parity1': parity1, 'parity2': parity2},
+        }
+
+    def stats(self, window=1.0):
+        """Counters plus blocks/s consumed over the last `window` seconds"""
+        now = time.perf_counter()
+        with self._lock:
+            consumed = self.consumed
+        self._window.append((now, consumed))
+        while len(self._window) > 2 and now - self._window[0][0] > window:
+            self._window.popleft()
+        t0, c0 = self._window[0]
+        return {
+            'produced': self.produced,
+            'consumed': consumed,
+            'dropped': self.dropped,
+            'queue_depth': self._queue.qsize(),
+            'queue_capacity': self._queue.maxsize,
+            'blocks_per_s': (consumed - c0) / (now - t0) if now > t0 else 0.0,
+        }
+
+
+def benchmark(rates=(1000, 100000, 0), seconds=2.0, policy="block"):
+    """Sustained blocks/s, drops and queue depth at a few target rates (0 = unlimited)"""
+    from monitor_log import MonitorLog
+    rows = []
+    for rate in rates:
+        log = MonitorLog(capacity=100000)
+        producer = EncodeProducer(rate, policy=policy, log=log, seed=0)
+        start = time.perf_counter()
+        producer.start()
+        time.sleep(seconds)
+        stats = producer.stats()
+        elapsed = time.perf_counter() - start
+        producer.stop()
+        # stats() has only one sample here, so take the rate over the whole run
+        stats['blocks_per_s'] = stats['consumed'] / elapsed
+        rows.append(dict(stats, rate=rate, elapsed_s=elapsed, log_entries=len(log)))
+    return rows
+
+
+if __name__ == "__main__":
+    for policy in POLICIES:
+        for row in benchmark(policy=policy):
+            print(f"{policy:>5} target {row['rate'] or 'max':>7} blocks/s: {row['blocks_per_s']:>10.0f} blocks/s, "
+                  f"dropped {row['dropped']}, queue {row['queue_depth']}/{row['queue_capacity']}, "
+                  f"log {row['log_entries']} entries")
@@ -0,0 +1,308 @@
+"""Headless multi-process Turbo encoding service and throughput benchmark
+
+EncodingService shards batches of packed blocks across a process pool. The
+input and output bit arrays live in two shared memory buffers split into
+slots (batch_blocks blocks each); the parent copies a batch into a free
+input slot and sends the worker only (slot, blocks), the worker encodes it
+with BatchTurboEncoder straight into the matching output slot. Nothing but
+those small tuples and the timing reply is pickled.
+
+Results come back in submission order, with per-worker and aggregate
+throughput. The benchmark sweeps block size, batch size and worker count,
+appends rows to a CSV and can compare them against a saved baseline.
+
+Usage:
+    python encode_service.py --output bench.csv
+    python encode_service.py --output new.csv --baseline bench.csv   # flag throughput regressions
+"""
+import csv
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from multiprocessing import Pool, shared_memory
+import numpy as np
+from turbo_batch import BatchTurboEncoder
+
+# Set in each worker by _attach: shared buffers viewed as (slots x blocks x bytes) arrays
+_worker = {}
+
+
+def _attach(input_name, output_name, slots, batch_blocks, block_bits, interleaver):
+    """Pool initializer: map the shared buffers once per worker process"""
+    block_bytes = (block_bits + 7) // 8
+    shm_in = shared_memory.SharedMemory(name=input_name)
+    shm_out = shared_memory.SharedMemory(name=output_name)
+    _worker.update(
+        shm=(shm_in, shm_out),
+        input=np.ndarray((slots, batch_blocks, block_bytes), dtype=np.uint8, buffer=shm_in.buf),
+        output=np.ndarray((slots, batch_blocks, 3 * block_bytes), dtype=np.uint8, buffer=shm_out.buf),
+        length=block_bits,
+        encoder=BatchTurboEncoder(interleaver=interleaver),
+    )
+
+
+def _encode_slot(task):
+    """Encode the first `blocks` blocks of an input slot into the output slot (runs in a worker)"""
+    slot, blocks = task
+    start = time.perf_counter()
+    packed = _worker['encoder'].encode_packed(_worker['input'][slot, :blocks], _worker['length'])
+    nbytes = packed['systematic'].shape[1]
+    out = _worker['output'][slot, :blocks]
+    out[:, :nbytes] = packed['systematic']
+    out[:, nbytes:2 * nbytes] = packed['parity1']
+    out[:, 2 * nbytes:] = packed['parity2']
+    return slot, os.getpid(), blocks, time.perf_counter() - start
+
+
+class EncodingService:
+    """Process pool encoding packed blocks through shared memory
+
+    args:
+        block_bits: bits per code block
+        batch_blocks: blocks per task (one shared memory slot)
+        workers: worker processes
+        slots: batches in flight at once; default 2 per worker, so a worker
+               never waits for the parent to refill its next slot
+        interleaver: interleaver family (see interleavers.py)
+
+    Output rows are packed systematic | parity1 | parity2, 3 * ceil(block_bits / 8) bytes.
+    """
+
+    def __init__(self, block_bits=1024, batch_blocks=256, workers=None, slots=None, interleaver="auto"):
+        self.block_bits = block_bits
+        self.block_bytes = (block_bits + 7) // 8
+        self.batch_blocks = batch_blocks
+        self.workers = workers or os.cpu_count() or 1
+        self.slots = slots or 2 * self.workers
+        self.interleaver = interleaver
+        self._pool = None
+        self._shm = None
+        self._busy = threading.Lock()     # held while an encode_batches run owns the slots
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.worker_stats = {}      # pid -> {'blocks', 'busy_s'}
+        self.blocks = 0
+        self.wall_s = 0.0
+
+    def start(self):
+        in_size = self.slots * self.batch_blocks * self.block_bytes
+        self._shm = (shared_memory.SharedMemory(create=True, size=in_size),
+                     shared_memory.SharedMemory(create=True, size=3 * in_size))
+        self._input = np.ndarray((self.slots, self.batch_blocks, self.block_bytes), dtype=np.uint8,
+                                 buffer=self._shm[0].buf)
+        self._output = np.ndarray((self.slots, self.batch_blocks, 3 * self.block_bytes), dtype=np.uint8,
+                                  buffer=self._shm[1].buf)
+        self._pool = Pool(self.workers, initializer=_attach,
+                          initargs=(self._shm[0].name, self._shm[1].name, self.slots, self.batch_blocks,
+                                    self.block_bits, self.interleaver))
+        return self
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+        if self._shm is not None:
+            # Drop the NumPy views before closing, otherwise the buffers are still exported
+            self._input = self._output = None
+            for shm in self._shm:
+                shm.close()
+                shm.unlink()
+            self._shm = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def encode_batches(self, batches, copy=True):
+        """Encode an iterable of (blocks x block_bytes) packed arrays, yielding results in order
+
+        Batches longer than batch_blocks are split. With copy=False the
+        yielded array is a view of shared memory that stays valid only until
+        the next result is requested. The slots belong to one run at a time:
+        starting another (from any thread, or interleaved in the same one)
+        before this one is exhausted or closed raises RuntimeError.
+        """
+        if not self._busy.acquire(blocking=False):
+            raise RuntimeError("EncodingService is already encoding; its shared memory slots are in use")
+        start = time.perf_counter()
+        pending = deque()           # (AsyncResult, slot) in submission order
+        free = list(range(self.slots))
+        try:
+            for batch in batches:
+                batch = np.asarray(batch, dtype=np.uint8)
+                for offset in range(0, len(batch), self.batch_blocks):
+                    part = batch[offset:offset + self.batch_blocks]
+                    if not free:
+                        # Every slot is in flight: hand back the oldest result before reusing its slot
+                        yield self._collect(pending, free, copy)
+                    slot = free.pop()
+                    self._input[slot, :len(part)] = part
+                    pending.append((self._pool.apply_async(_encode_slot, ((slot, len(part)),)), slot))
+            while pending:
+                yield self._collect(pending, free, copy)
+        finally:
+            # Closed early: let in-flight tasks finish before another run reuses their slots
+            for result, _ in pending:
+                result.wait()
+            self.wall_s += time.perf_counter() - start
+            self._busy.release()
+
+    def _collect(self, pending, free, copy):
+        result, slot = pending.popleft()
+        slot, pid, blocks, busy = result.get()
+        stats = self.worker_stats.setdefault(pid, {'blocks': 0, 'busy_s': 0.0})
+        stats['blocks'] += blocks
+        stats['busy_s'] += busy
+        self.blocks += blocks
+        free.append(slot)
+        out = self._output[slot, :blocks]
+        return out.copy() if copy else out
+
+    def encode(self, packed):
+        """Encode a (blocks x block_bytes) array and return the (blocks x 3*block_bytes) result"""
+        packed = np.asarray(packed, dtype=np.uint8)
+        out = np.empty((len(packed), 3 * self.block_bytes), dtype=np.uint8)
+        row = 0
+        for result in self.encode_batches([packed], copy=False):
+            out[row:row + len(result)] = result
+            row += len(result)
+        return out
+
+    def stats(self):
+        """Aggregate and per-worker throughput since the last reset_stats()"""
+        bits = self.blocks * self.block_bits
+        return {
+            'blocks': self.blocks,
+            'wall_s': self.wall_s,
+            'blocks_per_s': self.blocks / self.wall_s if self.wall_s else 0.0,
+            'mbit_per_s': bits / self.wall_s / 1e6 if self.wall_s else 0.0,
+            'workers': {pid: dict(s, blocks_per_s=s['blocks'] / s['busy_s'] if s['busy_s'] else 0.0)
+                        for pid, s in self.worker_stats.items()},
+        }
+
+
+BENCH_FIELDS = ['block_bits', 'batch_blocks', 'workers', 'blocks', 'wall_s', 'blocks_per_s', 'mbit_per_s',
+                'worker_blocks_per_s', 'speedup_vs_inline']
+
+
+def run_point(block_bits, batch_blocks, workers, total_mbit=32, seed=0):
+    """One benchmark point; results are checked against BatchTurboEncoder in-process"""
+    blocks = max(batch_blocks, int(total_mbit * 1e6) // block_bits)
+    rng = np.random.default_rng(seed)
+    packed = np.packbits(rng.integers(0, 2, size=(blocks, block_bits), dtype=np.uint8), axis=1)
+
+    # Same work in the parent process, no pool, for the speedup column
+    encoder = BatchTurboEncoder()
+    nbytes = packed.shape[1]
+    expected = np.empty((blocks, 3 * nbytes), dtype=np.uint8)
+    start = time.perf_counter()
+    for offset in range(0, blocks, batch_blocks):
+        part = encoder.encode_packed(packed[offset:offset + batch_blocks], block_bits)
+        rows = slice(offset, offset + batch_blocks)
+        expected[rows, :nbytes] = part['systematic']
+        expected[rows, nbytes:2 * nbytes] = part['parity1']
+        expected[rows, 2 * nbytes:] = part['parity2']
+    inline = time.perf_counter() - start
+
+    with EncodingService(block_bits, batch_blocks, workers) as service:
+        service.encode(packed[:batch_blocks * workers])     # let every worker start up
+        service.reset_stats()
+        result = service.encode(packed)
+        stats = service.stats()
+
+    if not np.array_equal(result, expected):
+        raise AssertionError("service output differs from BatchTurboEncoder")
+    per_worker = [w['blocks_per_s'] for w in stats['workers'].values()]
+    return {
+        'block_bits': block_bits,
+        'batch_blocks': batch_blocks,
+        'workers': workers,
+        'blocks': stats['blocks'],
+        'wall_s': stats['wall_s'],
+        'blocks_per_s': stats['blocks_per_s'],
+        'mbit_per_s': stats['mbit_per_s'],
+        'worker_blocks_per_s': sum(per_worker) / len(per_worker),
+        'speedup_vs_inline': inline / stats['wall_s'],
+    }
+
+
+def run_benchmark(output, block_sizes=(40, 1024, 6144), batch_sizes=(64, 512), workers=(1, 2, 4),
+                  total_mbit=32, progress=None):
+    """Sweep every (block size, batch size, workers) point, appending one CSV row per point"""
+    new_file = not os.path.exists(output) or os.path.getsize(output) == 0
+    rows = []
+    with open(output, 'a', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=BENCH_FIELDS)
+        if new_file:
+            writer.writeheader()
+        for point in itertools.product(block_sizes, batch_sizes, workers):
+            row = run_point(*point, total_mbit=total_mbit)
+            writer.writerow(row)
+            f.flush()
+            rows.append(row)
+            if progress is not None:
+                progress(row)
+    return rows
+
+
+def load_benchmark(path):
+    """Rows of a benchmark CSV keyed by (block_bits, batch_blocks, workers); the last run of a point wins"""
+    rows = {}
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            key = (int(row['block_bits']), int(row['batch_blocks']), int(row['workers']))
+            rows[key] = {k: float(v) for k, v in row.items()}
+    return rows
+
+
+def compare(baseline, rows, tolerance=0.10):
+    """Points whose blocks/s dropped by more than `tolerance` relative to the baseline"""
+    regressions = []
+    for row in rows:
+        key = (row['block_bits'], row['batch_blocks'], row['workers'])
+        if key in baseline:
+            ratio = row['blocks_per_s'] / baseline[key]['blocks_per_s']
+            if ratio < 1 - tolerance:
+                regressions.append((key, ratio))
+    return regressions
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Multi-process Turbo encoding throughput benchmark")
+    parser.add_argument("--block-bits", type=int, nargs="+", default=[40, 1024, 6144])
+    parser.add_argument("--batch-blocks", type=int, nargs="+", default=[64, 512])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--total-mbit", type=float, default=32, help="information bits per point (Mbit)")
+    parser.add_argument("--output", default="encode_bench.csv")
+    parser.add_argument("--baseline", help="earlier benchmark CSV to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative throughput drop")
+    args = parser.parse_args(argv)
+
+    print(f"{'bits':>6} {'batch':>6} {'workers':>7} {'blocks/s':>10} {'Mbit/s':>8} {'per worker':>11} {'vs inline':>9}")
+
+    def progress(row):
+        print(f"{row['block_bits']:>6d} {row['batch_blocks']:>6d} {row['workers']:>7d} {row['blocks_per_s']:>10.0f} "
+              f"{row['mbit_per_s']:>8.1f} {row['worker_blocks_per_s']:>11.0f} {row['speedup_vs_inline']:>8.2f}x",
+              flush=True)
+
+    baseline = load_benchmark(args.baseline) if args.baseline else None
+    rows = run_benchmark(args.output, args.block_bits, args.batch_blocks, args.workers, args.total_mbit, progress)
+    if baseline is not None:
+        regressions = compare(baseline, rows, args.tolerance)
+        for (bits, batch, workers), ratio in regressions:
+            print(f"regression: {bits} bits, batch {batch}, {workers} workers at {ratio:.0%} of baseline")
+        if regressions:
+            return 1
+        print("no regressions against", args.baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
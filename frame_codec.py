@@ -0,0 +1,228 @@
+"""卫星通信简化协议的二进制帧编解码
+
+帧格式（和 Mode3.SatelliteCommSimulator 一样）:
+
+    帧头 b"meow" | 源地址 2B | 目标地址 2B | 类型 1B | 正文 | [校验和 1B] | 帧尾 b"mikuma"
+
+校验和是 源地址..正文 所有字节之和 mod 256。原来的实现用16进制字符串拼帧、
+再 unhexlify 回来算校验和；这里直接用 struct 写进预先分配好的 bytearray，
+解码出来的正文是原缓冲区的 memoryview 切片，不复制，16进制只在显示时才生成。
+"""
+import binascii
+import struct
+import time
+from collections import namedtuple
+import numpy as np
+
+FRAME_HEADER = b"meow"
+FRAME_FOOTER = b"mikuma"
+HEAD = struct.Struct(">4sHHB")      # 帧头, 源地址, 目标地址, 类型，一次读写完
+PREFIX = HEAD.size
+SUM_NUMPY = 384                     # 从这么长开始用 NumPy 求和（短的逐字节 sum 更快）
+OVERHEAD = PREFIX + len(FRAME_FOOTER)
+
+# 地址和帧类型（Mode3 界面也用这两张表）
+ADDRESSES = {
+    "卫星控制中心": 0xA101,
+    "移动终端1": 0xB202,
+    "移动终端2": 0xC303,
+    "地面站": 0xD404,
+}
+FRAME_TYPES = {
+    "实验帧": 0x01,
+    "数据帧": 0x02,
+    "控制帧": 0x03,
+}
+
+Frame = namedtuple("Frame", ["src", "dst", "frame_type", "payload", "checksum"])
+
+
+class FrameError(ValueError):
+    """帧头、帧尾、长度或校验和不对"""
+
+
+def byte_sum(data):
+    """所有字节之和"""
+    if len(data) < SUM_NUMPY:
+        return sum(data)
+    return int(np.frombuffer(data, dtype=np.uint8).sum(dtype=np.uint64))
+
+
+def checksum(data):
+    """所有字节之和 mod 256"""
+    return byte_sum(data) & 0xFF
+
+
+def frame_size(payload_size, with_checksum=True):
+    """正文为 payload_size 字节时整帧的字节数"""
+    return OVERHEAD + payload_size + (1 if with_checksum else 0)
+
+
+def encode_into(buffer, offset, src, dst, frame_type, payload, with_checksum=True):
+    """把一帧写进 buffer[offset:]，返回帧结束的位置
+
+    payload 可以是 bytes、bytearray、memoryview、Codeword.payload() 等任何缓冲区
+    """
+    if not isinstance(payload, (bytes, bytearray)):
+        payload = memoryview(payload).cast("B")
+    body = offset + PREFIX
+    end = body + len(payload)
+    HEAD.pack_into(buffer, offset, FRAME_HEADER, src, dst, frame_type)
+    buffer[body:end] = payload
+    if with_checksum:
+        # 地址和类型的字节和不用再从缓冲区读回来
+        fields = (src >> 8) + (src & 0xFF) + (dst >> 8) + (dst & 0xFF) + frame_type
+        buffer[end] = (fields + byte_sum(payload)) & 0xFF
+        end += 1
+    buffer[end:end + len(FRAME_FOOTER)] = FRAME_FOOTER
+    return end + len(FRAME_FOOTER)
+
+
+def encode_frame(src, dst, frame_type, payload, with_checksum=True):
+    """编码一帧，返回一个大小正好的 bytearray"""
+    if not isinstance(payload, (bytes, bytearray)):
+        payload = memoryview(payload).cast("B")
+    buffer = bytearray(frame_size(len(payload), with_checksum))
+    encode_into(buffer, 0, src, dst, frame_type, payload, with_checksum)
+    return buffer
+
+
+def decode_frame(frame, with_checksum=True):
+    """解码一帧，返回 Frame；payload 是 frame 的 memoryview 切片（不复制）
+
+    帧头、帧尾、长度或校验和不对时抛 FrameError
+    """
+    view = memoryview(frame)
+    if view.format != "B":
+        view = view.cast("B")
+    size = len(view)
+    minimum = OVERHEAD + (1 if with_checksum else 0)
+    if size < minimum:
+        raise FrameError(f"帧太短: {size} 字节，至少 {minimum} 字节")
+    header, src, dst, frame_type = HEAD.unpack_from(view)
+    if header != FRAME_HEADER:
+        raise FrameError("帧头不是 meow")
+    end = size - len(FRAME_FOOTER)
+    if view[end:] != FRAME_FOOTER:
+        raise FrameError("帧尾不是 mikuma")
+    value = None
+    if with_checksum:
+        end -= 1
+        value = view[end]
+        expected = checksum(view[len(FRAME_HEADER):end])
+        if value != expected:
+            raise FrameError(f"校验和错误: 帧里是 {value:02x}，算出来是 {expected:02x}")
+    return Frame(src, dst, frame_type, view[PREFIX:end], value)
+
+
+def frame_hex(frame):
+    """显示用的16进制字符串（和原来字符串拼出来的帧一样）"""
+    return binascii.hexlify(frame).decode()
+
+
+def describe_frame(frame, with_checksum=True):
+    """给界面显示的逐字段解析"""
+    names = {value: name for name, value in ADDRESSES.items()}
+    types = {value: name for name, value in FRAME_TYPES.items()}
+    parsed = decode_frame(frame, with_checksum)
+    lines = [
+        f"帧头 (meow): {FRAME_HEADER.hex()}",
+        f"源地址 ({names.get(parsed.src, '未知')}): {parsed.src:04X}",
+        f"目标地址 ({names.get(parsed.dst, '未知')}): {parsed.dst:04X}",
+        f"类型 ({types.get(parsed.frame_type, '未知')}): {parsed.frame_type:02x}",
+        f"正文: {parsed.payload.hex()}",
+    ]
+    if with_checksum:
+        lines.append(f"校验和: {parsed.checksum:02x}")
+    lines.append(f"帧尾 (mikuma): {FRAME_FOOTER.hex()}")
+    return "\n".join(lines)
+
+
+def string_frame(src, dst, frame_type, payload_hex, with_checksum=True):
+    """原来 Mode3 的字符串拼帧方法（用来对比）"""
+    content = f"{src}{dst}{frame_type}{payload_hex}"
+    if with_checksum:
+        content += f"{sum(binascii.unhexlify(content)) % 256:02x}"
+    return f"{FRAME_HEADER.hex()}{content}{FRAME_FOOTER.hex()}"
+
+
+def string_parse(frame_hex_text, with_checksum=True):
+    """原来的字符串解析方法（用来对比）：按16进制字符位置切片"""
+    header = len(FRAME_HEADER) * 2
+    footer = len(FRAME_FOOTER) * 2
+    if not frame_hex_text.startswith(FRAME_HEADER.hex()) or not frame_hex_text.endswith(FRAME_FOOTER.hex()):
+        raise FrameError("帧头或帧尾不对")
+    content = frame_hex_text[header:-footer]
+    value = None
+    if with_checksum:
+        content, value = content[:-2], int(content[-2:], 16)
+        if sum(binascii.unhexlify(content)) % 256 != value:
+            raise FrameError("校验和错误")
+    return Frame(int(content[0:4], 16), int(content[4:8], 16), int(content[8:10], 16),
+                 binascii.unhexlify(content[10:]), value)
+
+
+def benchmark(payload_sizes=(16, 256, 4096), count=20000, seed=0):
+    """字符串方法和二进制编解码每秒能处理多少帧"""
+    import random
+    rng = random.Random(seed)
+    rows = []
+    for size in payload_sizes:
+        n = max(200, count * 16 // size)
+        payload = bytes(rng.getrandbits(8) for _ in range(size))
+        payload_hex = payload.hex()
+        src, dst, frame_type = ADDRESSES["卫星控制中心"], ADDRESSES["移动终端1"], FRAME_TYPES["数据帧"]
+
+        start = time.perf_counter()
+        for _ in range(n):
+            text = string_frame(f"{src:04X}", f"{dst:04X}", f"{frame_type:02x}", payload_hex)
+        string_encode = n / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for _ in range(n):
+            frame = encode_frame(src, dst, frame_type, payload)
+        binary_encode = n / (time.perf_counter() - start)
+
+        # 批量写进同一块预分配的缓冲区
+        buffer = bytearray(frame_size(size) * n)
+        start = time.perf_counter()
+        offset = 0
+        for _ in range(n):
+            offset = encode_into(buffer, offset, src, dst, frame_type, payload)
+        batch_encode = n / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for _ in range(n):
+            string_parse(text)
+        string_decode = n / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for _ in range(n):
+            parsed = decode_frame(frame)
+        binary_decode = n / (time.perf_counter() - start)
+
+        if frame_hex(frame) != text.lower() or parsed.payload != payload or string_parse(text).payload != payload:
+            raise AssertionError("二进制帧和字符串帧不一致")
+        rows.append({
+            'payload_bytes': size,
+            'frame_bytes': len(frame),
+            'string_chars': len(text),
+            'string_encode_per_s': string_encode,
+            'binary_encode_per_s': binary_encode,
+            'batch_encode_per_s': batch_encode,
+            'string_decode_per_s': string_decode,
+            'binary_decode_per_s': binary_decode,
+        })
+    return rows
+
+
+def main():
+    print(f"{'正文B':>6} {'帧B':>6} {'字符串编码':>10} {'二进制编码':>10} {'批量编码':>10} {'字符串解码':>10} {'二进制解码':>10}  (帧/秒)")
+    for row in benchmark():
+        print(f"{row['payload_bytes']:>6} {row['frame_bytes']:>6} {row['string_encode_per_s']:>14.0f} "
+              f"{row['binary_encode_per_s']:>14.0f} {row['batch_encode_per_s']:>14.0f} "
+              f"{row['string_decode_per_s']:>14.0f} {row['binary_decode_per_s']:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+"""Interleaver permutations for the Mode2 Turbo encoder
+
+An interleaver of length L is stored as a permutation index array: the
+interleaved sequence is bits[permutation] (one vectorized gather), and the
+inverse permutation undoes it (needed by the decoder for extrinsic LLRs).
+Permutations are built once per (family, length) and kept in a bounded LRU
+cache shared by the encoder, batch encoder and decoder.
+
+Families:
+    linear    the original (3*i + 7) % L mapping, only valid when gcd(3, L) = 1
+    qpp       quadratic permutation polynomial (f1*i + f2*i^2) % L as in LTE
+    affine    (f1*i + 7) % L with f1 coprime to L near sqrt(L), valid for any L
+    s_random  random permutation with spread S: inputs closer than S stay
+              more than S apart after interleaving
+    auto      linear when it is a permutation (so existing output is
+              unchanged), otherwise qpp when L has a true quadratic QPP, and
+              affine for the remaining (square-free) lengths; s_random takes
+              seconds to build at a few thousand bits, too slow for a default
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+INTERLEAVER_FAMILIES = ("linear", "qpp", "affine", "s_random")
+
+# (f1, f2) from the LTE turbo code internal interleaver table (3GPP TS 36.212)
+# for a few common block sizes; other lengths use qpp_coefficients' search
+LTE_QPP = {
+    40: (3, 10),
+    48: (7, 12),
+    56: (19, 42),
+    64: (7, 16),
+    1024: (31, 64),
+    6144: (263, 480),
+}
+
+
+def _prime_factors(n):
+    factors = []
+    p = 2
+    while p * p <= n:
+        if n % p == 0:
+            factors.append(p)
+            while n % p == 0:
+                n //= p
+        p += 1
+    if n > 1:
+        factors.append(n)
+    return factors
+
+
+def _radical(n):
+    return math.prod(_prime_factors(n)) if n > 1 else 1
+
+
+def has_qpp(length):
+    """True when a QPP with f2 % L != 0 exists
+
+    f2 has to be a multiple of every prime factor of L, so for square-free L
+    (radical == L) the only choice is f2 = 0 and the "QPP" is just f1*i.
+    """
+    return _radical(length) < length
+
+
+def _is_permutation(perm, length):
+    return len(perm) == length and np.unique(perm).size == length
+
+
+def linear_permutation(length):
+    """Gather form of TurboEncoder's original scatter result[(3*i + 7) % L] = bits[i]"""
+    if math.gcd(3, length) != 1:
+        raise ValueError(f"linear interleaver (3*i + 7) % L is not a permutation for L = {length} "
+                         f"(gcd(3, L) = 3)")
+    positions = (3 * np.arange(length) + 7) % length
+    perm = np.empty(length, dtype=np.intp)
+    perm[positions] = np.arange(length)
+    return perm
+
+
+def affine_step(length):
+    """f1 for the affine interleaver: the first value coprime to L from around sqrt(L) upwards"""
+    f1 = max(2, math.isqrt(length))
+    while math.gcd(f1, length) != 1:
+        f1 += 1
+    return f1 % length if length > 1 else 0
+
+
+def affine_permutation(length, f1=None):
+    """Gather form of result[(f1*i + 7) % L] = bits[i]; a permutation whenever gcd(f1, L) = 1"""
+    if f1 is None:
+        f1 = affine_step(length)
+    if math.gcd(f1, length) != 1:
+        raise ValueError(f"affine interleaver step {f1} is not coprime to L = {length}")
+    positions = (f1 * np.arange(length, dtype=np.int64) + 7) % length
+    perm = np.empty(length, dtype=np.intp)
+    perm[positions] = np.arange(length)
+    return perm
+
+
+def qpp_coefficients(length):
+    """(f1, f2) for a QPP interleaver of this length
+
+    Uses the LTE table when the length is listed; otherwise f2 is the smallest
+    multiple of every prime factor of L (below L) and f1 the first value
+    coprime to L from around sqrt(L) upwards that gives a valid permutation.
+    Raises ValueError when there is no quadratic permutation (see has_qpp).
+    """
+    if length in LTE_QPP:
+        return LTE_QPP[length]
+    radical = _radical(length)
+    start = max(2, int(math.isqrt(length)))
+    candidates = list(range(start, length)) + list(range(1, start))
+    i = np.arange(length, dtype=np.int64)
+    # f2 % L == 0 would make the polynomial linear, so stop below L
+    for f2 in range(radical, length, radical):
+        for f1 in candidates:
+            if math.gcd(f1, length) != 1:
+                continue
+            perm = (f1 * i + f2 * (i * i % length)) % length
+            if _is_permutation(perm, length):
+                return f1, f2
+    raise ValueError(f"no quadratic permutation polynomial for L = {length} "
+                     f"(square-free length, f2 would have to be 0 mod L)")
+
+
+def qpp_permutation(length, f1=None, f2=None):
+    """pi(i) = (f1*i + f2*i^2) % L"""
+    if f1 is None or f2 is None:
+        f1, f2 = qpp_coefficients(length)
+    i = np.arange(length, dtype=np.int64)
+    perm = ((f1 * i + f2 * (i * i % length)) % length).astype(np.intp)
+    if not _is_permutation(perm, length):
+        raise ValueError(f"QPP ({f1}, {f2}) is not a permutation for L = {length}")
+    return perm
+
+
+def s_random_permutation(length, spread=None, seed=0, attempts=50):
+    """S-random permutation: positions closer than `spread` get values more than `spread` apart
+
+    Each position takes a random unused value that differs by more than
+    `spread` from the values at the previous `spread` positions. Values within
+    `spread` of those are counted in a blocked array, so every step is one
+    vectorized test over all values. When no value fits, the last positions
+    are undone (twice as many each time) and refilled; after `attempts`
+    backtracks the spread is reduced by one. The default spread is
+    0.5 * sqrt(L/2) (sqrt(L/2) is the theoretical limit).
+    """
+    if spread is None:
+        spread = max(1, int(0.5 * math.sqrt(length / 2)))
+    rng = np.random.default_rng(seed)
+    while True:
+        width = 2 * spread + 1
+        free = np.ones(length, dtype=bool)
+        blocked = np.zeros(length + 2 * spread, dtype=np.int32)  # value v is blocked[v + spread]
+        perm = np.empty(length, dtype=np.intp)
+        i = 0
+        back = 2 * spread
+        for _ in range(attempts):
+            while i < length:
+                if i > spread:
+                    # The value chosen spread + 1 positions back no longer constrains
+                    old = perm[i - spread - 1]
+                    blocked[old:old + width] -= 1
+                candidates = np.flatnonzero(free & (blocked[spread:spread + length] == 0))
+                if len(candidates) == 0:
+                    break
+                value = perm[i] = candidates[rng.integers(len(candidates))]
+                free[value] = False
+                blocked[value:value + width] += 1
+                i += 1
+            else:
+                return perm
+            # Stuck: undo the last `back` positions and rebuild the window counts
+            i = max(0, i - back)
+            back *= 2
+            free[:] = True
+            free[perm[:i]] = False
+            blocked[:] = 0
+            for value in perm[max(0, i - spread - 1):i]:
+                blocked[value:value + width] += 1
+        if spread == 0:
+            raise RuntimeError("could not build an S-random permutation")
+        spread -= 1
+
+
+def resolve_family(family, length):
+    """Map 'auto' to the concrete family used for this length"""
+    if family == "auto":
+        if math.gcd(3, length) == 1:
+            return "linear"
+        # Square-free lengths have no true QPP; affine is O(L) where s_random would take seconds
+        return "qpp" if has_qpp(length) else "affine"
+    if family not in INTERLEAVER_FAMILIES:
+        raise ValueError(f"unknown interleaver family: {family}")
+    return family
+
+
+class Interleaver:
+    """A fixed permutation and its inverse (both read-only index arrays)"""
+
+    def __init__(self, family, length, permutation):
+        self.family = family
+        self.length = length
+        self.permutation = np.ascontiguousarray(permutation, dtype=np.intp)
+        self.inverse = np.empty_like(self.permutation)
+        self.inverse[self.permutation] = np.arange(length)
+        self.permutation.setflags(write=False)
+        self.inverse.setflags(write=False)
+
+    def interleave(self, x):
+        """Permute the last axis: out[..., k] = x[..., permutation[k]]"""
+        return np.take(x, self.permutation, axis=-1)
+
+    def deinterleave(self, x):
+        """Undo interleave (works for bits and for LLR arrays alike)"""
+        return np.take(x, self.inverse, axis=-1)
+
+
+def build_interleaver(family, length):
+    family = resolve_family(family, length)
+    if family == "linear":
+        perm = linear_permutation(length)
+    elif family == "qpp":
+        perm = qpp_permutation(length)
+    elif family == "affine":
+        perm = affine_permutation(length)
+    else:
+        perm = s_random_permutation(length)
+    return Interleaver(family, length, perm)
+
+
+class InterleaverCache:
+    """LRU cache of Interleaver objects keyed by (family, length)
+
+    Shared between the GUI thread, encoder threads and worker code, so
+    lookups take a lock; builds run outside it so a slow one does not block
+    lookups of other lengths.
+    """
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, family, length):
+        key = (resolve_family(family, int(length)), int(length))
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                self.hits += 1
+                self._items.move_to_end(key)
+                return item
+
+            self.misses += 1
+        item = build_interleaver(*key)
+        with self._lock:
+            # Another thread may have built the same key meanwhile: keep the first
+            item = self._items.setdefault(key, item)
+            self._items.move_to_end(key)
+            if len(self._items) > self.maxsize:
+                self._items.popitem(last=False)  # evict the least recently used
+        return item
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._items),
+            'maxsize': self.maxsize,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# Module-level cache used by TurboEncoder and the batch encoder/decoder
+INTERLEAVER_CACHE = InterleaverCache()
+
+
+def get_interleaver(family, length, cache=INTERLEAVER_CACHE):
+    return cache.get(family, length)
+
+
+def benchmark(lengths=(16, 1024, 6144), frames=1000, repeats=3, seed=0):
+    """Build time per family, and per-frame Python indexing vs one vectorized gather over all frames"""
+    rng = np.random.default_rng(seed)
+    cache = InterleaverCache()
+    rows = []
+    for length in lengths:
+        bits = rng.integers(0, 2, size=(frames, length), dtype=np.uint8)
+        for family in ("auto",) + INTERLEAVER_FAMILIES:
+            if family == "linear" and math.gcd(3, length) != 1:
+                continue
+            start = time.perf_counter()
+            item = cache.get(family, length)
+            build = time.perf_counter() - start
+
+            perm = item.permutation.tolist()
+            rows_list = bits[:50].tolist()
+            start = time.perf_counter()
+            for row in rows_list:
+                [row[j] for j in perm]
+            loop = (time.perf_counter() - start) / len(rows_list)
+
+            best = float("inf")
+            for _ in range(repeats):
+                start = time.perf_counter()
+                out = cache.get(family, length).interleave(bits)
+                best = min(best, time.perf_counter() - start)
+            if not np.array_equal(item.deinterleave(out), bits):
+                raise AssertionError(f"deinterleave does not invert interleave ({family}, {length})")
+            rows.append({
+                'length': length,
+                'family': item.family if family != "auto" else f"auto:{item.family}",
+                'build_s': build,
+                'loop_frames_per_s': 1.0 / loop,
+                'gather_frames_per_s': frames / best,
+            })
+    return rows, cache.stats()
+
+
+def main():
+    rows, stats = benchmark()
+    print(f"{'bits':>6} {'family':>12} {'build (ms)':>11} {'loop fr/s':>11} {'gather fr/s':>12} {'speedup':>8}")
+    for row in rows:
+        print(f"{row['length']:>6d} {row['family']:>12} {row['build_s'] * 1e3:>11.3f} "
+              f"{row['loop_frames_per_s']:>11.0f} {row['gather_frames_per_s']:>12.0f} "
+              f"{row['gather_frames_per_s'] / row['loop_frames_per_s']:>7.0f}x")
+    print(f"cache: {stats['hits']} hits, {stats['misses']} misses, {stats['size']}/{stats['maxsize']} entries")
+
+
+if __name__ == "__main__":
+    main()
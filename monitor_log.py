@@ -0,0 +1,292 @@
+"""Monitoring log for the Mode2 encoder: compact ring buffer + virtualized Tk view
+
+MonitorLog keeps up to `capacity` entries as fixed-size records in
+preallocated NumPy arrays (timestamp, tag, block length and the packed
+input / systematic / parity1 / parity2 bits), so an entry costs a few dozen
+bytes and appending never allocates. Entries are turned into strings only
+when a row is actually displayed.
+
+VirtualLogView shows the log with a fixed pool of row widgets, just enough
+to fill the visible height. Scrolling or new entries only change the text
+of those rows; refreshes are coalesced so bursts of hundreds of entries per
+second cost one redraw per refresh interval.
+"""
+import datetime
+import threading
+import time
+import tkinter as tk
+from tkinter import ttk
+import numpy as np
+
+LOG_FIELDS = ("input", "output", "systematic", "parity1", "parity2")
+
+
+class MonitorLog:
+    """Fixed-capacity ring buffer of encoder log entries, newest first
+
+    args:
+        capacity: maximum number of entries kept (oldest are overwritten)
+        max_bits: longest block length that can be logged
+    """
+
+    def __init__(self, capacity=100000, max_bits=16):
+        self.capacity = capacity
+        self.max_bits = max_bits
+        nbytes = (max_bits + 7) // 8
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.tags = np.zeros(capacity, dtype=np.uint8)
+        self.lengths = np.zeros(capacity, dtype=np.uint16)
+        # Packed systematic | parity1 | parity2 (the input is the systematic part)
+        self.bits = np.zeros((capacity, 3, nbytes), dtype=np.uint8)
+        self.tag_names = []
+        self.total = 0          # entries ever appended; the next one goes to total % capacity
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def _tag_index(self, tag):
+        if tag not in self.tag_names:
+            self.tag_names.append(tag)
+        return self.tag_names.index(tag)
+
+    def append(self, tag, components, timestamp=None):
+        """Log one encode: components is TurboEncoder.encode(...)['components']"""
+        length = len(components['systematic'])
+        if length > self.max_bits:
+            raise ValueError(f"block of {length} bits is longer than the log's max_bits ({self.max_bits})")
+        packed = np.packbits(np.array([components['systematic'], components['parity1'],
+                                       components['parity2']], dtype=np.uint8), axis=1)
+        with self._lock:
+            slot = self.total % self.capacity
+            self.timestamps[slot] = time.time() if timestamp is None else timestamp
+            self.tags[slot] = self._tag_index(tag)
+            self.lengths[slot] = length
+            self.bits[slot, :, :packed.shape[1]] = packed
+            self.bits[slot, :, packed.shape[1]:] = 0
+            self.total += 1
+
+    def append_packed(self, tag, systematic, parity1, parity2, length, timestamps=None):
+        """Log a batch of encodes given as packed (blocks x bytes) arrays"""
+        if length > self.max_bits:
+            raise ValueError(f"block of {length} bits is longer than the log's max_bits ({self.max_bits})")
+        blocks = len(systematic)
+        if blocks > self.capacity:
+            # Only the newest `capacity` entries would survive anyway
+            skip = blocks - self.capacity
+            systematic, parity1, parity2 = systematic[skip:], parity1[skip:], parity2[skip:]
+            timestamps = None if timestamps is None else np.asarray(timestamps)[skip:]
+            with self._lock:
+                self.total += skip
+            blocks = self.capacity
+        nbytes = np.shape(systematic)[1]
+        with self._lock:
+            slots = (self.total + np.arange(blocks)) % self.capacity
+            self.timestamps[slots] = time.time() if timestamps is None else timestamps
+            self.tags[slots] = self._tag_index(tag)
+            self.lengths[slots] = length
+            self.bits[slots, 0, :nbytes] = systematic
+            self.bits[slots, 1, :nbytes] = parity1
+            self.bits[slots, 2, :nbytes] = parity2
+            self.bits[slots, :, nbytes:] = 0
+            self.total += blocks
+
+    def clear(self):
+        with self._lock:
+            self.total = 0
+
+    def entry(self, i):
+        """Entry i (0 = newest) as a dict: {'tag', 'timestamp', 'data'}"""
+        with self._lock:
+            if not 0 <= i < len(self):
+                raise IndexError(i)
+            slot = (self.total - 1 - i) % self.capacity
+            length = int(self.lengths[slot])
+            rows = np.unpackbits(self.bits[slot], axis=1, count=length)
+            tag = self.tag_names[self.tags[slot]]
+            timestamp = self.timestamps[slot]
+        systematic, parity1, parity2 = (''.join(map(str, row.tolist())) for row in rows)
+        return {
+            'tag': tag,
+            'data': {
+                'input': systematic,
+                'output': systematic + parity1 + parity2,
+                'systematic': systematic,
+                'parity1': parity1,
+                'parity2': parity2,
+            },
+            'timestamp': datetime.datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
+        }
+
+    def memory_bytes(self):
+        return self.timestamps.nbytes + self.tags.nbytes + self.lengths.nbytes + self.bits.nbytes
+
+
+class VirtualLogView(tk.Frame):
+    """Scrollable view of a MonitorLog that only creates widgets for visible rows
+
+    Call notify() (from the Tk thread) after appending entries; the view
+    redraws at most once per refresh_ms. While the newest entry is in view,
+    new entries push older ones down; when scrolled back, the view stays on
+    the same entries.
+    """
+
+    ROW_BG = "#f8f9fa"
+
+    def __init__(self, master, log, refresh_ms=100, **kwargs):
+        super().__init__(master, bg="white", **kwargs)
+        self.log = log
+        self.refresh_ms = refresh_ms
+        self.top = 0                # index of the first visible entry (0 = newest)
+        self._seen_total = log.total
+        self._pending = None
+        self.rows = []              # pool of (frame, header label, data label)
+
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.on_scroll)
+        self.scrollbar.pack(side="right", fill="y")
+        self.body = tk.Frame(self, bg="white", height=300)
+        self.body.pack(side="left", fill="both", expand=True)
+        # The body's size comes from the window, never from how many rows it holds
+        self.body.pack_propagate(False)
+        self.status = tk.Label(self.body, text="No monitoring data available yet.",
+                               font=("Arial", 10, "italic"), fg="#666666", bg="white", anchor="w")
+        self.status.pack(fill="x", pady=5)
+
+        self.row_height = self._measure_row_height()
+        self.body.bind("<Configure>", lambda event: self.refresh())
+        for widget in (self.body, self.status):
+            widget.bind("<MouseWheel>", self.on_wheel)
+            widget.bind("<Button-4>", lambda event: self.scroll_by(-1))
+            widget.bind("<Button-5>", lambda event: self.scroll_by(1))
+
+    def _make_row(self):
+        frame = tk.Frame(self.body, bg=self.ROW_BG, highlightbackground="#3498db", highlightthickness=2,
+                         padx=8, pady=8)
+        header = tk.Label(frame, font=("Arial", 10, "bold"), bg=self.ROW_BG, anchor="w")
+        header.pack(fill="x")
+        data = tk.Label(frame, font=("Courier", 9), bg=self.ROW_BG, anchor="w", justify="left")
+        data.pack(fill="x", pady=(5, 0))
+        for widget in (frame, header, data):
+            widget.bind("<MouseWheel>", self.on_wheel)
+            widget.bind("<Button-4>", lambda event: self.scroll_by(-1))
+            widget.bind("<Button-5>", lambda event: self.scroll_by(1))
+        return frame, header, data
+
+    def _measure_row_height(self):
+        # Every row has the same layout, so one hidden sample gives the height for all
+        frame, header, data = self._make_row()
+        header.config(text="x")
+        data.config(text="\n".join("x" for _ in LOG_FIELDS))
+        frame.update_idletasks()
+        height = frame.winfo_reqheight() + 10   # pady=5 above and below
+        frame.destroy()
+        return height
+
+    def visible_rows(self):
+        return max(1, self.body.winfo_height() // self.row_height)
+
+    def notify(self):
+        """New entries were appended: schedule a (coalesced) refresh"""
+        if self._pending is None:
+            self._pending = self.after(self.refresh_ms, self._flush)
+
+    def _flush(self):
+        self._pending = None
+        added = self.log.total - self._seen_total
+        self._seen_total = self.log.total
+        if added < 0:           # the log was cleared
+            self.top = 0
+        elif self.top > 0:
+            self.top += added   # keep showing the same entries while scrolled back
+        self.refresh()
+
+    def refresh(self):
+        """Fill the row pool with the entries at the current scroll position"""
+        count = len(self.log)
+        visible = self.visible_rows()
+        self.top = max(0, min(self.top, count - visible))
+        if count:
+            self.status.pack_forget()
+        else:
+            self.status.pack(fill="x", pady=5)
+
+        # Grow the pool to fit the visible height; extra rows are hidden, not destroyed
+        while len(self.rows) < min(visible, count):
+            self.rows.append(self._make_row())
+        for k, (frame, header, data) in enumerate(self.rows):
+            i = self.top + k
+            if k < visible and i < count:
+                entry = self.log.entry(i)
+                header.config(text=f"{entry['tag']} - {entry['timestamp']}")
+                data.config(text="\n".join(f"{key}: {value}" for key, value in entry['data'].items()))
+                if not frame.winfo_ismapped():
+                    frame.pack(fill="x", pady=5, padx=5)
+            elif frame.winfo_ismapped():
+                frame.pack_forget()
+
+        if count:
+            self.scrollbar.set(self.top / count, min(1.0, (self.top + visible) / count))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def scroll_by(self, rows):
+        self.top = max(0, self.top + rows)
+        self.refresh()
+
+    def on_wheel(self, event):
+        self.scroll_by(-1 if event.delta > 0 else 1)
+
+    def on_scroll(self, action, *args):
+        """Scrollbar command: ("moveto", fraction) or ("scroll", n, "units" | "pages")"""
+        if action == "moveto":
+            self.top = int(float(args[0]) * len(self.log))
+            self.refresh()
+        elif action == "scroll":
+            step = int(args[0]) * (self.visible_rows() if args[1] == "pages" else 1)
+            self.scroll_by(step)
+
+
+def benchmark(capacity=100000, entries=200000, bits=16, seed=0):
+    """Append rate (single entries and batches), memory use, and cost of formatting one screen"""
+    from codebook import CodebookEncoder
+    rng = np.random.default_rng(seed)
+    encoder = CodebookEncoder()
+    log = MonitorLog(capacity, bits)
+    inputs = rng.integers(0, 2, size=(10000, bits), dtype=np.uint8).tolist()
+    results = [encoder.encode(b)['components'] for b in inputs]
+
+    start = time.perf_counter()
+    for components in results:
+        log.append("Turbo Encoding", components)
+    single = len(results) / (time.perf_counter() - start)
+
+    table = encoder.table(bits)
+    nbytes = (bits + 7) // 8
+    rows = np.asarray(table[rng.integers(0, 1 << bits, entries)])
+    start = time.perf_counter()
+    for offset in range(0, entries, 1000):
+        part = rows[offset:offset + 1000]
+        log.append_packed("Turbo Encoding", part[:, :nbytes], part[:, nbytes:2 * nbytes], part[:, 2 * nbytes:], bits)
+    batched = entries / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(20):
+        log.entry(i)
+    screen = time.perf_counter() - start
+
+    expected = encoder.encode(np.unpackbits(rows[-1, :nbytes], count=bits).tolist())
+    if log.entry(0)['data']['output'] != ''.join(map(str, expected['encoded'])):
+        raise AssertionError("log entry differs from the encoder output")
+    return {
+        'entries': len(log),
+        'memory_mib': log.memory_bytes() / 2**20,
+        'append_per_s': single,
+        'batched_append_per_s': batched,
+        'format_screen_ms': screen * 1e3,
+    }
+
+
+if __name__ == "__main__":
+    row = benchmark()
+    print(f"{row['entries']} entries in {row['memory_mib']:.2f} MiB; append {row['append_per_s']:.0f}/s, "
+          f"batched {row['batched_append_per_s']:.0f}/s; formatting 20 visible rows {row['format_screen_ms']:.2f} ms")
@@ -0,0 +1,234 @@
+"""Mode1 重建质量参数扫描
+对 sample_rate、pwm_frequency、cutoff_freq、filter_order、filter_type 等参数做网格/随机/拉丁超立方采样，
+用进程池并行运行完整的 ADC→PWM→DAC 信号链，结果边算边追加写入CSV，中断后可以续跑，
+最后给出 SNR 与计算耗时的帕累托前沿
+
+用法:
+    python param_sweep.py --design grid --output sweep.csv
+    python param_sweep.py --design lhs --points 200 --workers 8 --output sweep.csv   # 再次运行即续跑
+"""
+import csv
+import itertools
+import math
+import os
+import random
+import time
+from multiprocessing import Pool
+
+from signal_chain import DEFAULT_PARAMS, compute_signal_chain
+
+# 默认网格：每个参数给出候选列表
+DEFAULT_SPACE = {
+    'sample_rate': [10.0, 100.0, 1000.0, 5000.0],   # kHz
+    'pwm_frequency': [0.05, 0.5, 1.0, 5.0],          # kHz
+    'cutoff_freq': [0.1, 1.0, 5.0, 20.0],            # kHz
+    'filter_order': [2, 4, 6, 8],
+    'filter_type': ["Moving Avg", "Butterworth", "Chebyshev I", "Bessel"],
+}
+
+# 连续范围用于随机/拉丁超立方采样；采样率、频率按对数均匀分布
+DEFAULT_RANGES = {
+    'sample_rate': (10.0, 5000.0, 'log'),
+    'pwm_frequency': (0.05, 5.0, 'log'),
+    'cutoff_freq': (0.1, 100.0, 'log'),
+    'filter_order': (1, 8, 'int'),
+    'filter_type': ["Moving Avg", "Butterworth", "Chebyshev I", "Chebyshev II", "Bessel"],
+}
+
+RESULT_FIELDS = ['point_id', 'rmse', 'snr', 'compute_s', 'samples', 'error']
+
+
+def grid_design(space=None):
+    """全网格：每个参数取候选列表中的所有组合"""
+    space = space or DEFAULT_SPACE
+    keys = list(space)
+    return [dict(zip(keys, values)) for values in itertools.product(*(space[k] for k in keys))]
+
+
+def _scale(u, spec):
+    """把 [0, 1) 上的均匀数映射到参数取值"""
+    if isinstance(spec, (list, tuple)) and len(spec) == 3 and spec[2] in ('log', 'linear', 'int'):
+        low, high, kind = spec
+        if kind == 'log':
+            return math.exp(math.log(low) + u * (math.log(high) - math.log(low)))
+        if kind == 'int':
+            return int(low + min(int(u * (high - low + 1)), high - low))
+        return low + u * (high - low)
+    return spec[min(int(u * len(spec)), len(spec) - 1)]  # 类别参数
+
+
+def random_design(points, ranges=None, seed=0):
+    """独立均匀随机采样"""
+    ranges = ranges or DEFAULT_RANGES
+    rng = random.Random(seed)
+    return [{k: _scale(rng.random(), spec) for k, spec in ranges.items()} for _ in range(points)]
+
+
+def latin_hypercube_design(points, ranges=None, seed=0):
+    """拉丁超立方采样：每个参数的取值范围分成 points 层，每层恰好取一个点"""
+    ranges = ranges or DEFAULT_RANGES
+    rng = random.Random(seed)
+    columns = {}
+    for k, spec in ranges.items():
+        strata = [(i + rng.random()) / points for i in range(points)]
+        rng.shuffle(strata)
+        columns[k] = [_scale(u, spec) for u in strata]
+    return [{k: columns[k][i] for k in ranges} for i in range(points)]
+
+
+def _point_id(index, point):
+    """由序号和参数生成稳定的编号，续跑时据此判断哪些点已经算过"""
+    body = ",".join(f"{k}={point[k]!r}" for k in sorted(point))
+    return f"{index}:{body}"
+
+
+def _warm_up():
+    """工作进程启动时先跑一个极小的IIR任务，把 scipy 的导入开销排除在计时之外"""
+    params = dict(DEFAULT_PARAMS, filter_type="Butterworth")
+    compute_signal_chain(params, 0.05)
+
+
+def evaluate_point(task):
+    """在工作进程中运行一个参数点（必须是模块级函数才能被进程池序列化）"""
+    point_id, point, base_params, duration = task
+    params = dict(base_params)
+    params.update(point)
+    start = time.perf_counter()
+    try:
+        result = compute_signal_chain(params, duration)
+        error = ""
+    except Exception as e:
+        result = {'rmse': None, 'snr': None, 't': ()}
+        error = str(e)
+    elapsed = time.perf_counter() - start
+    return {
+        'point_id': point_id,
+        'params': point,
+        'rmse': result['rmse'],
+        'snr': result['snr'],
+        'compute_s': elapsed,
+        'samples': len(result['t']),
+        'error': error,
+    }
+
+
+def _trim_partial_line(path):
+    """进程被强行终止时最后一行可能只写了一半，续跑前把它截掉"""
+    with open(path, 'rb+') as f:
+        data = f.read()
+        if data and not data.endswith(b'\n'):
+            f.truncate(data.rfind(b'\n') + 1)
+
+
+def completed_points(path):
+    """读取已有结果文件中已完成的 point_id"""
+    if not os.path.exists(path):
+        return set()
+    with open(path, newline='', encoding='utf-8') as f:
+        return {row['point_id'] for row in csv.DictReader(f)}
+
+
+def run_sweep(design, output, workers=None, chunksize=4, base_params=None, duration=0.1, progress=None):
+    """并行评估所有参数点，结果按完成顺序追加写入 CSV
+    已经在 output 中的点会被跳过，因此中断后重新运行同一命令即可续跑
+    args:
+        design: 参数点列表（字典），键为要覆盖的信号链参数
+        output: CSV 文件路径
+        workers: 进程数，默认等于CPU核数
+        chunksize: 每次派发给一个工作进程的任务数
+        progress: 可选回调 progress(done, total)
+    """
+    base_params = dict(base_params or DEFAULT_PARAMS)
+    param_keys = sorted({k for point in design for k in point})
+    fields = ['point_id'] + param_keys + RESULT_FIELDS[1:]
+
+    if os.path.exists(output):
+        _trim_partial_line(output)
+    done = completed_points(output)
+    tasks = []
+    for index, point in enumerate(design):
+        point_id = _point_id(index, point)
+        if point_id not in done:
+            tasks.append((point_id, point, base_params, duration))
+
+    new_file = not os.path.exists(output) or os.path.getsize(output) == 0
+    total = len(tasks)
+    with open(output, 'a', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction='ignore')
+        if new_file:
+            writer.writeheader()
+            f.flush()
+        if not tasks:
+            return 0
+        with Pool(processes=workers, initializer=_warm_up) as pool:
+            for count, record in enumerate(pool.imap_unordered(evaluate_point, tasks, chunksize=chunksize), 1):
+                row = dict(record['params'])
+                row.update({k: record[k] for k in RESULT_FIELDS})
+                writer.writerow(row)
+                f.flush()  # 每个结果立即落盘，中断时不丢失已完成的点
+                if progress is not None:
+                    progress(count, total)
+    return total
+
+
+def load_results(path):
+    """读取结果CSV，数值列转换为 float"""
+    rows = []
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            for key in ('rmse', 'snr', 'compute_s'):
+                row[key] = float(row[key]) if row[key] not in ('', 'None') else None
+            rows.append(row)
+    return rows
+
+
+def pareto_front(rows):
+    """SNR 越高越好、计算耗时越低越好，返回不被任何其他点同时支配的点（按耗时排序）"""
+    candidates = [r for r in rows if r['snr'] is not None and not math.isnan(r['snr']) and not r.get('error')]
+    candidates.sort(key=lambda r: (r['compute_s'], -r['snr']))
+    front = []
+    best_snr = -math.inf
+    for row in candidates:
+        if row['snr'] > best_snr:
+            front.append(row)
+            best_snr = row['snr']
+    return front
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Mode1 重建质量参数扫描")
+    parser.add_argument("--design", choices=("grid", "random", "lhs"), default="grid")
+    parser.add_argument("--points", type=int, default=100, help="random/lhs 的采样点数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunksize", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=0.1, help="每个点的信号时长（秒）")
+    parser.add_argument("--output", default="sweep.csv")
+    args = parser.parse_args(argv)
+
+    if args.design == "grid":
+        design = grid_design()
+    elif args.design == "random":
+        design = random_design(args.points, seed=args.seed)
+    else:
+        design = latin_hypercube_design(args.points, seed=args.seed)
+
+    def progress(done, total):
+        if done == total or done % 10 == 0:
+            print(f"\r{done}/{total}", end="", flush=True)
+
+    start = time.perf_counter()
+    count = run_sweep(design, args.output, args.workers, args.chunksize, duration=args.duration,
+                      progress=progress)
+    print(f"\n新计算 {count} 个点，共 {len(design)} 个，用时 {time.perf_counter() - start:.1f} s")
+
+    front = pareto_front(load_results(args.output))
+    print("SNR-耗时帕累托前沿:")
+    for row in front:
+        print(f"  {row['compute_s'] * 1000:8.2f} ms  SNR {row['snr']:7.2f} dB  {row['point_id'].split(':', 1)[1]}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
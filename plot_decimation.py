@@ -0,0 +1,46 @@
+"""绘图用的最小/最大值降采样
+画布只有几百个像素宽，把几十万个点全部交给 matplotlib 既慢又看不出区别。
+这里把数据按像素分箱，每箱保留最小值和最大值两个点（按时间先后排列），
+PWM跳变沿和波形峰值都不会丢失"""
+import numpy as np
+
+
+def minmax_decimate(x, y, n_bins):
+    """把 (x, y) 降采样为约 2*n_bins 个点
+    args:
+        x: 单调递增的横坐标
+        y: 纵坐标
+        n_bins: 分箱数，一般取画布的像素宽度
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    n = len(y)
+    n_bins = max(1, int(n_bins))
+    if n <= 2 * n_bins:
+        return x, y
+
+    k = -(-n // n_bins)  # 每箱样本数（向上取整）
+    full = n // k
+    blocks = y[:full * k].reshape(full, k)
+    offsets = np.arange(full) * k
+    i_min = blocks.argmin(axis=1) + offsets
+    i_max = blocks.argmax(axis=1) + offsets
+
+    if full * k < n:
+        # 最后一个不满的箱单独处理
+        tail = y[full * k:]
+        i_min = np.append(i_min, full * k + tail.argmin())
+        i_max = np.append(i_max, full * k + tail.argmax())
+
+    # 每箱两个点按出现先后排列，保持曲线的时间顺序
+    idx = np.empty(2 * len(i_min), dtype=np.intp)
+    idx[0::2] = np.minimum(i_min, i_max)
+    idx[1::2] = np.maximum(i_min, i_max)
+    return x[idx], y[idx]
+
+
+def visible_slice(x, x_min, x_max):
+    """返回落在 [x_min, x_max] 内的下标范围（两侧各多留一个点，保证线段画到边界）"""
+    start = max(0, int(np.searchsorted(x, x_min, side='left')) - 1)
+    stop = min(len(x), int(np.searchsorted(x, x_max, side='right')) + 1)
+    return slice(start, stop)
@@ -0,0 +1,159 @@
+"""PWM调制引擎
+对整块数组做PWM调制，代替 ADConverterApp.digital_to_pwm 里的逐点循环
+支持边沿对齐/中心对齐两种载波，输出 bool / uint8 / float / 按位打包 四种类型"""
+import time
+import numpy as np
+
+# 载波形状: edge = 锯齿载波（周期开始时拉高），center = 三角载波（脉冲居中）
+CARRIER_TYPES = ("edge", "center")
+
+# 输出类型，bool 和 uint8 每个采样点只占1字节，packed 每8个采样点占1字节
+OUTPUT_DTYPES = {
+    "bool": np.bool_,
+    "uint8": np.uint8,
+    "float": np.float64,
+    "packed": np.uint8,
+}
+
+
+def carrier_phase(t, pwm_frequency):
+    """计算每个采样点在PWM周期内的位置（0~1）
+    与原循环中的 (time % pwm_period) / pwm_period 逐位一致
+    args:
+        t: 时间轴（秒）
+        pwm_frequency: PWM频率（kHz）
+    """
+    pwm_period = 1.0 / (pwm_frequency * 1000)  # kHz转Hz
+    phase = np.remainder(t, pwm_period)
+    phase /= pwm_period
+    return phase
+
+
+def modulate_phase(phase, duty_cycle, carrier="edge", dtype="float"):
+    """把载波相位与占空比比较得到PWM信号
+    args:
+        phase: 载波相位（0~1），可以是任意形状的数组
+        duty_cycle: 占空比（0~1），标量或可广播到 phase 的数组
+        carrier: "edge" 或 "center"
+        dtype: "bool"、"uint8"、"float" 或 "packed"（沿最后一维按位打包，用 unpack_pwm 还原）
+    """
+    if carrier == "edge":
+        high = phase < duty_cycle
+    elif carrier == "center":
+        # 三角载波：周期两端为1，中点为0，高电平以周期中点为中心
+        tri = np.abs(2 * phase - 1)
+        high = tri < duty_cycle
+        # 满占空比时周期起点（tri == 1）也应为高电平
+        full = np.greater_equal(duty_cycle, 1.0)
+        if np.any(full):
+            high |= full
+    else:
+        raise ValueError(f"未知的载波类型: {carrier}")
+
+    if dtype not in OUTPUT_DTYPES:
+        raise ValueError(f"未知的输出类型: {dtype}")
+    if dtype == "bool":
+        return high
+    if dtype == "uint8":
+        return high.view(np.uint8)  # bool 与 uint8 内存布局相同，无需拷贝
+    if dtype == "packed":
+        return pack_pwm(high)
+    return high.astype(np.float64)
+
+
+def pack_pwm(pwm_signal):
+    """把二值PWM信号沿最后一维按位打包（每字节8个采样点，高位在前）"""
+    return np.packbits(np.asarray(pwm_signal, dtype=bool), axis=-1)
+
+
+def unpack_pwm(packed, n):
+    """把 pack_pwm 的结果还原为长度为 n 的 bool 数组"""
+    return np.unpackbits(packed, axis=-1, count=n).view(np.bool_)
+
+
+def pwm_modulate(t, digital_values, bits, pwm_frequency, carrier="edge", dtype="float"):
+    """将数字值转换为PWM信号（向量化版本）
+    carrier="edge", dtype="float" 时结果与原逐点循环完全相同
+    args:
+        t: 时间轴（秒）
+        digital_values: 量化后的数字值
+        bits: ADC位数
+        pwm_frequency: PWM频率（kHz）
+    """
+    max_val = 2**bits - 1
+    phase = carrier_phase(np.asarray(t, dtype=np.float64), pwm_frequency)
+    duty_cycle = np.asarray(digital_values) / max_val
+    return modulate_phase(phase, duty_cycle, carrier, dtype)
+
+
+def reference_digital_to_pwm(t, digital_values, bits, pwm_frequency):
+    """原 ADConverterApp.digital_to_pwm 的逐点循环，仅用于对比和基准测试"""
+    max_val = 2**bits - 1
+    pwm_period = 1.0 / (pwm_frequency * 1000)
+    pwm_signal = np.zeros_like(t)
+    for i, time_point in enumerate(t):
+        position_in_period = (time_point % pwm_period) / pwm_period
+        duty_cycle = digital_values[i] / max_val
+        if position_in_period < duty_cycle:
+            pwm_signal[i] = 1.0
+        else:
+            pwm_signal[i] = 0.0
+    return pwm_signal
+
+
+def _best_time(func, repeats):
+    best = float("inf")
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def benchmark(sample_rates=(0.1, 1.0, 10.0, 100.0, 1000.0, 5000.0), duration=0.1,
+              pwm_frequency=0.5, bits=8, repeats=3):
+    """在Mode1允许的采样率范围内比较逐点循环与向量化引擎的吞吐量
+    args:
+        sample_rates: 采样率列表（kHz）
+        duration: 信号时长（秒），与 ADConverterApp.duration 一致
+    """
+    rows = []
+    max_val = 2**bits - 1
+    for sample_rate in sample_rates:
+        n = int(duration * sample_rate * 1000)
+        t = np.linspace(0, duration, n, endpoint=False)
+        analog = 5.0 * np.sin(2 * np.pi * 10.0 * t)
+        digital = np.round((analog + 5.0) / 10.0 * max_val).clip(0, max_val)
+
+        loop_time, expected = _best_time(
+            lambda: reference_digital_to_pwm(t, digital, bits, pwm_frequency), repeats)
+        row = {"sample_rate_khz": sample_rate, "samples": n, "loop_s": loop_time}
+        for carrier in CARRIER_TYPES:
+            for dtype in ("bool", "uint8", "float"):
+                elapsed, result = _best_time(
+                    lambda: pwm_modulate(t, digital, bits, pwm_frequency, carrier, dtype), repeats)
+                row[f"{carrier}_{dtype}_s"] = elapsed
+                if carrier == "edge":
+                    # 逐位比较，保证与原循环输出一致
+                    if not np.array_equal(result.astype(np.float64), expected):
+                        raise AssertionError(f"{sample_rate} kHz 下向量化结果与循环不一致")
+        rows.append(row)
+    return rows
+
+
+def main():
+    print(f"{'fs (kHz)':>10} {'samples':>9} {'loop (ms)':>10} {'vec (ms)':>9} "
+          f"{'speedup':>8} {'MS/s':>8} {'center (ms)':>12} {'bool (ms)':>10}")
+    for row in benchmark():
+        vec = row["edge_float_s"]
+        throughput = row["samples"] / vec / 1e6 if vec > 0 else float("inf")
+        print(f"{row['sample_rate_khz']:>10.1f} {row['samples']:>9d} "
+              f"{row['loop_s'] * 1e3:>10.2f} {vec * 1e3:>9.3f} "
+              f"{row['loop_s'] / vec if vec > 0 else float('inf'):>7.0f}x "
+              f"{throughput:>8.1f} {row['center_float_s'] * 1e3:>12.3f} "
+              f"{row['edge_bool_s'] * 1e3:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""Puncturing and rate matching for TurboEncoder output
+
+Both operate on the 'encoded' layout (systematic + parity1 + parity2, 3*L
+bits per frame) and are reduced to a precomputed index array per
+(pattern or target length, L), so applying them to a (frames x 3L) batch is
+one np.take. The inverse operations put received LLRs back at their
+positions and leave 0 (no information) for bits that were not sent.
+
+Puncturing patterns are 3 x period 0/1 matrices, one row per stream: bit k
+of stream r is sent when pattern[r][k % period] is 1.
+
+Rate matching reads a circular buffer (all systematic bits, then parity1
+and parity2 interlaced) from a start offset set by the redundancy version
+until `target` bits are out, wrapping around (repeating bits) when the
+target is longer than the buffer.
+"""
+import time
+from functools import lru_cache
+import numpy as np
+
+PUNCTURE_PATTERNS = {
+    "1/3": ((1,), (1,), (1,)),
+    "1/2": ((1, 1), (1, 0), (0, 1)),
+    "2/3": ((1, 1, 1, 1), (1, 0, 0, 0), (0, 0, 1, 0)),
+    "3/4": ((1, 1, 1, 1, 1, 1), (1, 0, 0, 0, 0, 0), (0, 0, 0, 1, 0, 0)),
+}
+
+REDUNDANCY_VERSIONS = 4
+
+
+def _pattern_key(pattern):
+    """Pattern name or matrix -> hashable tuple of 3 rows"""
+    if isinstance(pattern, str):
+        if pattern not in PUNCTURE_PATTERNS:
+            raise ValueError(f"unknown puncturing pattern: {pattern}")
+        return PUNCTURE_PATTERNS[pattern]
+    rows = tuple(tuple(int(bool(v)) for v in row) for row in pattern)
+    if len(rows) != 3 or len({len(row) for row in rows}) != 1 or not rows[0]:
+        raise ValueError("puncturing pattern must be 3 rows of equal, non-zero length")
+    if not any(any(row) for row in rows):
+        raise ValueError("puncturing pattern removes every bit")
+    return rows
+
+
+@lru_cache(maxsize=64)
+def _puncture_indices(pattern, length):
+    mask = np.array(pattern, dtype=bool)
+    keep = np.resize(mask.T, (length, 3)).T if length else np.zeros((3, 0), dtype=bool)
+    # np.resize of the transposed pattern repeats whole columns: keep[r, k] = mask[r, k % period]
+    index = np.flatnonzero(keep.ravel())
+    index.setflags(write=False)
+    return index
+
+
+def puncture_indices(pattern, length):
+    """Positions in the 3*length 'encoded' array that are sent (read-only array)"""
+    return _puncture_indices(_pattern_key(pattern), int(length))
+
+
+def code_rate(pattern, length):
+    """Information bits / sent bits for this pattern and block length"""
+    return length / len(puncture_indices(pattern, length))
+
+
+def puncture(encoded, pattern):
+    """Keep the sent bits of every (frames x 3L) row (1-D input works too)"""
+    encoded = np.asarray(encoded)
+    return np.take(encoded, puncture_indices(pattern, encoded.shape[-1] // 3), axis=-1)
+
+
+@lru_cache(maxsize=64)
+def _depuncture_source(pattern, length):
+    # For every 'encoded' position, its index among the sent bits, or the
+    # index of an extra zero column when it was punctured
+    index = _puncture_indices(pattern, length)
+    source = np.full(3 * length, len(index), dtype=np.intp)
+    source[index] = np.arange(len(index))
+    source.setflags(write=False)
+    return source
+
+
+def depuncture(llr, pattern, length):
+    """Back to the (frames x 3L) layout with 0 LLR for punctured bits"""
+    llr = np.asarray(llr, dtype=np.float32)
+    sent = llr.shape[-1]
+    padded = np.empty(llr.shape[:-1] + (sent + 1,), dtype=np.float32)
+    padded[..., :sent] = llr
+    padded[..., sent] = 0.0
+    return np.take(padded, _depuncture_source(_pattern_key(pattern), int(length)), axis=-1)
+
+
+@lru_cache(maxsize=64)
+def circular_buffer_order(length):
+    """Index into 'encoded' of each circular buffer position: systematic, then p1/p2 interlaced"""
+    order = np.empty(3 * length, dtype=np.intp)
+    order[:length] = np.arange(length)
+    order[length::2] = length + np.arange(length)          # parity1
+    order[length + 1::2] = 2 * length + np.arange(length)  # parity2
+    order.setflags(write=False)
+    return order
+
+
+@lru_cache(maxsize=64)
+def rate_match_indices(length, target, rv=0):
+    """'encoded' index of each of the `target` transmitted bits for redundancy version rv"""
+    if not 0 <= rv < REDUNDANCY_VERSIONS:
+        raise ValueError(f"redundancy version must be 0..{REDUNDANCY_VERSIONS - 1}")
+    size = 3 * length
+    if size == 0:
+        raise ValueError("cannot rate match an empty block")
+    if target <= 0:
+        raise ValueError(f"rate matching target must be positive, got {target}")
+    start = rv * size // REDUNDANCY_VERSIONS
+    index = circular_buffer_order(length)[(start + np.arange(target)) % size]
+    index.setflags(write=False)
+    return index
+
+
+def rate_match(encoded, target, rv=0):
+    """Select `target` bits of every (frames x 3L) row from the circular buffer"""
+    encoded = np.asarray(encoded)
+    return np.take(encoded, rate_match_indices(encoded.shape[-1] // 3, int(target), rv), axis=-1)
+
+
+@lru_cache(maxsize=64)
+def _dematch_source(length, rv):
+    # Transmitted bit j is buffer position (start + j) % size; for every
+    # 'encoded' position this is its j within one pass around the buffer
+    size = 3 * length
+    start = rv * size // REDUNDANCY_VERSIONS
+    source = np.empty(size, dtype=np.intp)
+    source[circular_buffer_order(length)] = (np.arange(size) - start) % size
+    source.setflags(write=False)
+    return source
+
+
+def rate_dematch(llr, length, rv=0):
+    """Back to the (frames x 3L) layout: repeated bits add their LLRs, unsent bits get 0"""
+    llr = np.asarray(llr, dtype=np.float32)
+    target = llr.shape[-1]
+    rate_match_indices(length, target, rv)  # validates the arguments
+    size = 3 * length
+    passes = -(-target // size)
+    # Zero-pad to whole passes around the buffer and add the passes together
+    padded = np.zeros(llr.shape[:-1] + (passes * size,), dtype=np.float32)
+    padded[..., :target] = llr
+    combined = padded.reshape(llr.shape[:-1] + (passes, size)).sum(axis=-2) if passes > 1 else padded
+    return np.take(combined, _dematch_source(int(length), rv), axis=-1)
+
+
+def benchmark(length=1024, frames=1000, repeats=5, seed=0):
+    """Time per batch of puncture/depuncture and rate match/dematch against per-bit Python loops"""
+    rng = np.random.default_rng(seed)
+    encoded = rng.integers(0, 2, size=(frames, 3 * length), dtype=np.uint8)
+    rows = []
+    cases = [(name, lambda x, p=name: puncture(x, p), lambda y, p=name: depuncture(y, p, length),
+              puncture_indices(name, length)) for name in PUNCTURE_PATTERNS]
+    for target in (length * 2, length * 4):
+        cases.append((f"RM {target}", lambda x, e=target: rate_match(x, e),
+                      lambda y: rate_dematch(y, length), rate_match_indices(length, target)))
+    for name, forward, inverse, index in cases:
+        def best_of(fn, arg):
+            best = float("inf")
+            for _ in range(repeats):
+                start = time.perf_counter()
+                out = fn(arg)
+                best = min(best, time.perf_counter() - start)
+            return best, out
+
+        fwd_time, sent = best_of(forward, encoded)
+        inv_time, _ = best_of(inverse, rng.normal(size=(frames, len(index))).astype(np.float32))
+
+        rows_list = encoded[:20].tolist()
+        positions = index.tolist()
+        start = time.perf_counter()
+        for row in rows_list:
+            [row[i] for i in positions]
+        loop = (time.perf_counter() - start) / len(rows_list)
+
+        if sent[:20].tolist() != [[row[i] for i in positions] for row in rows_list]:
+            raise AssertionError(f"{name}: gather differs from the per-bit loop")
+        rows.append({
+            'name': name,
+            'sent_bits': len(index),
+            'rate': length / len(index),
+            'loop_frames_per_s': 1.0 / loop,
+            'forward_frames_per_s': frames / fwd_time,
+            'inverse_frames_per_s': frames / inv_time,
+        })
+    return rows
+
+
+def main():
+    length = 1024
+    print(f"{length}-bit blocks")
+    print(f"{'mode':>8} {'sent':>6} {'rate':>6} {'loop fr/s':>10} {'gather fr/s':>12} {'inverse fr/s':>13}")
+    for row in benchmark(length):
+        print(f"{row['name']:>8} {row['sent_bits']:>6d} {row['rate']:>6.3f} {row['loop_frames_per_s']:>10.0f} "
+              f"{row['forward_frames_per_s']:>12.0f} {row['inverse_frames_per_s']:>13.0f}")
+
+
+if __name__ == "__main__":
+    main()
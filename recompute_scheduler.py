@@ -0,0 +1,124 @@
+"""Mode1 参数变化的后台重算调度器
+连续的参数变化先去抖合并，再交给工作线程计算；参数已经变化的旧结果直接丢弃，
+只有最新的结果才会回到界面线程"""
+import time
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+
+
+class _WorkerSignals(QObject):
+    """QRunnable 不是 QObject，需要单独的对象来发信号（跨线程自动排队到界面线程）"""
+    finished = pyqtSignal(int, object, object, float)  # 代数, 参数, 结果, 耗时(s)
+    failed = pyqtSignal(int, str)
+
+
+class _ComputeTask(QRunnable):
+    def __init__(self, compute, generation, params, signals):
+        super().__init__()
+        self.compute = compute
+        self.generation = generation
+        self.params = params
+        self.signals = signals
+
+    def run(self):
+        start = time.perf_counter()
+        try:
+            result = self.compute(self.params)
+        except Exception as e:
+            self.signals.failed.emit(self.generation, str(e))
+            return
+        self.signals.finished.emit(self.generation, self.params, result, time.perf_counter() - start)
+
+
+class RecomputeScheduler(QObject):
+    """去抖 + 后台计算 + 丢弃过期结果
+    args:
+        compute: 在工作线程中调用的函数 compute(params) -> result，不能访问界面控件
+        debounce_ms: 最后一次参数变化后等待多久才开始计算
+    """
+    result_ready = pyqtSignal(object, object)  # 参数, 结果
+    stats_changed = pyqtSignal(dict)
+
+    def __init__(self, compute, debounce_ms=80, parent=None):
+        super().__init__(parent)
+        self.compute = compute
+        self._pool = QThreadPool()
+        self._pool.setMaxThreadCount(1)  # 同一时间只算一组参数，新的参数排队合并
+        self._signals = _WorkerSignals()
+        self._signals.finished.connect(self._on_finished)
+        self._signals.failed.connect(self._on_failed)
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(debounce_ms)
+        self._timer.timeout.connect(self._dispatch)
+
+        self._generation = 0        # 每次参数变化加1
+        self._pending = None        # 尚未提交的最新参数
+        self._in_flight = False
+        self.requested = 0          # 收到的重算请求总数
+        self.coalesced = 0          # 被合并掉、没有单独计算的请求
+        self.dropped = 0            # 计算完成时参数已变化而被丢弃的结果
+        self.last_latency = 0.0     # 最近一次计算耗时（秒）
+
+    @property
+    def queue_depth(self):
+        """等待中的请求数 + 正在计算的任务数"""
+        return (1 if self._pending is not None else 0) + (1 if self._in_flight else 0)
+
+    def request(self, params):
+        """提交一组新参数，去抖时间内的多次提交只保留最后一次"""
+        self._generation += 1
+        self.requested += 1
+        if self._pending is not None:
+            self.coalesced += 1
+        self._pending = params
+        self._timer.start()  # 重新开始计时
+        self._emit_stats()
+
+    def _dispatch(self):
+        if self._pending is None or self._in_flight:
+            return  # 正在计算时等它完成后再提交最新参数
+        params = self._pending
+        self._pending = None
+        self._in_flight = True
+        self._pool.start(_ComputeTask(self.compute, self._generation, params, self._signals))
+        self._emit_stats()
+
+    def _on_finished(self, generation, params, result, latency):
+        self._in_flight = False
+        self.last_latency = latency
+        if generation == self._generation:
+            self.result_ready.emit(params, result)
+        else:
+            self.dropped += 1  # 参数已经变了，结果过期
+        if self._pending is not None and not self._timer.isActive():
+            self._dispatch()
+        self._emit_stats()
+
+    def _on_failed(self, generation, message):
+        print(f"错误: {message}")
+        self._in_flight = False
+        if self._pending is not None and not self._timer.isActive():
+            self._dispatch()
+        self._emit_stats()
+
+    def is_idle(self):
+        return self._pending is None and not self._in_flight
+
+    def stats(self):
+        return {
+            'queue_depth': self.queue_depth,
+            'latency_ms': self.last_latency * 1000,
+            'requested': self.requested,
+            'coalesced': self.coalesced,
+            'dropped': self.dropped,
+        }
+
+    def _emit_stats(self):
+        self.stats_changed.emit(self.stats())
+
+    def shutdown(self):
+        """停止计时并等待正在运行的计算结束"""
+        self._timer.stop()
+        self._pending = None
+        self._pool.waitForDone()
@@ -0,0 +1,450 @@
+"""Mode1 信号链中的纯计算部分
+波形生成、AD量化、PWM调制、DA重建和质量指标都不依赖界面，
+可以在流式模式、后台线程和其他脚本中复用。
+只依赖 numpy，scipy 在第一次用到IIR滤波器时才导入，不导入 PyQt5/matplotlib。
+
+命令行用法（批处理）:
+    python signal_chain.py --wave-type Square --sample-rate 5000 --output runs/job1
+    python signal_chain.py --measure-startup
+    python signal_chain.py --measure-memory --sample-rate 5000
+"""
+import numpy as np
+from pwm_engine import pwm_modulate
+from dac_filters import FILTER_FAMILIES, moving_average, window_for_cutoff, lowpass_filter
+
+WAVE_TYPES = ("Sine", "Square", "Triangle")
+FILTER_TYPES = ("Moving Avg",) + FILTER_FAMILIES
+
+# 与 Mode1 界面的默认值一致
+DEFAULT_PARAMS = {
+    'wave_type': "Sine",
+    'frequency': 10.0,
+    'amplitude': 5.0,
+    'duty_cycle': 0.5,
+    'sample_rate': 1.0,       # kHz
+    'bits': 8,
+    'ref_voltage': 5.0,
+    'pwm_frequency': 0.5,     # kHz
+    'pwm_carrier': "edge",
+    'cutoff_freq': 20.0,      # kHz
+    'filter_order': 4,
+    'filter_type': "Moving Avg",
+    'ma_stages': 1,
+    'show_original': True,
+    'channels': 1,            # 大于1时按 channel_bank 批量仿真多个通道
+}
+
+
+def waveform_from_phase(phase, wave_type, amplitude, duty_cycle=0.5):
+    """根据相位（以周期为单位，0~1）生成波形
+    args:
+        phase: 相位数组，取值范围 [0, 1)
+        wave_type: "Sine"、"Square" 或 "Triangle"
+        amplitude: 幅值（V）
+        duty_cycle: 方波占空比（0~1）
+    """
+    if wave_type == "Sine":
+        return amplitude * np.sin(2 * np.pi * phase)
+    if wave_type == "Square":
+        analog_signal = amplitude * (phase < duty_cycle).astype(float)
+        return analog_signal * 2 - amplitude  # Center around 0
+    if wave_type == "Triangle":
+        return amplitude * 2 * np.abs(2 * phase - 1) - amplitude
+    raise ValueError(f"未知的波形类型: {wave_type}")
+
+
+def generate_waveform(t, wave_type, frequency, amplitude, duty_cycle=0.5):
+    """在时间轴 t 上生成波形
+    与 ADConverterApp.update_signal 的原公式一致：frequency 的数值直接乘以秒"""
+    if wave_type == "Sine":
+        return amplitude * np.sin(2 * np.pi * frequency * t)
+    return waveform_from_phase((t * frequency) % 1, wave_type, amplitude, duty_cycle)
+
+
+def generate_waveform_bank(t, wave_types, frequency, amplitudes, duty_cycles=0.5):
+    """一次生成多通道波形，返回 (通道数 × 样本数) 数组
+    同类波形的通道共用一次 sin/取模运算，每个通道的结果与 generate_waveform 相同
+    args:
+        t: 公共时间轴
+        wave_types: 每个通道的波形类型列表
+        amplitudes: 每个通道的幅值
+        duty_cycles: 每个通道的方波占空比（标量则所有通道相同）
+    """
+    t = np.asarray(t)
+    channels = len(wave_types)
+    amplitudes = np.asarray(amplitudes, dtype=np.float64).reshape(channels, 1)
+    duty_cycles = np.broadcast_to(np.asarray(duty_cycles, dtype=np.float64), (channels,)).reshape(channels, 1)
+    bank = np.empty((channels, len(t)))
+    phase = None
+    for wave_type in sorted(set(wave_types)):
+        rows = np.array([i for i, w in enumerate(wave_types) if w == wave_type])
+        if wave_type == "Sine":
+            bank[rows] = amplitudes[rows] * np.sin(2 * np.pi * frequency * t)
+        else:
+            if phase is None:
+                phase = (t * frequency) % 1
+            bank[rows] = waveform_from_phase(phase, wave_type, amplitudes[rows], duty_cycles[rows])
+    return bank
+
+
+def code_dtype(bits):
+    """能容纳 bits 位量化码的最小无符号整数类型"""
+    if bits <= 8:
+        return np.uint8
+    if bits <= 16:
+        return np.uint16
+    return np.uint32
+
+
+def analog_to_digital_values(analog_signal, bits, reference_voltage):
+    """将模拟信号转换为数字值（量化级别）
+    返回 code_dtype(bits) 类型的整数码（8位ADC每点1字节），数值与原浮点实现相同
+    多通道时 analog_signal 为 (通道数 × 样本数)，reference_voltage 可以是 (通道数, 1) 的列向量"""
+    # Clip signal to reference voltage range
+    normalized = np.clip(analog_signal, -reference_voltage, reference_voltage)
+
+    # Calculate max digital value
+    max_val = 2**bits - 1
+
+    # Normalize to 0 - max_val range（原地运算，运算顺序与原公式相同，只保留一个浮点临时数组）
+    normalized += reference_voltage
+    normalized /= 2 * reference_voltage
+    normalized *= max_val
+
+    # Round to nearest integer and clip to valid range
+    np.round(normalized, out=normalized)
+    np.clip(normalized, 0, max_val, out=normalized)
+
+    return normalized.astype(code_dtype(bits))
+
+
+def pwm_to_analog(t, pwm_signal, cutoff_freq, filter_order, reference_voltage, filter_type, ma_stages=1):
+    """将PWM信号转换回模拟信号，使用低通滤波器模拟DA转换过程"""
+    # 计算采样频率
+    if len(t) < 2:
+        return np.zeros(np.shape(pwm_signal))
+
+    fs = 1.0 / (t[1] - t[0])  # 采样频率
+
+    if filter_type == "Moving Avg":
+        # 使用移动平均滤波（累加和实现，耗时与窗口长度无关）
+        window_size = window_for_cutoff(cutoff_freq, fs)
+        filtered = moving_average(pwm_signal, window_size, ma_stages)
+    else:
+        # 使用IIR滤波器（巴特沃斯/切比雪夫/贝塞尔）
+        try:
+            # 设计结果按 (阶数, 归一化截止, fs, 类型) 缓存，以二阶节形式零相位滤波
+            filtered = lowpass_filter(pwm_signal, cutoff_freq, fs, filter_order, filter_type)
+        except Exception as e:
+            print(f"滤波器错误: {e}")
+            # 如果IIR滤波器出错，回退到移动平均
+            window_size = window_for_cutoff(cutoff_freq, fs)
+            filtered = moving_average(pwm_signal, window_size, ma_stages)
+
+    # 将滤波后的PWM信号映射回模拟电压范围
+    return (filtered * 2 - 1) * reference_voltage
+
+
+def quality_metrics(analog_signal, reconstructed_signal, axis=None):
+    """计算重建误差，返回 (RMSE, SNR dB)
+    axis=-1 时对 (通道数 × 样本数) 数组逐通道计算，返回两个长度为通道数的数组"""
+    error = analog_signal - reconstructed_signal
+    if axis is None:
+        rmse = np.sqrt(np.mean(error ** 2))
+        signal_power = np.sum(analog_signal ** 2)
+        if signal_power > 0:
+            with np.errstate(divide='ignore'):
+                snr = 10 * np.log10(signal_power / np.sum(error ** 2))
+        else:
+            snr = 0
+        return rmse, snr
+
+    rmse = np.sqrt(np.mean(error ** 2, axis=axis))
+    signal_power = np.sum(analog_signal ** 2, axis=axis)
+    error_power = np.sum(error ** 2, axis=axis)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        snr = 10 * np.log10(signal_power / error_power)
+    snr = np.where(signal_power > 0, snr, 0.0)  # 无信号的通道与单通道一样记为0
+    return rmse, snr
+
+
+def compute_signal_chain(params, duration=0.1):
+    """按参数字典完整运行一次 ADC→PWM→DAC，返回各级信号和质量指标
+    params 的键与 ADConverterApp.collect_params 相同"""
+    sample_rate = params['sample_rate']
+    bits = params['bits']
+    ref_voltage = params['ref_voltage']
+
+    # 生成时间轴，采样率为kHz，需乘1000
+    t = np.linspace(0, duration, int(duration * sample_rate * 1000), endpoint=False)
+
+    analog_signal = generate_waveform(t, params['wave_type'], params['frequency'],
+                                      params['amplitude'], params['duty_cycle'])
+    digital_values = analog_to_digital_values(analog_signal, bits, ref_voltage)
+    # PWM信号是0/1，用bool保存（每点1字节），只有滤波器输出才是浮点
+    pwm_signal = pwm_modulate(t, digital_values, bits, params['pwm_frequency'], params['pwm_carrier'], "bool")
+    reconstructed_signal = pwm_to_analog(t, pwm_signal, params['cutoff_freq'], params['filter_order'],
+                                         ref_voltage, params['filter_type'], params['ma_stages'])
+
+    result = {
+        't': t,
+        'analog': analog_signal,
+        'digital': digital_values,
+        'pwm': pwm_signal,
+        'reconstructed': reconstructed_signal,
+        'rmse': None,
+        'snr': None,
+    }
+    if len(analog_signal) > 0:
+        result['rmse'], result['snr'] = quality_metrics(analog_signal, reconstructed_signal)
+    return result
+
+
+def channel_bank(params, channels):
+    """由界面参数派生一组演示用的通道配置：波形类型轮换，幅值从设定值递减
+    返回每个通道的参数覆盖字典列表"""
+    bank = []
+    for i in range(channels):
+        bank.append({
+            'wave_type': WAVE_TYPES[(WAVE_TYPES.index(params['wave_type']) + i) % len(WAVE_TYPES)],
+            'amplitude': params['amplitude'] * (channels - i) / channels,
+            'duty_cycle': params['duty_cycle'],
+            'ref_voltage': params['ref_voltage'],
+        })
+    return bank
+
+
+def compute_multichannel_chain(params, channels, duration=0.1):
+    """多通道批量运行 ADC→PWM→DAC：所有环节都在 (通道数 × 样本数) 数组上一次完成
+    args:
+        params: 公共参数（采样率、PWM、滤波器等），键与 DEFAULT_PARAMS 相同
+        channels: 每个通道的覆盖参数列表，可覆盖 wave_type、amplitude、duty_cycle、ref_voltage
+    返回的字典中信号为二维数组，rmse/snr 为逐通道数组，throughput 单位为 通道·样本/秒
+    """
+    import time
+    start = time.perf_counter()
+    count = len(channels)
+    bits = params['bits']
+    sample_rate = params['sample_rate']
+    t = np.linspace(0, duration, int(duration * sample_rate * 1000), endpoint=False)
+
+    wave_types = [ch.get('wave_type', params['wave_type']) for ch in channels]
+    amplitudes = [ch.get('amplitude', params['amplitude']) for ch in channels]
+    duty_cycles = [ch.get('duty_cycle', params['duty_cycle']) for ch in channels]
+    ref_voltage = np.array([ch.get('ref_voltage', params['ref_voltage']) for ch in channels],
+                           dtype=np.float64).reshape(count, 1)
+
+    analog_signal = generate_waveform_bank(t, wave_types, params['frequency'], amplitudes, duty_cycles)
+    digital_values = analog_to_digital_values(analog_signal, bits, ref_voltage)
+    # PWM信号是0/1，用bool保存（每点1字节），只有滤波器输出才是浮点
+    pwm_signal = pwm_modulate(t, digital_values, bits, params['pwm_frequency'], params['pwm_carrier'], "bool")
+    reconstructed_signal = pwm_to_analog(t, pwm_signal, params['cutoff_freq'], params['filter_order'],
+                                         ref_voltage, params['filter_type'], params['ma_stages'])
+    rmse, snr = quality_metrics(analog_signal, reconstructed_signal, axis=-1)
+    elapsed = time.perf_counter() - start
+    return {
+        't': t,
+        'analog': analog_signal,
+        'digital': digital_values,
+        'pwm': pwm_signal,
+        'reconstructed': reconstructed_signal,
+        'rmse': rmse,
+        'snr': snr,
+        'channels': channels,
+        'elapsed': elapsed,
+        'throughput': count * len(t) / elapsed if elapsed > 0 else float('inf'),
+    }
+
+
+def compute_chain(params, duration=0.1):
+    """按 params['channels'] 选择单通道或多通道批量计算（Mode1 后台线程调用）"""
+    channels = params.get('channels', 1)
+    if channels > 1:
+        return compute_multichannel_chain(params, channel_bank(params, channels), duration)
+    return compute_signal_chain(params, duration)
+
+
+def _metric(value):
+    """质量指标转成 JSON 能写的值：多通道时是每个通道一个值的列表"""
+    if value is None:
+        return None
+    if np.ndim(value):
+        return [float(v) for v in value]
+    return float(value)
+
+
+def save_results(result, params, output_dir, elapsed=None, save_arrays=True):
+    """把信号数组写成 signals.npz，参数和质量指标写成 metrics.json
+    多通道结果的数组是 (通道数, 采样点数)，rmse/snr 是每个通道一个值"""
+    import json
+    import os
+    os.makedirs(output_dir, exist_ok=True)
+    if save_arrays:
+        np.savez(os.path.join(output_dir, "signals.npz"),
+                 t=result['t'], analog=result['analog'], digital=result['digital'],
+                 pwm=result['pwm'], reconstructed=result['reconstructed'])
+    metrics = {
+        'params': params,
+        'samples': int(len(result['t'])),
+        'rmse': _metric(result['rmse']),
+        'snr': _metric(result['snr']),
+        'elapsed_s': elapsed,
+    }
+    if 'channels' in result:
+        metrics['channels'] = result['channels']
+    with open(os.path.join(output_dir, "metrics.json"), "w", encoding="utf-8") as f:
+        json.dump(metrics, f, ensure_ascii=False, indent=2)
+    return metrics
+
+
+def measure_startup(repeats=5):
+    """分别在新的解释器里测量导入本模块和导入 Mode1 界面的耗时（秒，取最小值）"""
+    import os
+    import subprocess
+    import sys
+    import time
+    here = os.path.dirname(os.path.abspath(__file__))
+    timings = {}
+    for name, code in (("signal_chain", "import signal_chain"), ("Mode1", "import Mode1")):
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            proc = subprocess.run([sys.executable, "-c", code], cwd=here,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            elapsed = time.perf_counter() - start
+            if proc.returncode != 0:
+                best = None
+                break
+            best = min(best, elapsed)
+        timings[name] = best
+    return timings
+
+
+def _legacy_float_chain(params, duration=0.1):
+    """改用紧凑类型之前的信号链：数字值和PWM信号都是 float64，仅供 measure_memory 对比"""
+    sample_rate = params['sample_rate']
+    bits = params['bits']
+    ref_voltage = params['ref_voltage']
+    t = np.linspace(0, duration, int(duration * sample_rate * 1000), endpoint=False)
+    analog_signal = generate_waveform(t, params['wave_type'], params['frequency'],
+                                      params['amplitude'], params['duty_cycle'])
+    clipped_signal = np.clip(analog_signal, -ref_voltage, ref_voltage)
+    max_val = 2**bits - 1
+    normalized = ((clipped_signal + ref_voltage) / (2 * ref_voltage)) * max_val
+    digital_values = np.round(normalized).clip(0, max_val)
+    pwm_signal = pwm_modulate(t, digital_values, bits, params['pwm_frequency'], params['pwm_carrier'], "float")
+    reconstructed_signal = pwm_to_analog(t, pwm_signal, params['cutoff_freq'], params['filter_order'],
+                                         ref_voltage, params['filter_type'], params['ma_stages'])
+    return {'t': t, 'analog': analog_signal, 'digital': digital_values, 'pwm': pwm_signal,
+            'reconstructed': reconstructed_signal}
+
+
+def measure_memory(params=None, duration=0.1):
+    """用 tracemalloc 测量一次信号链的内存峰值，对比 float64 旧实现与紧凑类型实现
+    返回 {名称: {'peak_bytes', 'digital_bytes', 'pwm_bytes'}}，并检查两者的重建结果一致"""
+    import tracemalloc
+    params = dict(DEFAULT_PARAMS, **(params or {}))
+    # 先各跑一次，把 scipy 导入和滤波器设计等一次性开销排除在外
+    _legacy_float_chain(params, duration)
+    compute_signal_chain(params, duration)
+
+    report = {}
+    results = {}
+    for name, func in (("float64", _legacy_float_chain), ("compact", compute_signal_chain)):
+        tracemalloc.start()
+        result = func(params, duration)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = result
+        report[name] = {
+            'peak_bytes': peak,
+            'digital_bytes': result['digital'].nbytes,
+            'pwm_bytes': result['pwm'].nbytes,
+        }
+    legacy, compact = results["float64"], results["compact"]
+    if not (np.array_equal(legacy['digital'], compact['digital'])
+            and np.array_equal(legacy['pwm'], compact['pwm'])):
+        raise AssertionError("紧凑类型的数字值/PWM信号与 float64 实现不一致")
+    report['max_reconstruction_diff'] = float(np.max(np.abs(legacy['reconstructed'] - compact['reconstructed']),
+                                                     initial=0.0))
+    return report
+
+
+def main(argv=None):
+    import argparse
+    import time
+    parser = argparse.ArgumentParser(description="Mode1 ADC→PWM→DAC 信号链（无界面）")
+    parser.add_argument("--params", help="参数JSON文件，键与 DEFAULT_PARAMS 相同")
+    parser.add_argument("--wave-type", choices=WAVE_TYPES)
+    parser.add_argument("--amplitude", type=float)
+    parser.add_argument("--duty-cycle", type=float, help="方波占空比（0~1）")
+    parser.add_argument("--sample-rate", type=float, help="采样率（kHz）")
+    parser.add_argument("--ref-voltage", type=float)
+    parser.add_argument("--pwm-frequency", type=float, help="PWM频率（kHz）")
+    parser.add_argument("--pwm-carrier", choices=("edge", "center"))
+    parser.add_argument("--cutoff-freq", type=float, help="低通截止频率（kHz）")
+    parser.add_argument("--filter-order", type=int)
+    parser.add_argument("--filter-type", choices=FILTER_TYPES)
+    parser.add_argument("--ma-stages", type=int)
+    parser.add_argument("--channels", type=int, help="通道数，大于1时批量仿真 channel_bank 生成的通道")
+    parser.add_argument("--duration", type=float, default=0.1, help="信号时长（秒）")
+    parser.add_argument("--output", help="输出目录，不指定则只打印指标")
+    parser.add_argument("--metrics-only", action="store_true", help="只写 metrics.json，不写信号数组")
+    parser.add_argument("--measure-startup", action="store_true", help="比较本模块与 Mode1 界面的导入耗时")
+    parser.add_argument("--measure-memory", action="store_true",
+                        help="比较 float64 旧实现与紧凑类型实现的内存峰值")
+    args = parser.parse_args(argv)
+
+    if args.measure_startup:
+        timings = measure_startup()
+        for name, elapsed in timings.items():
+            text = "导入失败" if elapsed is None else f"{elapsed * 1000:.1f} ms"
+            print(f"import {name}: {text}")
+        return 0
+
+    params = dict(DEFAULT_PARAMS)
+    if args.params:
+        import json
+        with open(args.params, encoding="utf-8") as f:
+            params.update(json.load(f))
+    for key in ('wave_type', 'amplitude', 'duty_cycle', 'sample_rate', 'ref_voltage', 'pwm_frequency',
+                'pwm_carrier', 'cutoff_freq', 'filter_order', 'filter_type', 'ma_stages', 'channels'):
+        value = getattr(args, key)
+        if value is not None:
+            params[key] = value
+
+    if args.measure_memory:
+        report = measure_memory(params, args.duration)
+        for name in ("float64", "compact"):
+            row = report[name]
+            print(f"{name:>8}: peak {row['peak_bytes'] / 2**20:8.2f} MiB, "
+                  f"digital {row['digital_bytes'] / 2**20:7.2f} MiB, pwm {row['pwm_bytes'] / 2**20:7.2f} MiB")
+        print(f"max reconstruction diff: {report['max_reconstruction_diff']:.3g} V")
+        return 0
+
+    if params.get('channels', 1) > 1:
+        result = compute_multichannel_chain(params, channel_bank(params, params['channels']), args.duration)
+        if args.output:
+            save_results(result, params, args.output, result['elapsed'], save_arrays=not args.metrics_only)
+        for ch, (rmse, snr) in enumerate(zip(result['rmse'], result['snr'])):
+            print(f"ch {ch:2d} {result['channels'][ch]['wave_type']:>8}: RMSE {rmse:.4f} V, SNR {snr:.2f} dB")
+        print(f"{len(result['rmse'])} ch × {len(result['t'])} samples, time: {result['elapsed'] * 1000:.1f} ms, "
+              f"throughput: {result['throughput'] / 1e6:.1f} M channel-samples/s")
+        return 0
+
+    start = time.perf_counter()
+    result = compute_signal_chain(params, args.duration)
+    elapsed = time.perf_counter() - start
+
+    if args.output:
+        save_results(result, params, args.output, elapsed, save_arrays=not args.metrics_only)
+    if result['rmse'] is None:
+        print(f"samples: 0, time: {elapsed * 1000:.1f} ms")
+    else:
+        print(f"samples: {len(result['t'])}, RMSE: {result['rmse']:.4f} V, "
+              f"SNR: {result['snr']:.2f} dB, time: {elapsed * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,172 @@
+"""Mode1 实时模式的流式 ADC→PWM→DAC 信号链
+时间轴单调前进，波形与PWM载波的相位在块之间连续，滤波器状态跨块保持，
+每次只计算新到的样本，采集时长不受限制"""
+import numpy as np
+from signal_chain import analog_to_digital_values, code_dtype
+from pwm_engine import modulate_phase
+from dac_filters import StreamingMovingAverage, StreamingLowpass, window_for_cutoff
+from waveform_tables import TableSynth
+
+# 这些参数改变时需要重建重建滤波器（状态清零），其余参数可以直接生效
+FILTER_PARAMS = ("sample_rate", "cutoff_freq", "filter_order", "filter_type", "ma_stages")
+
+
+class PhaseAccumulator:
+    """相位累加器，相位以周期为单位保存在 [0, 1) 内，长时间运行也不会丢失精度"""
+
+    def __init__(self, phase=0.0):
+        self.phase = phase
+
+    def advance(self, n, increment):
+        """返回接下来 n 个采样点的相位，并把内部相位推进 n 步"""
+        phases = self.phase + np.arange(n) * increment
+        phases %= 1.0
+        self.phase = (self.phase + n * increment) % 1.0
+        return phases
+
+
+class RollingBuffer:
+    """固定容量的环形缓冲区，保存最近 capacity 个样本用于显示"""
+
+    def __init__(self, capacity, dtype=np.float64):
+        self.capacity = max(1, int(capacity))
+        self._data = np.zeros(self.capacity, dtype=dtype)
+        self._pos = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, chunk):
+        chunk = np.asarray(chunk)
+        n = len(chunk)
+        if n >= self.capacity:
+            self._data[:] = chunk[-self.capacity:]
+            self._pos = 0
+            self._size = self.capacity
+            return
+        end = self._pos + n
+        if end <= self.capacity:
+            self._data[self._pos:end] = chunk
+        else:
+            first = self.capacity - self._pos
+            self._data[self._pos:] = chunk[:first]
+            self._data[:n - first] = chunk[first:]
+        self._pos = end % self.capacity
+        self._size = min(self.capacity, self._size + n)
+
+    def astype(self, dtype):
+        """改变存储类型，已有样本保留（ADC位数变化后量化码需要更宽的整数类型）"""
+        self._data = self._data.astype(dtype)
+
+    def view(self):
+        """按时间顺序返回缓冲区内容（拷贝）"""
+        if self._size < self.capacity:
+            return self._data[:self._size].copy()
+        return np.concatenate((self._data[self._pos:], self._data[:self._pos]))
+
+
+class StreamingChain:
+    """分块推进的 ADC→PWM→DAC 仿真
+    params 与 ADConverterApp.collect_params 返回的字典相同"""
+
+    def __init__(self, params, display_duration=0.1):
+        self.display_duration = display_duration
+        self.sample_index = 0         # 已生成的样本总数，决定时间轴
+        self._fractional = 0.0        # 不足一个样本的剩余时间（以样本为单位）
+        self.signal_phase = TableSynth()  # 波形按周期查表平铺，不再逐点计算 sin
+        self.carrier_phase = PhaseAccumulator()
+        self.params = None
+        self.configure(params)
+
+    @property
+    def fs(self):
+        return self.params['sample_rate'] * 1000  # kHz转Hz
+
+    @property
+    def time(self):
+        """当前时间（秒）"""
+        return self.sample_index / self.fs
+
+    def configure(self, params):
+        """更新参数；时间轴和相位保持连续，只有滤波参数变化时才重建滤波器"""
+        old = self.params
+        self.params = dict(params)
+        if old is None or old['sample_rate'] != self.params['sample_rate']:
+            # 采样率变化后按当前时间换算新的样本序号，保证时间轴连续
+            current_time = self.sample_index / (old['sample_rate'] * 1000) if old else 0.0
+            self.sample_index = int(round(current_time * self.fs))
+            self._fractional = 0.0
+            self._make_buffers()
+        elif code_dtype(old['bits']) != code_dtype(self.params['bits']):
+            self.digital_buffer.astype(code_dtype(self.params['bits']))
+        if old is None or any(old[k] != self.params[k] for k in FILTER_PARAMS):
+            self._make_filter()
+
+    def _make_buffers(self):
+        capacity = max(1, int(self.display_duration * self.fs))
+        self.t_buffer = RollingBuffer(capacity)
+        self.analog_buffer = RollingBuffer(capacity)
+        self.digital_buffer = RollingBuffer(capacity, code_dtype(self.params['bits']))
+        self.pwm_buffer = RollingBuffer(capacity, np.bool_)
+        self.reconstructed_buffer = RollingBuffer(capacity)
+
+    def _make_filter(self):
+        p = self.params
+        if p['filter_type'] == "Moving Avg":
+            window_size = window_for_cutoff(p['cutoff_freq'], self.fs)
+            self.filter = StreamingMovingAverage(window_size, p['ma_stages'])
+        else:
+            self.filter = StreamingLowpass(p['cutoff_freq'], self.fs, p['filter_order'], p['filter_type'])
+
+    def advance(self, seconds):
+        """推进 seconds 秒，只计算新样本，返回本块的结果字典"""
+        samples = self._fractional + seconds * self.fs
+        n = int(samples)
+        self._fractional = samples - n
+        return self.process(n)
+
+    def process(self, n):
+        """生成并处理接下来的 n 个样本"""
+        p = self.params
+        fs = self.fs
+        t = (self.sample_index + np.arange(n)) / fs
+        self.sample_index += n
+
+        # 波形：frequency 的数值按每秒周期数累加，与 update_signal 的公式一致
+        analog_signal = self.signal_phase.generate(n, p['wave_type'], p['amplitude'], p['duty_cycle'],
+                                                   fs / p['frequency'])
+
+        digital_values = analog_to_digital_values(analog_signal, p['bits'], p['ref_voltage'])
+
+        # PWM载波相位同样跨块连续
+        carrier = self.carrier_phase.advance(n, p['pwm_frequency'] * 1000 / fs)
+        duty = digital_values / (2**p['bits'] - 1)
+        pwm_signal = modulate_phase(carrier, duty, p['pwm_carrier'], "bool")
+
+        filtered = self.filter.process(pwm_signal)
+        reconstructed_signal = (filtered * 2 - 1) * p['ref_voltage']
+
+        chunk = {
+            't': t,
+            'analog': analog_signal,
+            'digital': digital_values,
+            'pwm': pwm_signal,
+            'reconstructed': reconstructed_signal,
+        }
+        self.t_buffer.append(t)
+        self.analog_buffer.append(analog_signal)
+        self.digital_buffer.append(digital_values)
+        self.pwm_buffer.append(pwm_signal)
+        self.reconstructed_buffer.append(reconstructed_signal)
+        return chunk
+
+    def window(self):
+        """返回最近 display_duration 秒的数据，用于界面显示"""
+        return {
+            't': self.t_buffer.view(),
+            'analog': self.analog_buffer.view(),
+            'digital': self.digital_buffer.view(),
+            'pwm': self.pwm_buffer.view(),
+            'reconstructed': self.reconstructed_buffer.view(),
+        }
@@ -0,0 +1,283 @@
+"""Mode1 频谱分析
+对 analog / pwm / reconstructed 三路信号做 Welch 功率谱估计：每来一块新数据只对新凑满的分段做FFT，
+不足一段的尾巴留到下一块，窗函数、频率轴和归一化系数按 (窗类型, 段长, fs) 缓存。
+BackgroundSpectrum 在后台线程里计算，界面线程只取最近一次的结果，不会被FFT阻塞"""
+import queue
+import threading
+import time
+from functools import lru_cache
+import numpy as np
+
+SPECTRUM_STAGES = ("analog", "pwm", "reconstructed")
+
+
+@lru_cache(maxsize=32)
+def get_window(name, nperseg):
+    """周期窗（与 scipy.signal.get_window 的默认一致），结果只读以便安全共享"""
+    n = np.arange(nperseg)
+    if name == "hann":
+        window = 0.5 - 0.5 * np.cos(2 * np.pi * n / nperseg)
+    elif name == "hamming":
+        window = 0.54 - 0.46 * np.cos(2 * np.pi * n / nperseg)
+    elif name == "boxcar":
+        window = np.ones(nperseg)
+    else:
+        raise ValueError(f"未知的窗函数: {name}")
+    window.setflags(write=False)
+    return window
+
+
+@lru_cache(maxsize=32)
+def spectrum_plan(nperseg, fs, window="hann"):
+    """一组 Welch 参数的固定部分：窗函数、频率轴、功率谱密度的归一化系数"""
+    w = get_window(window, nperseg)
+    freqs = np.fft.rfftfreq(nperseg, 1.0 / fs)
+    freqs.setflags(write=False)
+    scale = np.full(len(freqs), 1.0 / (fs * np.sum(w * w)))
+    # 单边谱：除直流和奈奎斯特频率外功率乘2
+    if nperseg % 2:
+        scale[1:] *= 2
+    else:
+        scale[1:-1] *= 2
+    scale.setflags(write=False)
+    return w, freqs, scale
+
+
+def segment_length(samples, max_nperseg=4096, min_nperseg=16):
+    """不超过 samples 的最大2的幂作为段长，限制在 [min_nperseg, max_nperseg]"""
+    if samples < min_nperseg:
+        return min_nperseg
+    return int(min(max_nperseg, 2 ** int(np.log2(samples))))
+
+
+class WelchAccumulator:
+    """分块输入的 Welch 功率谱估计
+    args:
+        fs: 采样频率（Hz）
+        nperseg: 每段长度
+        overlap: 相邻分段的重叠比例
+        averages: None 表示对所有分段等权平均（结果与 scipy.signal.welch(detrend=False) 一致）；
+                  整数表示指数平均，时间常数约为 averages 个分段，参数变化后频谱能跟上
+    """
+
+    def __init__(self, fs, nperseg=4096, overlap=0.5, window="hann", averages=None):
+        self.fs = float(fs)
+        self.nperseg = int(nperseg)
+        self.hop = max(1, int(self.nperseg * (1 - overlap)))
+        self.window = window
+        self.averages = averages
+        self.reset()
+
+    def reset(self):
+        self._tail = np.zeros(0)    # 上一块剩下、还不够组成新分段的样本
+        self._psd = None
+        self.segments = 0
+
+    def gap(self):
+        """输入不连续（中间丢了数据）：丢掉尾巴，已有的平均结果保留"""
+        self._tail = np.zeros(0)
+
+    def process(self, chunk):
+        """送入一块新样本，只计算新凑满的分段，返回本次新增的分段数"""
+        x = np.concatenate((self._tail, np.asarray(chunk, dtype=np.float64)))
+        count = (len(x) - self.nperseg) // self.hop + 1 if len(x) >= self.nperseg else 0
+        if count == 0:
+            self._tail = x
+            return 0
+        w, _, scale = spectrum_plan(self.nperseg, self.fs, self.window)
+        segments = np.lib.stride_tricks.sliding_window_view(x, self.nperseg)[::self.hop][:count]
+        spectra = np.fft.rfft(segments * w, axis=-1)
+        power = spectra.real ** 2 + spectra.imag ** 2
+        power *= scale
+        self._tail = x[count * self.hop:]
+
+        if self.averages is None:
+            total = power.sum(axis=0)
+            self._psd = total if self._psd is None else self._psd + total
+        else:
+            # 逐段做 psd += alpha * (row - psd) 等价于一次加权求和
+            alpha = 1.0 / self.averages
+            if self._psd is None:
+                self._psd, power = power[0].copy(), power[1:]
+            k = len(power)
+            weights = alpha * (1 - alpha) ** np.arange(k - 1, -1, -1)
+            self._psd = (1 - alpha) ** k * self._psd + weights @ power
+        self.segments += count
+        return count
+
+    def psd(self):
+        """返回 (频率 Hz, 功率谱密度)，还没有完整分段时返回 None"""
+        if self._psd is None:
+            return None
+        _, freqs, _ = spectrum_plan(self.nperseg, self.fs, self.window)
+        if self.averages is None:
+            return freqs, self._psd / self.segments
+        return freqs, self._psd.copy()
+
+
+class SpectrumAnalyzer:
+    """三路信号各一个 WelchAccumulator，参数相同"""
+
+    def __init__(self, fs, nperseg=4096, overlap=0.5, window="hann", averages=None, stages=SPECTRUM_STAGES):
+        self.fs = fs
+        self.nperseg = nperseg
+        self.accumulators = {stage: WelchAccumulator(fs, nperseg, overlap, window, averages) for stage in stages}
+
+    def process(self, chunk):
+        """chunk 为 StreamingChain.process 返回的字典"""
+        new = 0
+        for stage, acc in self.accumulators.items():
+            new = acc.process(chunk[stage])
+        return new
+
+    def gap(self):
+        for acc in self.accumulators.values():
+            acc.gap()
+
+    def spectra(self):
+        """{信号名: (频率 Hz, 功率谱密度)}，没有结果的信号不出现"""
+        result = {}
+        for stage, acc in self.accumulators.items():
+            psd = acc.psd()
+            if psd is not None:
+                result[stage] = psd
+        return result
+
+
+class BackgroundSpectrum:
+    """在后台线程中运行 SpectrumAnalyzer
+    submit 不会阻塞：待处理的块超过 max_pending 时丢弃新块（并记一次不连续），
+    界面线程定时调用 latest() 取最近一次的频谱
+    计算出错时线程不会退出：错误记在 error / errors（第一次会打印），丢掉这一块并从下一块重新开始
+    args:
+        max_nperseg: 段长上限，实际段长按第一块的长度取2的幂
+        averages: 见 WelchAccumulator
+    """
+
+    def __init__(self, max_nperseg=4096, overlap=0.5, window="hann", averages=16, max_pending=4):
+        self.max_nperseg = max_nperseg
+        self.overlap = overlap
+        self.window = window
+        self.averages = averages
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._latest = None
+        self.version = 0            # 每算出一次新频谱加1
+        self.dropped = 0            # 因为来不及处理而丢弃的块
+        self.last_latency = 0.0     # 最近一块的计算耗时（秒）
+        self.error = None           # 最近一次计算出错的异常
+        self.errors = 0             # 出错的块数
+        self._analyzer = None
+        self._gap = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, chunk, fs, reset=False):
+        """提交一块数据；reset=True 表示与之前的数据无关（例如参数变化后整段重算的结果）"""
+        try:
+            self._queue.put_nowait((chunk, fs, reset))
+        except queue.Full:
+            self.dropped += 1
+            # 后面的数据与已经排队的不连续，下一块进来时丢掉尾巴
+            with self._lock:
+                self._gap = True
+
+    def latest(self):
+        """(version, {信号名: (频率, 功率谱密度)})，还没有结果时为 (0, None)"""
+        with self._lock:
+            return self.version, self._latest
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            chunk, fs, reset = item
+            start = time.perf_counter()
+            try:
+                spectra = self._process(chunk, fs, reset)
+            except Exception as e:
+                # 一块数据出错不能让线程退出，否则之后的频谱会一直停住
+                if self.errors == 0:
+                    print(f"频谱计算错误: {e}")
+                self.errors += 1
+                self.error = e
+                self._analyzer = None   # 累积状态可能已经不完整，从下一块重新开始
+                continue
+            if spectra is None:
+                continue
+            with self._lock:
+                self._latest = spectra
+                self.version += 1
+                self.last_latency = time.perf_counter() - start
+
+    def _process(self, chunk, fs, reset):
+        """处理一块数据，返回新的频谱；还不够一个分段时返回 None"""
+        n = len(chunk[SPECTRUM_STAGES[0]])
+        if reset or self._analyzer is None or self._analyzer.fs != fs:
+            self._analyzer = SpectrumAnalyzer(fs, segment_length(n, self.max_nperseg), self.overlap,
+                                              self.window, None if reset else self.averages)
+        with self._lock:
+            gap, self._gap = self._gap, False
+        if gap:
+            self._analyzer.gap()
+        if self._analyzer.process(chunk) == 0:
+            return None
+        return self._analyzer.spectra()
+
+    def stop(self):
+        self._queue.put(None)
+        self._thread.join(timeout=1.0)
+
+
+def benchmark(sample_rate=5000.0, seconds=2.0, chunk_duration=0.05, nperseg=4096):
+    """对比每块都对整个显示窗口重新做 Welch 与只处理新分段的流式 Welch
+    返回每块平均耗时（秒）和与 scipy.signal.welch 的最大相对误差"""
+    from signal_chain import DEFAULT_PARAMS
+    from signal_stream import StreamingChain
+    params = dict(DEFAULT_PARAMS, sample_rate=sample_rate)
+    chain = StreamingChain(params)
+    chunks = [chain.advance(chunk_duration) for _ in range(int(round(seconds / chunk_duration)))]
+    fs = chain.fs
+
+    analyzer = SpectrumAnalyzer(fs, nperseg)
+    start = time.perf_counter()
+    for chunk in chunks:
+        analyzer.process(chunk)
+        analyzer.spectra()
+    streaming = (time.perf_counter() - start) / len(chunks)
+
+    # 对照：每块都对最近一个窗口（与界面显示的 100 ms 相同）整体重新计算
+    window = int(0.1 * fs)
+    history = np.concatenate([c['pwm'] for c in chunks]).astype(np.float64)
+    start = time.perf_counter()
+    for i in range(len(chunks)):
+        stop = (i + 1) * len(chunks[0]['pwm'])
+        x = history[max(0, stop - window):stop]
+        if len(x) >= nperseg:
+            acc = WelchAccumulator(fs, nperseg)
+            acc.process(x)
+            acc.psd()
+    recompute = (time.perf_counter() - start) / len(chunks) * len(SPECTRUM_STAGES)
+
+    max_error = None
+    try:
+        from scipy import signal as sg
+        _, expected = sg.welch(history, fs, nperseg=nperseg, noverlap=nperseg // 2, detrend=False)
+        _, actual = analyzer.accumulators['pwm'].psd()
+        max_error = float(np.max(np.abs(actual - expected) / np.maximum(expected, 1e-300)))
+    except ImportError:
+        pass
+    return {
+        'samples_per_chunk': len(chunks[0]['pwm']),
+        'streaming_s': streaming,
+        'recompute_s': recompute,
+        'max_rel_error': max_error,
+    }
+
+
+if __name__ == "__main__":
+    row = benchmark()
+    print(f"{row['samples_per_chunk']} samples/chunk, streaming Welch: {row['streaming_s'] * 1000:.2f} ms/chunk, "
+          f"recompute window: {row['recompute_s'] * 1000:.2f} ms/chunk, "
+          f"max rel. error vs scipy.signal.welch: {row['max_rel_error']}")
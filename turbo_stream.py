@@ -0,0 +1,255 @@
+"""Streaming Turbo encoder for arbitrarily long byte streams
+
+Consumes an iterator of byte chunks (file reads, a pipe, a socket) and
+segments it into code blocks of block_bits bits; the last block is shorter
+when the input does not fill it. Whole batches of blocks go through
+BatchTurboEncoder, and encoded batches are yielded lazily, so memory stays
+at one batch plus one input chunk regardless of the stream length.
+
+Two block boundary modes:
+    tail   every block starts both RSC encoders in state 0 and is followed by
+           tail bits that drive them back to 0 (input and parity bits of each
+           encoder, 2 * memory bits per encoder)
+    carry  no tail: each encoder continues from the state the previous block
+           left it in, as if the whole stream were one long code block
+"""
+import sys
+import time
+import numpy as np
+from interleavers import get_interleaver
+from turbo_batch import STATES, BatchTurboEncoder, rsc_step
+
+MEMORY = 2  # encoder memory in bits (2-bit state)
+TERMINATIONS = ("tail", "carry")
+
+
+def build_tail_table(step=rsc_step, memory=MEMORY):
+    """Input and parity bits that take each state back to 0 in `memory` steps
+
+    Returns (inputs, parity), uint8 arrays of shape (STATES, memory).
+    """
+    inputs = np.zeros((STATES, memory), dtype=np.uint8)
+    parity = np.zeros((STATES, memory), dtype=np.uint8)
+    for start in range(STATES):
+        for sequence in range(2 ** memory):
+            bits = [(sequence >> k) & 1 for k in range(memory - 1, -1, -1)]
+            state, out = start, []
+            for bit in bits:
+                p, state = step(state, bit)
+                out.append(p)
+            if state == 0:
+                inputs[start], parity[start] = bits, out
+                break
+        else:
+            raise ValueError(f"state {start} cannot be terminated in {memory} steps")
+    return inputs, parity
+
+
+TAIL_INPUTS, TAIL_PARITY = build_tail_table()
+
+
+def iter_file_chunks(path, chunk_size=1 << 20):
+    """Read a file (or '-' for stdin) in chunks of at most chunk_size bytes"""
+    f = sys.stdin.buffer if path == "-" else open(path, "rb")
+    try:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        if f is not sys.stdin.buffer:
+            f.close()
+
+
+class StreamingTurboEncoder:
+    """Encode a stream of byte chunks block by block
+
+    args:
+        block_bits: code block length, a multiple of 8
+        termination: "tail" or "carry" (see module docstring)
+        batch_blocks: blocks encoded per NumPy batch; default about 1 MB of input
+        interleaver: interleaver family (see interleavers.py)
+    """
+
+    def __init__(self, block_bits=6144, termination="tail", batch_blocks=None, interleaver="auto", encoder=None):
+        if block_bits <= 0 or block_bits % 8:
+            raise ValueError("block_bits must be a positive multiple of 8")
+        if termination not in TERMINATIONS:
+            raise ValueError(f"unknown termination: {termination}")
+        self.block_bits = block_bits
+        self.block_bytes = block_bits // 8
+        self.termination = termination
+        self.batch_blocks = batch_blocks or max(1, (1 << 20) // self.block_bytes)
+        self.interleaver = interleaver
+        self.encoder = encoder or BatchTurboEncoder()
+        self.reset()
+
+    def reset(self):
+        self.states = (0, 0)    # carried (encoder 1, encoder 2) states
+        self.blocks = 0
+        self.bytes_in = 0
+
+    def encode_chunks(self, chunks):
+        """Generator of encoded batches for an iterable of bytes-like chunks
+
+        Each batch is a dict: 'first_block' (index of its first block),
+        'length' (bits per block), packed (blocks x bytes) arrays 'systematic',
+        'parity1', 'parity2', and 'tail' (blocks x bytes, packed tail bits of
+        encoder 1 then encoder 2) or None in carry mode.
+        """
+        batch_bytes = self.batch_blocks * self.block_bytes
+        buffer = bytearray()
+        for chunk in chunks:
+            buffer += chunk
+            self.bytes_in += len(chunk)
+            while len(buffer) >= batch_bytes:
+                yield self._take(buffer, self.batch_blocks, self.block_bytes)
+
+        full = len(buffer) // self.block_bytes
+        if full:
+            yield self._take(buffer, full, self.block_bytes)
+        if buffer:
+            # Short last block: its own length (and interleaver)
+            yield self._take(buffer, 1, len(buffer))
+
+    def _take(self, buffer, blocks, block_bytes):
+        # Copy out before deleting: a bytearray cannot shrink while NumPy views it
+        packed = np.frombuffer(buffer, dtype=np.uint8, count=blocks * block_bytes).copy()
+        del buffer[:blocks * block_bytes]
+        return self.encode_blocks(packed.reshape(blocks, block_bytes))
+
+    def _initial_states(self, packed, carried):
+        # State at the start of each block in carry mode, and the state after the last one
+        if self.encoder._state_free:
+            # The state after a byte only depends on that byte, so every
+            # block's end state is known without running the blocks in order
+            ends = self.encoder.final_state(packed)
+        else:
+            ends = np.empty(len(packed), dtype=np.uint8)
+            state = carried
+            for i, row in enumerate(packed):
+                ends[i] = state = int(self.encoder.final_state(row[np.newaxis], state)[0])
+        starts = np.empty(len(packed), dtype=np.uint8)
+        starts[0] = carried
+        starts[1:] = ends[:-1]
+        return starts, int(ends[-1])
+
+    def encode_blocks(self, packed):
+        """Encode (blocks x bytes) packed input as consecutive blocks of the stream"""
+        blocks, nbytes = packed.shape
+        length = nbytes * 8
+        bits = np.unpackbits(packed, axis=1)
+        interleaved = np.packbits(get_interleaver(self.interleaver, length).interleave(bits), axis=1)
+
+        tail = None
+        if self.termination == "carry":
+            start1, end1 = self._initial_states(packed, self.states[0])
+            start2, end2 = self._initial_states(interleaved, self.states[1])
+            self.states = (end1, end2)
+        else:
+            start1 = start2 = 0
+            end1 = self.encoder.final_state(packed)
+            end2 = self.encoder.final_state(interleaved)
+            tail = np.packbits(np.concatenate((TAIL_INPUTS[end1], TAIL_PARITY[end1],
+                                               TAIL_INPUTS[end2], TAIL_PARITY[end2]), axis=1), axis=1)
+
+        result = {
+            'first_block': self.blocks,
+            'length': length,
+            'systematic': packed,
+            'parity1': self.encoder.rsc_encode_packed(packed, start1),
+            'parity2': self.encoder.rsc_encode_packed(interleaved, start2),
+            'tail': tail,
+        }
+        self.blocks += blocks
+        return result
+
+
+def batch_to_bytes(batch):
+    """Serialize a batch: per block systematic | parity1 | parity2 | tail bytes"""
+    parts = [batch['systematic'], batch['parity1'], batch['parity2']]
+    if batch['tail'] is not None:
+        parts.append(batch['tail'])
+    return np.concatenate(parts, axis=1).tobytes()
+
+
+def encode_file(src, dst, block_bits=6144, termination="tail", chunk_size=1 << 20):
+    """Encode file src into dst (either may be '-'); returns throughput statistics"""
+    encoder = StreamingTurboEncoder(block_bits, termination)
+    out = sys.stdout.buffer if dst == "-" else open(dst, "wb")
+    bytes_out = 0
+    start = time.perf_counter()
+    try:
+        for batch in encoder.encode_chunks(iter_file_chunks(src, chunk_size)):
+            data = batch_to_bytes(batch)
+            out.write(data)
+            bytes_out += len(data)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+    elapsed = time.perf_counter() - start
+    return {
+        'blocks': encoder.blocks,
+        'bytes_in': encoder.bytes_in,
+        'bytes_out': bytes_out,
+        'seconds': elapsed,
+        'mbit_per_s': encoder.bytes_in * 8 / elapsed / 1e6 if elapsed > 0 else float("inf"),
+    }
+
+
+def benchmark(block_sizes=(40, 1024, 6144), total_mb=32, chunk_size=64 * 1024, termination="tail", seed=0):
+    """Input Mbit/s and peak traced memory per block size for a synthetic total_mb stream
+
+    The source repeats one random chunk, so the stream itself takes no memory.
+    """
+    import tracemalloc
+    chunk = np.random.default_rng(seed).integers(0, 256, chunk_size, dtype=np.uint8).tobytes()
+    count = total_mb * (1 << 20) // chunk_size
+    rows = []
+    for block_bits in block_sizes:
+        encoder = StreamingTurboEncoder(block_bits, termination)
+        tracemalloc.start()
+        start = time.perf_counter()
+        bytes_out = 0
+        for batch in encoder.encode_chunks(chunk for _ in range(count)):
+            bytes_out += batch['systematic'].nbytes + batch['parity1'].nbytes + batch['parity2'].nbytes
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        rows.append({
+            'block_bits': block_bits,
+            'blocks': encoder.blocks,
+            'mbit_per_s': encoder.bytes_in * 8 / elapsed / 1e6,
+            'blocks_per_s': encoder.blocks / elapsed,
+            'peak_mib': peak / 2**20,
+        })
+    return rows
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Streaming Turbo encoder")
+    parser.add_argument("input", nargs="?", help="input file ('-' for stdin); omit to run the benchmark")
+    parser.add_argument("output", nargs="?", default="-", help="output file ('-' for stdout)")
+    parser.add_argument("--block-bits", type=int, default=6144, help="code block length (multiple of 8)")
+    parser.add_argument("--termination", choices=TERMINATIONS, default="tail")
+    parser.add_argument("--total-mb", type=int, default=32, help="benchmark stream size (MiB)")
+    args = parser.parse_args(argv)
+
+    if args.input is None:
+        print(f"{args.total_mb} MiB stream, {args.termination} termination")
+        print(f"{'block bits':>10} {'blocks':>9} {'Mbit/s':>8} {'blocks/s':>10} {'peak MiB':>9}")
+        for row in benchmark(total_mb=args.total_mb, termination=args.termination):
+            print(f"{row['block_bits']:>10d} {row['blocks']:>9d} {row['mbit_per_s']:>8.1f} "
+                  f"{row['blocks_per_s']:>10.0f} {row['peak_mib']:>9.2f}")
+        return 0
+
+    stats = encode_file(args.input, args.output, args.block_bits, args.termination)
+    print(f"{stats['blocks']} blocks, {stats['bytes_in']} -> {stats['bytes_out']} bytes, "
+          f"{stats['mbit_per_s']:.1f} Mbit/s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
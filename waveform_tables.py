@@ -0,0 +1,250 @@
+"""周期波形查表合成
+Mode1 的输入是固定频率的周期信号，波形只取决于 (波形类型, 幅值, 占空比, 每周期采样点数)。
+这里把一个周期算成表并按这几个参数做 LRU 缓存（按总字节数限制，见 TABLE_CACHE_BYTES），之后任意长度的信号都由查表得到，不再逐点计算 sin：
+    每周期采样点数为整数 m 时，表就是一个周期，直接平铺（按位复制，没有浮点运算）；
+    为分数 m/c 时（例如 123.456 = 15432/125），m 个采样点恰好是 c 个周期，同样建表平铺；
+    都不是时用相位累加器得到每点的小数相位，在 FRACTIONAL_TABLE_SIZE 点的表上线性插值。
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from fractions import Fraction
+from functools import lru_cache
+import numpy as np
+from signal_chain import WAVE_TYPES, waveform_from_phase
+
+FRACTIONAL_TABLE_SIZE = 2**14   # 非整数周期时插值表的长度，正弦插值误差约为幅值的 2e-8
+MAX_PERIOD_TABLE = 2**21        # 表长超过这个长度时改用插值表，限制单张表的内存（16 MB）
+MAX_TABLE_CYCLES = 1000         # 分数周期时一张表最多包含的周期数
+PHASE_TOLERANCE = 1e-9          # 每平铺一张表允许的相位误差（周期）
+TABLE_CACHE_BYTES = 64 * 2**20  # 周期表缓存的总字节数上限（每改一次幅值就是一张新表）
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize", "nbytes", "max_bytes"])
+
+
+class _TableCache:
+    """按总字节数淘汰的 LRU 缓存：表的大小从几个点到 MAX_PERIOD_TABLE 点不等，按个数限制没有意义"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._tables = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, build):
+        with self._lock:
+            table = self._tables.get(key)
+            if table is not None:
+                self.hits += 1
+                self._tables.move_to_end(key)
+                return table
+            self.misses += 1
+        table = build()
+        if table.nbytes > self.max_bytes:
+            return table    # 比整个缓存还大，不缓存
+        with self._lock:
+            if key not in self._tables:
+                self._tables[key] = table
+                self.nbytes += table.nbytes
+            while self.nbytes > self.max_bytes:
+                _, old = self._tables.popitem(last=False)  # 淘汰最久没用的表
+                self.nbytes -= old.nbytes
+        return table
+
+    def info(self):
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, None, len(self._tables), self.nbytes, self.max_bytes)
+
+    def clear(self):
+        with self._lock:
+            self._tables.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+
+
+_PERIOD_CACHE = _TableCache(TABLE_CACHE_BYTES)
+
+
+def _cache_duty(wave_type, duty_cycle):
+    # 只有方波用到占空比，其余波形统一用同一个键，提高命中率
+    return float(duty_cycle) if wave_type == "Square" else None
+
+
+def _cached_period(wave_type, amplitude, duty_cycle, samples, cycles=1):
+    key = (wave_type, amplitude, duty_cycle, samples, cycles)
+    return _PERIOD_CACHE.get(key, lambda: _build_period(*key))
+
+
+def _build_period(wave_type, amplitude, duty_cycle, samples, cycles):
+    # 第 j 点的相位为 j * cycles / samples 的小数部分，用整数取模得到，没有舍入误差
+    phase = (np.arange(samples) * cycles % samples) / samples
+    table = waveform_from_phase(phase, wave_type, amplitude, 0.5 if duty_cycle is None else duty_cycle)
+    table = np.ascontiguousarray(table, dtype=np.float64)
+    table.setflags(write=False)  # 多处共享同一张表，禁止修改
+    return table
+
+
+@lru_cache(maxsize=32)
+def _cached_interp_table(wave_type, amplitude, duty_cycle):
+    # 末尾多放一个点（等于第一个点），插值时下标 i+1 不必取模
+    period = _cached_period(wave_type, amplitude, duty_cycle, FRACTIONAL_TABLE_SIZE)
+    table = np.concatenate((period, period[:1]))
+    table.setflags(write=False)
+    return table
+
+
+def period_table(wave_type, amplitude, duty_cycle, samples, cycles=1):
+    """samples 个采样点恰好覆盖 cycles 个周期的表（只读数组），第 j 点对应相位 j * cycles / samples"""
+    if wave_type not in WAVE_TYPES:
+        raise ValueError(f"未知的波形类型: {wave_type}")
+    return _cached_period(wave_type, float(amplitude), _cache_duty(wave_type, duty_cycle), int(samples), int(cycles))
+
+
+def cache_info():
+    """两级缓存的命中统计"""
+    return {'period': _PERIOD_CACHE.info(), 'interp': _cached_interp_table.cache_info()}
+
+
+def cache_clear():
+    _PERIOD_CACHE.clear()
+    _cached_interp_table.cache_clear()
+
+
+@lru_cache(maxsize=64)
+def table_period(samples_per_period):
+    """把每周期采样点数写成 samples / cycles（最简分数），使 samples 个点恰好是整数个周期
+    表太长或找不到足够精确的分数时返回 None"""
+    ratio = Fraction(samples_per_period).limit_denominator(MAX_TABLE_CYCLES)
+    samples, cycles = ratio.numerator, ratio.denominator
+    if not 1 <= samples <= MAX_PERIOD_TABLE:
+        return None
+    if abs(samples / samples_per_period - cycles) >= PHASE_TOLERANCE:
+        return None
+    return samples, cycles
+
+
+def tile_period(table, start, n):
+    """从表的第 start 点开始循环取 n 个点：先复制一个完整周期，之后每次复制已填好的部分（翻倍）"""
+    period = len(table)
+    out = np.empty(n, dtype=table.dtype)
+    first = min(n, period - start)
+    out[:first] = table[start:start + first]
+    filled = first
+    if filled < n:
+        second = min(period, n - filled)
+        out[filled:filled + second] = table[:second]
+        filled += second
+    # out[first:filled] 现在是整数个周期，从相位0开始
+    while filled < n:
+        k = min(filled - first, n - filled)
+        out[filled:filled + k] = out[first:first + k]
+        filled += k
+    return out
+
+
+def interpolate_table(table, phase):
+    """在带首尾重复点的插值表上按相位（0~1）线性插值"""
+    size = len(table) - 1
+    pos = phase * size
+    index = pos.astype(np.intp)
+    np.minimum(index, size - 1, out=index)  # 相位恰好为1.0（取模的舍入）时落在最后一段
+    pos -= index
+    low = table[index]
+    return low + pos * (table[index + 1] - low)
+
+
+class TableSynth:
+    """相位连续的周期波形合成器，代替 PhaseAccumulator + waveform_from_phase
+    相位以周期为单位保存在 [0, 1) 内；查表平铺时相位总是落在表的采样点上，不会累积舍入误差"""
+
+    def __init__(self, phase=0.0):
+        self.phase = phase
+
+    def generate(self, n, wave_type, amplitude, duty_cycle, samples_per_period):
+        """生成接下来的 n 个采样点
+        args:
+            samples_per_period: 每周期采样点数 = 采样频率 / 信号频率，可以不是整数
+        """
+        plan = table_period(samples_per_period)
+        if plan is not None:
+            samples, cycles = plan
+            # 表中第 j 点的相位是 (j * cycles % samples) / samples，反过来由相位求 j 要乘 cycles 的模逆
+            step = int(round(self.phase * samples)) % samples
+            start = step * pow(cycles, -1, samples) % samples if samples > 1 else 0
+            table = period_table(wave_type, amplitude, duty_cycle, samples, cycles)
+            self.phase = ((start + n) * cycles % samples) / samples
+            return tile_period(table, start, n)
+
+        # 非整数周期：相位累加器给出每点的小数相位
+        increment = 1.0 / samples_per_period
+        phase = self.phase + np.arange(n) * increment
+        phase %= 1.0
+        self.phase = (self.phase + n * increment) % 1.0
+        if wave_type == "Square":
+            # 方波在占空比处跳变，插值会在跳变沿产生中间值；直接比较与查表一样便宜且精确
+            return waveform_from_phase(phase, wave_type, amplitude, duty_cycle)
+        table = _cached_interp_table(wave_type, float(amplitude), _cache_duty(wave_type, duty_cycle))
+        return interpolate_table(table, phase)
+
+
+def synthesize(n, wave_type, amplitude, duty_cycle, samples_per_period, start_phase=0.0):
+    """一次性合成 n 个点（从 start_phase 开始），等价于 waveform_from_phase 逐点计算"""
+    return TableSynth(start_phase).generate(n, wave_type, amplitude, duty_cycle, samples_per_period)
+
+
+def benchmark(n=250000, periods=(10.0, 100.0, 100000.0, 123.456, 33333.3, 100 * np.pi), repeats=5):
+    """对比逐点计算（waveform_from_phase）与查表合成的耗时和最大误差
+    n 默认为 5 MS/s 下一个 50 ms 刷新块的点数"""
+    rows = []
+    for samples_per_period in periods:
+        for wave_type in WAVE_TYPES:
+            def direct():
+                phase = (np.arange(n) / samples_per_period) % 1.0
+                return waveform_from_phase(phase, wave_type, 5.0, 0.3)
+
+            best_direct = float("inf")
+            for _ in range(repeats):
+                start = time.perf_counter()
+                expected = direct()
+                best_direct = min(best_direct, time.perf_counter() - start)
+
+            synthesize(n, wave_type, 5.0, 0.3, samples_per_period)  # 第一次调用建表
+            best_table = float("inf")
+            for _ in range(repeats):
+                start = time.perf_counter()
+                result = synthesize(n, wave_type, 5.0, 0.3, samples_per_period)
+                best_table = min(best_table, time.perf_counter() - start)
+
+            # 相位恰好等于占空比的点：逐点计算时 k / spp 的舍入决定落在跳变哪一侧，查表总是按精确相位，单独计数
+            error = np.abs(result - expected)
+            edges = error > 1.0
+            rows.append({
+                'samples_per_period': samples_per_period,
+                'wave_type': wave_type,
+                'direct_s': best_direct,
+                'table_s': best_table,
+                'max_error': float(np.max(error[~edges], initial=0.0)),
+                'edge_mismatches': int(np.count_nonzero(edges)),
+            })
+    return rows
+
+
+def main():
+    print(f"{'spp':>10} {'wave':>9} {'direct (ms)':>12} {'table (ms)':>11} {'speedup':>8} "
+          f"{'max err (V)':>12} {'edges':>6}")
+    for row in benchmark():
+        speedup = row['direct_s'] / row['table_s'] if row['table_s'] > 0 else float('inf')
+        print(f"{row['samples_per_period']:>10g} {row['wave_type']:>9} {row['direct_s'] * 1e3:>12.3f} "
+              f"{row['table_s'] * 1e3:>11.3f} {speedup:>7.1f}x {row['max_error']:>12.2e} "
+              f"{row['edge_mismatches']:>6d}")
+    info = cache_info()
+    print(f"period cache: {info['period'].hits} hits, {info['period'].misses} misses, "
+          f"{info['period'].currsize} tables, {info['period'].nbytes / 2**20:.1f}/"
+          f"{info['period'].max_bytes / 2**20:.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()